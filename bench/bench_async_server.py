@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# bench/bench_async_server.py
+#
+# Head-to-head: server/server.py (Flask development server, one thread per
+# connection) versus server/async_server.py (one event loop, bignum work in a
+# process pool) under growing numbers of concurrent kiosk connections. Each
+# connection is a kiosk sending --requests POST /submit_vote in a row over
+# keep-alive (reconnecting when the server closes the connection, as the
+# Flask development server does after every response), all driven from one
+# asyncio client so thousands of them are cheap.
+# Reports ballots/s, latency percentiles, throttled (429) and failed requests,
+# and checks each server's ballot count.
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from common import bigint
+
+REQUEST_TIMEOUT = 60  # seconds before a request counts as failed
+
+SERVERS = {
+    "flask": "server/server.py",
+    "asyncio": "server/async_server.py",
+}
+
+
+def start_server(name, port, extra):
+    # The benchmark's ballots carry no validity proofs: request handling is what is compared
+    process = subprocess.Popen([sys.executable, str(ROOT / SERVERS[name]), "--quiet", "--no-log", "--no-require-proofs",
+                                "--port", str(port)] + extra, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while True:
+        try:
+            requests.get(f"http://localhost:{port}/metrics", timeout=1)
+            return process
+        except requests.ConnectionError:
+            assert time.time() < deadline, f"{name} server did not start"
+            time.sleep(0.2)
+
+
+async def exchange(reader, writer, path, body):
+    """One request/response on an open connection; returns (status, whether the server keeps it open)."""
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, keep_alive = 0, True
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"connection" and value.strip().lower() == b"close":
+            keep_alive = False
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def kiosk(port, bodies, latencies, outcomes):
+    """One kiosk sending its ballots one after the other, reconnecting when the server closes the connection."""
+    writer = None
+    for path, body in bodies:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("localhost", port)
+            status, keep_alive = await asyncio.wait_for(exchange(reader, writer, path, body), REQUEST_TIMEOUT)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            outcomes["failed"] += 1
+            keep_alive = False
+        else:
+            latencies.append(time.perf_counter() - start)
+            outcomes[{200: "accepted", 429: "throttled"}.get(status, "failed")] += 1
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_level(port, election, connections, per_connection, ciphertexts):
+    path = f"/elections/{election}/submit_vote"
+    plan = [[(path, json.dumps({"voter_id": f"k{k}-{i}", "exponent": 0,
+                                "ciphertext": ciphertexts[k * per_connection + i]}).encode())
+             for i in range(per_connection)] for k in range(connections)]
+    latencies, outcomes = [], {"accepted": 0, "throttled": 0, "failed": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(kiosk(port, bodies, latencies, outcomes) for bodies in plan))
+    return time.perf_counter() - start, sorted(latencies), outcomes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Flask server against the asyncio server.")
+    parser.add_argument("--connections", type=int, nargs="+", default=[10, 100, 1000],
+                        help="concurrent kiosk connections per round")
+    parser.add_argument("--requests", type=int, default=5, help="ballots sent on each connection")
+    parser.add_argument("--key-size", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=2, help="asyncio server worker processes")
+    parser.add_argument("--port", type=int, default=5500)
+    args = parser.parse_args()
+
+    # Distinct ciphertexts for every ballot (the servers reject replays): Enc(1)·Enc(0)^i
+    pubkey, _ = bigint.generate_paillier_keypair(args.key_size)
+    zero = bigint.encrypt(pubkey, 0)
+    ciphertexts, c = [], bigint.encrypt(pubkey, 1)
+    for _ in range(max(args.connections) * args.requests):
+        c = c * zero % pubkey.nsquare
+        ciphertexts.append(str(c))
+
+    print(f"{args.requests} ballot(s) per connection, {args.key_size}-bit key, "
+          f"asyncio server with {args.workers} worker process(es)")
+    print(f"{'server':>8} | {'conns':>6} | {'ballots/s':>10} | {'p50 ms':>8} | {'p99 ms':>9} | "
+          f"{'throttled':>9} | {'failed':>6}")
+    print("-" * 74)
+    for name in SERVERS:
+        extra = ["--workers", str(args.workers)] if name == "asyncio" else []
+        port = args.port + list(SERVERS).index(name)
+        process = start_server(name, port, extra)
+        try:
+            for connections in args.connections:
+                election = f"bench-{connections}"
+                resp = requests.post(f"http://localhost:{port}/elections/{election}/set_public_key",
+                                     json={"n": str(pubkey.n)})
+                assert resp.status_code == 200, resp.text
+                elapsed, latencies, outcomes = asyncio.run(
+                    run_level(port, election, connections, args.requests, ciphertexts))
+                count = requests.get(f"http://localhost:{port}/elections/{election}/get_encrypted_tally",
+                                     timeout=60).json()["ballot_count"]
+                assert count == outcomes["accepted"], (count, outcomes)
+                p50 = 1000 * statistics.median(latencies) if latencies else float("nan")
+                p99 = 1000 * latencies[int(0.99 * (len(latencies) - 1))] if latencies else float("nan")
+                print(f"{name:>8} | {connections:>6} | {outcomes['accepted'] / elapsed:>10,.0f} | {p50:>8.1f} | "
+                      f"{p99:>9.1f} | {outcomes['throttled']:>9} | {outcomes['failed']:>6}")
+        finally:
+            process.terminate()
+            process.wait()
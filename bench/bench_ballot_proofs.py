@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# bench/bench_ballot_proofs.py
+#
+# Ballot-validity proof throughput (common/ballot_proof.py) for each key size:
+# proving (online part only, with (ρ, ρ^n) pairs precomputed as the kiosk's
+# randomness pool does), verifying every proof on its own, and verifying them
+# in randomized batches of several sizes as /submit_votes does.
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from phe import paillier
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import ballot_proof
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-ballot versus batched proof verification.")
+    parser.add_argument("--key-sizes", type=int, nargs="+", default=[2048, 3072])
+    parser.add_argument("--ballots", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'key':>6} | {'mode':>14} | {'ms/ballot':>10} | {'ballots/s':>10} | {'speed-up':>8}")
+    print("-" * 62)
+    for key_size in args.key_sizes:
+        pubkey, _ = paillier.generate_paillier_keypair(n_length=key_size)
+        n, nsquare = pubkey.n, pubkey.nsquare
+
+        # Yes/no ballots with known randomness, plus enough precomputed (ρ, ρ^n) pairs
+        ballots = []
+        for i in range(args.ballots):
+            r, factor = ballot_proof.random_factor(n, nsquare)
+            ballots.append((f"voter{i:06d}".encode(), i % 2, r, pubkey.raw_encrypt(i % 2, r_value=1) * factor % nsquare))
+        factors = [ballot_proof.random_factor(n, nsquare) for _ in range(len(ballot_proof.BINARY) * args.ballots)]
+
+        start = time.perf_counter()
+        pairs = iter(factors)
+        proofs = [ballot_proof.prove(n, c, m, r, ballot_proof.BINARY, context, lambda: next(pairs))
+                  for context, m, r, c in ballots]
+        prove_seconds = (time.perf_counter() - start) / args.ballots
+        statements = [(c, proof, ballot_proof.BINARY, context) for (context, _, _, c), proof in zip(ballots, proofs)]
+
+        single = best_of(lambda: [ballot_proof.verify(n, c, proof, messages, context)
+                                  for c, proof, messages, context in statements], args.repeat) / args.ballots
+        assert all(ballot_proof.verify(n, c, proof, messages, context) for c, proof, messages, context in statements)
+
+        rows = [("prove (online)", prove_seconds, None), ("verify each", single, 1.0)]
+        for batch_size in args.batch_sizes:
+            batches = [statements[i:i + batch_size] for i in range(0, len(statements), batch_size)]
+            assert all(all(ballot_proof.verify_batch(n, batch)) for batch in batches)
+            seconds = best_of(lambda: [ballot_proof.verify_batch(n, batch) for batch in batches],
+                              args.repeat) / args.ballots
+            rows.append((f"batch of {batch_size}", seconds, single / seconds))
+
+        for mode, seconds, speedup in rows:
+            print(f"{key_size:>6} | {mode:>14} | {seconds * 1000:>10.3f} | {1 / seconds:>10,.0f} | "
+                  f"{f'{speedup:.1f}x' if speedup is not None else '':>8}")
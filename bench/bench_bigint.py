@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# bench/bench_bigint.py
+#
+# Paillier arithmetic per big-integer backend (common/bigint.py) and key
+# size: keygen (prime generation), encryption (r^n mod n² and one multiply),
+# aggregation (product of many ciphertexts mod n²) and CRT decryption.
+# Every installed backend is measured side by side (gmpy2 only if installed).
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import bigint
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def crt_decrypt(impl, privkey, ciphertexts):
+    # Same arithmetic as common/batch_decrypt.CrtDecryptor, on the given backend
+    p, q = privkey.p, privkey.q
+    psquare, qsquare, g = p * p, q * q, p * q + 1
+    hp = impl.invert((impl.powmod(g, p - 1, psquare) - 1) // p, p)
+    hq = impl.invert((impl.powmod(g, q - 1, qsquare) - 1) // q, q)
+    p_inverse = impl.invert(p, q)
+    result = []
+    for c in ciphertexts:
+        mp = (impl.powmod(c, p - 1, psquare) - 1) // p * hp % p
+        mq = (impl.powmod(c, q - 1, qsquare) - 1) // q * hq % q
+        result.append(mp + ((mq - mp) * p_inverse % q) * p)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the big-integer backends.")
+    parser.add_argument("--key-sizes", type=int, nargs="+", default=[2048, 3072, 4096])
+    parser.add_argument("--keygens", type=int, default=3, help="keypairs generated per backend and key size")
+    parser.add_argument("--encryptions", type=int, default=50)
+    parser.add_argument("--ballots", type=int, default=20000, help="ciphertexts multiplied in the aggregation test")
+    parser.add_argument("--decryptions", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Active backend: {bigint.NAME} (installed: {', '.join(bigint.BACKENDS)})")
+    print(f"{'key':>6} | {'backend':>7} | {'keygen ms':>10} | {'encrypt ms':>10} | {'aggregate µs/ballot':>19} | "
+          f"{'decrypt ms':>10}")
+    print("-" * 79)
+    for key_size in args.key_sizes:
+        pubkey, privkey = bigint.generate_paillier_keypair(key_size, using=bigint.PythonBackend)
+        # A few hundred distinct encryptions of 0/1, repeated up to --ballots
+        distinct = [bigint.encrypt(pubkey, i % 2) for i in range(200)]
+        ciphertexts = [distinct[i % len(distinct)] for i in range(args.ballots)]
+        expected = sum(i % len(distinct) % 2 for i in range(args.ballots))
+
+        for name, impl in bigint.BACKENDS.items():
+            keygen = best_of(lambda: [bigint.generate_paillier_keypair(key_size, using=impl)
+                                      for _ in range(args.keygens)], 1) / args.keygens
+            encrypt = best_of(lambda: [bigint.encrypt(pubkey, 1, using=impl)
+                                       for _ in range(args.encryptions)], args.repeat) / args.encryptions
+            aggregate = best_of(lambda: impl.prod_mod(ciphertexts, pubkey.nsquare), args.repeat) / args.ballots
+            total = impl.prod_mod(ciphertexts, pubkey.nsquare)
+            decrypt = best_of(lambda: crt_decrypt(impl, privkey, [total] * args.decryptions),
+                              args.repeat) / args.decryptions
+            assert crt_decrypt(impl, privkey, [total]) == [expected]
+            print(f"{key_size:>6} | {name:>7} | {keygen * 1000:>10.1f} | {encrypt * 1000:>10.3f} | "
+                  f"{aggregate * 1e6:>19.2f} | {decrypt * 1000:>10.3f}")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# bench/bench_key_loading.py
+#
+# Key start-up cost per key size, before and after key files
+# (common/keyfile.py):
+#   - keygen: one process versus a parallel prime search (--processes)
+#   - kiosk start-up: generating a fresh keypair on every run (the old
+#     client) versus loading the saved one
+#   - tally start-up: unpickling the key and deriving the CRT decryption
+#     constants versus loading the key file that stores them
+# Keygen is random, so it is averaged over --rounds; loads are best of --repeat.
+
+import argparse
+import os
+import pickle
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import bigint, keyfile
+from common.batch_decrypt import CrtDecryptor
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def mean_of(fn, rounds):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.mean(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark keygen and key loading.")
+    parser.add_argument("--key-sizes", type=int, nargs="+", default=[2048, 3072])
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="parallel keygen worker processes")
+    parser.add_argument("--rounds", type=int, default=3, help="keypairs generated per keygen measurement")
+    parser.add_argument("--repeat", type=int, default=20, help="repetitions per load measurement (best is kept)")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="cvs-key-bench-"))
+    print(f"{bigint.NAME} big-integer backend, {os.cpu_count()} CPU(s), parallel keygen with "
+          f"{args.processes} process(es)")
+    print(f"{'bits':>5} | {'keygen 1 proc s':>15} | {'keygen par. s':>13} | {'kiosk before s':>14} | "
+          f"{'kiosk after ms':>14} | {'tally before ms':>15} | {'tally after ms':>14}")
+    print("-" * 108)
+    for bits in args.key_sizes:
+        sequential = mean_of(lambda: bigint.generate_paillier_keypair(bits), args.rounds)
+        parallel = mean_of(lambda: bigint.generate_paillier_keypair(bits, processes=args.processes), args.rounds)
+
+        pubkey, privkey = bigint.generate_paillier_keypair(bits)
+        key_dir = work / str(bits)
+        keyfile.save_keypair(key_dir, pubkey, privkey)
+        with open(key_dir / keyfile.LEGACY_PUBLIC_KEY_FILE, "wb") as f:
+            pickle.dump(pubkey, f)
+        with open(key_dir / keyfile.LEGACY_PRIVATE_KEY_FILE, "wb") as f:
+            pickle.dump(privkey, f)
+
+        # Kiosk: before, a fresh key on every run (the sequential keygen above); after, load the saved keypair
+        kiosk_after = best_of(lambda: keyfile.load_keypair(key_dir), args.repeat)
+
+        def tally_before():
+            with open(key_dir / keyfile.LEGACY_PRIVATE_KEY_FILE, "rb") as f:
+                key = pickle.load(f)
+            return CrtDecryptor(key.p, key.q)
+
+        def tally_after():
+            return CrtDecryptor.for_key(keyfile.load_private_key(key_dir / keyfile.PRIVATE_KEY_FILE))
+
+        assert tally_before().hp == tally_after().hp and tally_before().hq == tally_after().hq
+        print(f"{bits:>5} | {sequential:>15.2f} | {parallel:>13.2f} | {sequential:>14.2f} | "
+              f"{1000 * kiosk_after:>14.2f} | {1000 * best_of(tally_before, args.repeat):>15.2f} | "
+              f"{1000 * best_of(tally_after, args.repeat):>14.2f}")
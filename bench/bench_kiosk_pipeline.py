@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# bench/bench_kiosk_pipeline.py
+#
+# Voter-to-voter turnaround at a kiosk (client/kiosk_pipeline.py): how long
+# after a vote is entered the kiosk can take the next voter, sequentially
+# (encrypt, prove, save, upload vote and commitment, then move on) versus
+# pipelined (hand off to the background worker and move on). Starts its own
+# server with a ballot log. --blip restarts that server part-way through the
+# pipelined run, and the ballots queued in the outbox are delivered once it
+# is back.
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+from phe import paillier
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "client"))
+from common import bigint
+from common.packing import BallotLayout, REFERENDUM, commitment_value
+from kiosk_pipeline import KioskPipeline
+from randomness_pool import RandomnessPool
+
+
+def start_server(port, log_dir):
+    process = subprocess.Popen([sys.executable, str(ROOT / "server" / "server.py"), "--quiet", "--port", str(port),
+                                "--log-dir", log_dir], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 15
+    while True:
+        try:
+            requests.get(f"http://localhost:{port}/metrics", timeout=1)
+            return process
+        except requests.ConnectionError:
+            assert time.time() < deadline, "server did not start"
+            time.sleep(0.1)
+
+
+def run_session(mode, voters, pubkey, layout, pool, url, work_dir, think, blip=None):
+    pipeline = KioskPipeline(pubkey, layout, pool, url=url, outbox_dir=work_dir / "outbox",
+                             votes_dir=work_dir / "votes", commit_dir=work_dir / "commitments",
+                             verbose=False).start()
+    turnaround = []
+    start = time.perf_counter()
+    for i, (voter_id, vote) in enumerate(voters):
+        if blip is not None and i == len(voters) // 3:
+            blip()
+        time.sleep(think)  # the next voter authenticating and choosing
+        voted_at = time.perf_counter()
+        plaintexts = layout.encode({"referendum": vote})
+        pipeline.submit(voter_id, plaintexts, commitment_value(plaintexts))
+        if mode == "sequential":
+            pipeline.flush()
+        turnaround.append(time.perf_counter() - voted_at)
+    undelivered = pipeline.close()
+    elapsed = time.perf_counter() - start
+    assert undelivered == 0, f"{undelivered} ballot(s) left in the outbox"
+    return turnaround, elapsed, pipeline.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sequential versus pipelined kiosk sessions.")
+    parser.add_argument("--voters", type=int, default=100, help="voters per session")
+    parser.add_argument("--key-size", type=int, default=2048)
+    parser.add_argument("--think-ms", type=float, default=20.0,
+                        help="time each voter spends before their vote is entered")
+    parser.add_argument("--port", type=int, default=5300)
+    parser.add_argument("--blip", type=float, default=0.0,
+                        help="restart the server for this many seconds during the pipelined session")
+    args = parser.parse_args()
+
+    url = f"http://localhost:{args.port}"
+    work = Path(tempfile.mkdtemp(prefix="cvs-kiosk-bench-"))
+    server = start_server(args.port, str(work / "ballot_log"))
+    pool = None
+    try:
+        pubkey, privkey = bigint.generate_paillier_keypair(args.key_size)
+        layout = BallotLayout(REFERENDUM, 2 * args.voters, pubkey.n)
+        resp = requests.post(f"{url}/set_public_key", json={"n": str(pubkey.n), "ballot_layout": layout.to_dict()})
+        assert resp.status_code == 200, resp.text
+        pool = RandomnessPool(pubkey, capacity=4 * args.voters, low_water=args.voters).start()
+
+        def blip():
+            global server
+
+            def restart():
+                global server
+                time.sleep(args.blip)
+                server = start_server(args.port, str(work / "ballot_log"))
+
+            server.terminate()
+            server.wait()
+            threading.Thread(target=restart).start()
+
+        print(f"{args.voters} voters per session, {args.key_size}-bit key, {args.think_ms:.0f} ms per voter"
+              + (f", server down for {args.blip:.1f}s during the pipelined session" if args.blip else ""))
+        print(f"{'mode':>10} | {'turnaround mean ms':>18} | {'p95 ms':>8} | {'session s':>9} | "
+              f"{'background mean ms':>18} | {'retries':>7}")
+        print("-" * 86)
+        expected_yes = 0
+        for mode in ("sequential", "pipelined"):
+            voters = [(f"{mode}{i:05d}", "yes" if i % 3 == 0 else "no") for i in range(args.voters)]
+            expected_yes += sum(vote == "yes" for _, vote in voters)
+            turnaround, elapsed, stats = run_session(mode, voters, pubkey, layout, pool, url, work / mode,
+                                                     args.think_ms / 1000,
+                                                     blip if mode == "pipelined" and args.blip else None)
+            turnaround.sort()
+            print(f"{mode:>10} | {1000 * statistics.mean(turnaround):>18.2f} | "
+                  f"{1000 * turnaround[int(0.95 * (len(turnaround) - 1))]:>8.2f} | {elapsed:>9.2f} | "
+                  f"{stats.get('latency_ms_mean', 0.0):>18.1f} | {stats['retries']:>7}")
+
+        tally = requests.get(f"{url}/get_encrypted_tally").json()
+        counted = privkey.decrypt(paillier.EncryptedNumber(pubkey, int(tally["ciphertext"]), tally["exponent"]))
+        assert tally["ballot_count"] == 2 * args.voters and counted == expected_yes, (tally["ballot_count"], counted)
+        print(f"✅ All {2 * args.voters} ballots counted ({counted} yes).")
+    finally:
+        if pool is not None:
+            pool.stop()
+        server.terminate()
+        server.wait()
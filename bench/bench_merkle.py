@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# bench/bench_merkle.py
+#
+# Merkle bulletin-board costs: incremental build (one append per accepted
+# commitment), root computation, inclusion-proof generation and client-side
+# verification, plus proof size, at up to 1M leaves.
+
+import argparse
+import hashlib
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common.merkle import MerkleTree, verify_inclusion
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the commitment Merkle tree.")
+    parser.add_argument("--leaves", type=int, default=1_000_000)
+    parser.add_argument("--proofs", type=int, default=10_000)
+    args = parser.parse_args()
+
+    digests = [hashlib.sha256(i.to_bytes(8, "big")).digest() for i in range(args.leaves)]
+
+    tree = MerkleTree()
+    start = time.perf_counter()
+    for d in digests:
+        tree.append(d)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    root = tree.root()
+    root_seconds = time.perf_counter() - start
+
+    rng = random.Random(0)
+    indices = [rng.randrange(args.leaves) for _ in range(args.proofs)]
+    start = time.perf_counter()
+    proofs = [tree.proof(i) for i in indices]
+    prove = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, path in zip(indices, proofs):
+        assert verify_inclusion(digests[i], i, args.leaves, path, root)
+    verify = time.perf_counter() - start
+
+    hashes = max(len(p) for p in proofs)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    print(f"Leaves: {args.leaves:,}   root: {root.hex()[:16]}…")
+    print(f"Build (incremental): {build:.2f}s total, {build / args.leaves * 1e6:.2f} µs per append")
+    print(f"Root computation  : {root_seconds * 1e6:.1f} µs")
+    print(f"Proof generation  : {prove / args.proofs * 1e6:.1f} µs per proof ({args.proofs:,} proofs)")
+    print(f"Proof verification: {verify / args.proofs * 1e6:.1f} µs per proof")
+    print(f"Proof size        : {hashes} hashes = {hashes * 32} bytes raw")
+    print(f"Peak memory       : {peak_mb:.0f} MB (includes the {args.leaves:,} input digests)")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# bench/bench_submit_votes.py
+#
+# Throughput comparison: N × POST /submit_vote versus one POST /submit_votes.
+# Runs the Flask app in-process through its test client, so no server needs
+# to be started and the numbers measure only request handling + aggregation.
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "server"))
+
+from phe import paillier
+import server
+
+
+def make_ballots(pubkey, count, distinct=16):
+    """
+    Encrypt a small set of distinct ballots and cycle through them.
+    Encryption cost is not what we are measuring here, only ingestion.
+    Each use is re-randomised by one modular multiply with a further power
+    of an encryption of zero, so the server's replay filter accepts it.
+    """
+    samples = [pubkey.encrypt(i % 2) for i in range(distinct)]
+    zero = pubkey.raw_encrypt(0)
+    ballots, r = [], 1
+    for i in range(count):
+        enc = samples[i % distinct]
+        r = r * zero % pubkey.nsquare
+        ballots.append({
+            "voter_id":   f"voter{i:06d}",
+            "ciphertext": str(enc.ciphertext() * r % pubkey.nsquare),
+            "exponent":   enc.exponent
+        })
+    expected_yes = sum(i % distinct % 2 for i in range(count))
+    return ballots, expected_yes
+
+
+def new_election(client, pubkey, election_id):
+    """Register the key under its own election namespace; returns the namespace's URL prefix."""
+    prefix = f"/elections/{election_id}"
+    resp = client.post(f"{prefix}/set_public_key", json={"n": str(pubkey.n)})
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    return prefix
+
+
+def tally(client, prefix, pubkey, privkey):
+    data = client.get(f"{prefix}/get_encrypted_tally").get_json()
+    return privkey.decrypt(paillier.EncryptedNumber(pubkey, int(data["ciphertext"]), int(data["exponent"])))
+
+
+def run_single(client, prefix, ballots):
+    start = time.perf_counter()
+    for ballot in ballots:
+        resp = client.post(f"{prefix}/submit_vote", json=ballot)
+        assert resp.status_code == 200
+    return time.perf_counter() - start
+
+
+def run_batch(client, prefix, ballots, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(ballots), batch_size):
+        resp = client.post(f"{prefix}/submit_votes", json={"ballots": ballots[i:i + batch_size]})
+        assert resp.status_code == 200
+        assert resp.get_json()["rejected"] == 0
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare /submit_vote and /submit_votes throughput.")
+    parser.add_argument("--ballots", type=int, default=2000, help="number of ballots to submit")
+    parser.add_argument("--batch-size", type=int, default=1000, help="ballots per /submit_votes request")
+    parser.add_argument("--key-size", type=int, default=2048, help="Paillier modulus size in bits")
+    args = parser.parse_args()
+
+    print(f"🔑 Generating {args.key_size}-bit Paillier keypair …")
+    pubkey, privkey = paillier.generate_paillier_keypair(n_length=args.key_size)
+    ballots, expected_yes = make_ballots(pubkey, args.ballots)
+    server.require_proofs = False  # ingestion is measured here; bench_ballot_proofs.py measures the proofs
+    client = server.app.test_client()
+
+    # Silence the per-request console lines so both paths pay the same (zero) logging cost
+    with contextlib.redirect_stdout(io.StringIO()):
+        prefix = new_election(client, pubkey, "bench-single")
+        single_seconds = run_single(client, prefix, ballots)
+        single_yes = tally(client, prefix, pubkey, privkey)
+
+        prefix = new_election(client, pubkey, "bench-batch")
+        batch_seconds = run_batch(client, prefix, ballots, args.batch_size)
+        batch_yes = tally(client, prefix, pubkey, privkey)
+
+    assert single_yes == batch_yes == expected_yes, (single_yes, batch_yes, expected_yes)
+
+    single_rate = args.ballots / single_seconds
+    batch_rate = args.ballots / batch_seconds
+    print(f"/submit_vote  : {args.ballots} ballots in {single_seconds:.3f}s → {single_rate:,.0f} ballots/s")
+    print(f"/submit_votes : {args.ballots} ballots in {batch_seconds:.3f}s → {batch_rate:,.0f} ballots/s "
+          f"(batch size {args.batch_size})")
+    print(f"Speed-up: {batch_rate / single_rate:.1f}×  (both tallies = {expected_yes} ✅)")
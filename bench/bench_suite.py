@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# bench/bench_suite.py
+#
+# End-to-end benchmark suite: for each key size it measures
+#   • crypto  – keygen, encryption, homomorphic addition and decryption latency
+#   • ingest  – POST /submit_vote latency and POST /submit_votes throughput
+#               against a running server/server.py, for each electorate size
+#   • tally   – GET /get_encrypted_tally latency plus decryption of the sum
+# and writes everything to a JSON file (sorted keys, stable layout) that can
+# be diffed between versions; --compare flags regressions against an old run.
+#
+#   python server/server.py --no-log --quiet --no-require-proofs &      # or let the suite do it: --spawn
+#   python bench/bench_suite.py --output bench/results.json
+#   python bench/bench_suite.py --key-sizes 2048 --ballots 1000 10000 --compare bench/results.json
+#
+# Ballots cycle through a small set of real encryptions (encryption is measured
+# separately), each use re-randomised by one modular multiply so the server's
+# replay filter sees distinct ciphertexts; voter ids are unique as well. They
+# carry no validity proofs, so the server runs with --no-require-proofs.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+from phe import paillier
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from common import wire
+
+RESULTS_VERSION = 1
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds."""
+    ms = sorted(s * 1000 for s in samples)
+    if len(ms) == 1:
+        return {"p50": ms[0], "p90": ms[0], "p99": ms[0], "max": ms[0], "mean": ms[0]}
+    cuts = statistics.quantiles(ms, n=100, method="inclusive")
+    return {"p50": cuts[49], "p90": cuts[89], "p99": cuts[98], "max": ms[-1], "mean": statistics.fmean(ms)}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def process_rss_mb(pid):
+    """(current, peak) resident memory of another process, from /proc; None where unavailable."""
+    try:
+        fields = dict(line.split(":", 1) for line in Path(f"/proc/{pid}/status").read_text().splitlines())
+    except (OSError, ValueError):
+        return None, None
+    current = int(fields["VmRSS"].split()[0]) / 1024 if "VmRSS" in fields else None
+    peak = int(fields["VmHWM"].split()[0]) / 1024 if "VmHWM" in fields else None
+    return current, peak
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Crypto micro-benchmarks
+# ────────────────────────────────────────────────────────────────────────────
+def bench_crypto(pubkey, privkey, samples):
+    encrypt, ciphertexts = [], []
+    for i in range(samples):
+        seconds, enc = timed(pubkey.encrypt, i % 2)
+        encrypt.append(seconds)
+        ciphertexts.append(enc.ciphertext())
+
+    # Homomorphic addition as the server does it: one raw product mod n²
+    add, product = [], 1
+    for c in ciphertexts:
+        start = time.perf_counter()
+        product = (product * c) % pubkey.nsquare
+        add.append(time.perf_counter() - start)
+
+    decrypt = []
+    for c in ciphertexts[:max(1, samples // 4)]:
+        seconds, _ = timed(privkey.decrypt, paillier.EncryptedNumber(pubkey, c, 0))
+        decrypt.append(seconds)
+
+    total = privkey.decrypt(paillier.EncryptedNumber(pubkey, product, 0))
+    assert total == samples // 2, (total, samples // 2)
+
+    return {
+        "encrypt_ms": percentiles(encrypt),
+        "add_ms": percentiles(add),
+        "decrypt_ms": percentiles(decrypt),
+        "encrypt_per_s": 1 / statistics.fmean(encrypt),
+        "add_per_s": 1 / statistics.fmean(add),
+    }, ciphertexts
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# HTTP ingest + tally against a running server
+# ────────────────────────────────────────────────────────────────────────────
+def distinct_ciphertexts(pubkey, ciphertexts, count):
+    """Cycle through `ciphertexts`, multiplying each use by a further power of an encryption of zero."""
+    zero = pubkey.raw_encrypt(0)
+    result, r = [], 1
+    for i in range(count):
+        r = r * zero % pubkey.nsquare
+        result.append(ciphertexts[i % len(ciphertexts)] * r % pubkey.nsquare)
+    return result
+
+
+def new_election(session, url, pubkey):
+    """Register the key under a fresh election namespace; returns that election's base URL."""
+    election_url = f"{url}/elections/bench-{os.urandom(4).hex()}"
+    resp = session.post(f"{election_url}/set_public_key", json={"n": str(pubkey.n)})
+    resp.raise_for_status()
+    return election_url
+
+
+def bench_single(session, url, pubkey, ciphertexts, samples):
+    """Latency of individual /submit_vote requests (JSON, one ballot each)."""
+    url = new_election(session, url, pubkey)
+    ciphertexts = distinct_ciphertexts(pubkey, ciphertexts, samples)
+    latencies = []
+    for i in range(samples):
+        ballot = {"voter_id": f"single{i:07d}", "ciphertext": str(ciphertexts[i]), "exponent": 0}
+        seconds, resp = timed(session.post, f"{url}/submit_vote", None, ballot)
+        assert resp.status_code == 200, resp.text
+        latencies.append(seconds)
+    return {"submit_vote_ms": percentiles(latencies), "submit_vote_per_s": samples / sum(latencies)}
+
+
+def bench_ingest(session, url, pubkey, privkey, ciphertexts, ballots, batch_size, server_pid):
+    """Submit `ballots` ballots in binary /submit_votes batches, then fetch and decrypt the tally."""
+    url = new_election(session, url, pubkey)
+    width = wire.ciphertext_width(pubkey.nsquare)
+    headers = {"Content-Type": wire.BALLOT_MEDIA_TYPE}
+    expected_yes = sum(i % len(ciphertexts) % 2 for i in range(ballots))
+    ciphertexts = distinct_ciphertexts(pubkey, ciphertexts, ballots)
+
+    latencies = []
+    start = time.perf_counter()
+    for first in range(0, ballots, batch_size):
+        batch = [(f"voter{i:07d}", (ciphertexts[i],), 0)
+                 for i in range(first, min(first + batch_size, ballots))]
+        body = wire.encode_ballots(batch, width)
+        seconds, resp = timed(lambda: session.post(f"{url}/submit_votes", data=body, headers=headers))
+        assert resp.status_code == 200 and resp.json()["rejected"] == 0, resp.text
+        latencies.append(seconds)
+    ingest_seconds = time.perf_counter() - start
+
+    tally_seconds, resp = timed(session.get, f"{url}/get_encrypted_tally")
+    resp.raise_for_status()
+    data = resp.json()
+    decrypt_seconds, yes = timed(privkey.decrypt, paillier.EncryptedNumber(pubkey, int(data["ciphertext"]), 0))
+    assert data["ballot_count"] == ballots and yes == expected_yes, (data["ballot_count"], yes, expected_yes)
+
+    result = {
+        "submit_votes_batch_ms": percentiles(latencies),
+        "ingest_s": ingest_seconds,
+        "ingest_per_s": ballots / ingest_seconds,
+        "tally_fetch_ms": tally_seconds * 1000,
+        "tally_decrypt_ms": decrypt_seconds * 1000,
+    }
+    if server_pid is not None:
+        result["server_rss_mb"], result["server_peak_rss_mb"] = process_rss_mb(server_pid)
+    return result
+
+
+def wait_for_server(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{url}/merkle/root", timeout=1)
+            return True
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    return False
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Regression check: flatten both result files and compare metric by metric
+# ────────────────────────────────────────────────────────────────────────────
+def flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, current, tolerance):
+    """Print metrics that got worse by more than `tolerance`; return how many did."""
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    regressions = 0
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        if before <= 0:
+            continue
+        higher_is_better = name.endswith("_per_s")
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions += 1
+            print(f"❌ {name}: {before:,.3f} → {after:,.3f} ({change:+.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark crypto, HTTP ingest and tally across key and electorate sizes.")
+    parser.add_argument("--server", default="http://127.0.0.1:5000", help="base URL of a running server/server.py")
+    parser.add_argument("--spawn", action="store_true", help="start server/server.py --no-log --quiet for the run")
+    parser.add_argument("--server-pid", type=int, help="pid of an already running server, to record its memory")
+    parser.add_argument("--key-sizes", type=int, nargs="+", default=[2048, 3072, 4096])
+    parser.add_argument("--ballots", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000],
+                        help="electorate sizes to ingest and tally")
+    parser.add_argument("--batch-size", type=int, default=1000, help="ballots per /submit_votes request")
+    parser.add_argument("--crypto-samples", type=int, default=200, help="encryptions timed per key size")
+    parser.add_argument("--single-samples", type=int, default=500, help="/submit_vote requests timed per key size")
+    parser.add_argument("--output", default=str(ROOT / "bench" / "results.json"))
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    url = args.server.rstrip("/")
+    server_process = None
+    server_pid = args.server_pid
+    if args.spawn:
+        server_process = subprocess.Popen([sys.executable, str(ROOT / "server" / "server.py"), "--no-log", "--quiet",
+                                           "--no-require-proofs"],
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        server_pid = server_process.pid
+    if not wait_for_server(url):
+        print(f"❌ No server reachable at {url} (start server/server.py or pass --spawn).")
+        sys.exit(1)
+
+    session = requests.Session()
+    results = {}
+    try:
+        for key_size in args.key_sizes:
+            print(f"🔑 {key_size}-bit key")
+            keygen_seconds, (pubkey, privkey) = timed(paillier.generate_paillier_keypair, None, key_size)
+            crypto, ciphertexts = bench_crypto(pubkey, privkey, args.crypto_samples)
+            crypto["keygen_ms"] = keygen_seconds * 1000
+            print(f"   encrypt p50 {crypto['encrypt_ms']['p50']:.2f} ms, "
+                  f"add p50 {crypto['add_ms']['p50'] * 1000:.1f} µs, "
+                  f"decrypt p50 {crypto['decrypt_ms']['p50']:.2f} ms")
+
+            single = bench_single(session, url, pubkey, ciphertexts, args.single_samples)
+            print(f"   /submit_vote p50 {single['submit_vote_ms']['p50']:.2f} ms, "
+                  f"p99 {single['submit_vote_ms']['p99']:.2f} ms")
+
+            ingest = {}
+            for ballots in args.ballots:
+                ingest[str(ballots)] = run = bench_ingest(session, url, pubkey, privkey, ciphertexts,
+                                                          ballots, args.batch_size, server_pid)
+                print(f"   {ballots:>9,} ballots: {run['ingest_per_s']:>9,.0f} ballots/s, "
+                      f"tally {run['tally_fetch_ms'] + run['tally_decrypt_ms']:.1f} ms")
+
+            results[str(key_size)] = {"crypto": crypto, "http": single, "ingest": ingest}
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait()
+
+    report = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                         capture_output=True, text=True).stdout.strip() or None,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "batch_size": args.batch_size,
+            "bench_peak_rss_mb": peak_rss_mb(),
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"❌ {regressions} metric(s) regressed by more than {args.tolerance:.0%} against {args.compare}.")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.compare}.")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# bench/bench_wire_format.py
+#
+# Serialization cost per ballot, JSON (decimal strings) versus the compact
+# binary frame in common/wire.py, for each key size. Ciphertexts are random
+# integers below n², which is all serialization cares about.
+
+import argparse
+import json
+import secrets
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import wire
+
+
+def time_per_item(fn, items, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items)
+
+
+def json_encode(ballot):
+    voter_id, ciphertexts, exponent = ballot
+    return json.dumps({"voter_id": voter_id, "ciphertext": str(ciphertexts[0]), "exponent": exponent}).encode()
+
+
+def json_decode(body):
+    data = json.loads(body)
+    return data["voter_id"], (int(data["ciphertext"]),), int(data["exponent"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs binary ciphertext encoding.")
+    parser.add_argument("--key-sizes", type=int, nargs="+", default=[2048, 3072, 4096])
+    parser.add_argument("--ballots", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'key':>6} | {'format':>6} | {'bytes':>6} | {'encode µs':>10} | {'decode µs':>10}")
+    print("-" * 52)
+    for key_size in args.key_sizes:
+        nsquare_bits = 2 * key_size
+        width = (nsquare_bits + 7) // 8
+        ballots = [(f"voter{i:06d}", (secrets.randbits(nsquare_bits),), 0) for i in range(args.ballots)]
+
+        json_bodies = [json_encode(b) for b in ballots]
+        bin_bodies = [wire.encode_ballots([b], width) for b in ballots]
+        for b, body in zip(ballots, bin_bodies):
+            assert wire.decode_ballots(body, width)[0] == b
+
+        rows = [
+            ("json", json_bodies, time_per_item(json_encode, ballots, args.repeat),
+             time_per_item(json_decode, json_bodies, args.repeat)),
+            ("binary", bin_bodies, time_per_item(lambda b: wire.encode_ballots([b], width), ballots, args.repeat),
+             time_per_item(lambda body: wire.decode_ballots(body, width), bin_bodies, args.repeat)),
+        ]
+        for name, bodies, enc, dec in rows:
+            size = sum(len(b) for b in bodies) / len(bodies)
+            print(f"{key_size:>6} | {name:>6} | {size:>6.0f} | {enc * 1e6:>10.2f} | {dec * 1e6:>10.2f}")
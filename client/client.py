@@ -1,10 +1,16 @@
 from pathlib import Path
 import sys, uuid, json
-from phe import paillier
 import os, hashlib
-from phe import paillier
 import requests
-from random import SystemRandom
+import argparse, time
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import wire, ballot_proof, bigint, keyfile
+from common.batch_decrypt import decrypt_many
+from common.packing import BallotLayout, REFERENDUM, commitment_value, print_results
+
+from randomness_pool import RandomnessPool
+from kiosk_pipeline import KioskPipeline
 
 
 
@@ -24,35 +30,74 @@ def authenticate_voter(voter_id: str, pin: str) -> bool:
     return (voter is not None) and (voter["pin"] == pin)
 
 # ─────────────────────────────────────────────────────────────────────
-# STEP 1.2: Ask the user for vote input ("yes"/"no") and return 1 or 0
+# Ballot definition: the contests on the ballot. All options are packed
+# into as few ciphertexts as possible (common/packing.py). For example:
+#   [{"name": "referendum", "options": ["yes"], "remainder": "no"},
+#    {"name": "mayor", "options": ["alice", "bob", "carol"]}]
+# ─────────────────────────────────────────────────────────────────────
+BALLOT_CONTESTS = REFERENDUM
+
+# ─────────────────────────────────────────────────────────────────────
+# STEP 1.2: Ask the user for their choice in one contest (e.g. "yes"/"no")
 # ─────────────────────────────────────────────────────────────────────
-def get_vote_input():
+def get_vote_input(contest, label="Vote"):
+    choices = contest["options"] + ([contest["remainder"]] if "remainder" in contest else [])
     while True:
-        vote = input("Vote (yes/no): ").strip().lower()
-        if vote in ("yes", "no"):
-            return 1 if vote == "yes" else 0
-        print("Please type 'yes' or 'no'.")
+        vote = input(f"{label} ({'/'.join(choices)}): ").strip().lower()
+        if vote in choices:
+            return vote
+        print(f"Please type one of: {', '.join(repr(c) for c in choices)}.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Voting kiosk: authenticate voters, encrypt and submit their ballots.")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="encrypt and upload each ballot in the background while the next voter authenticates "
+                             "(ballots wait in outbox/ until the server acknowledges them)")
+    parser.add_argument("--new-key", action="store_true",
+                        help="generate a fresh keypair (a new election) instead of loading the one in keys/")
+    args = parser.parse_args()
+
     # ─────────────────────────────────────────────────────────────────
     # STEP 0 (already executed at import): pubkey, privkey = generate_paillier_keypair()
     # STEP 0.2 (already executed at import): sent pubkey to /set_public_key
     # ─────────────────────────────────────────────────────────────────
     # ─────────────────────────────────────────────────────────────────────
-    # STEP 0.1: Generate Paillier keypair on the kiosk
+    # STEP 0.1: Load the election's Paillier keypair from keys/ (generate and
+    # save one, searching for primes in parallel, if there is none yet)
     # ─────────────────────────────────────────────────────────────────────
-    pubkey, privkey = paillier.generate_paillier_keypair()
-    print("🔑 Generated new Paillier keypair on client.")
+    keys_dir = Path(__file__).parent.parent / "keys"
+    key_start = time.perf_counter()
+    if keyfile.key_paths(keys_dir) is not None and not args.new_key:
+        pubkey, privkey = keyfile.load_keypair(keys_dir)
+        print(f"🔑 Loaded {pubkey.n.bit_length()}-bit Paillier keypair from keys/ "
+              f"in {1000 * (time.perf_counter() - key_start):.1f} ms.")
+    else:
+        pubkey, privkey = bigint.generate_paillier_keypair(processes=os.cpu_count())
+        keyfile.save_keypair(keys_dir, pubkey, privkey)
+        print(f"🔑 Generated new {pubkey.n.bit_length()}-bit Paillier keypair on client and saved it in keys/ "
+              f"in {time.perf_counter() - key_start:.2f} s ({bigint.NAME} big-integer backend).")
+
+    # Slot sizes come from the number of registered voters, so counters never overflow
+    layout = BallotLayout(BALLOT_CONTESTS, len(REGISTERED_VOTERS), pubkey.n)
+    print(f"🗳️ Ballot: {len(layout.slots)} option(s) packed into {layout.num_ciphertexts} ciphertext(s).")
+
+    # Start precomputing encryption randomness while the kiosk waits for voters
+    # (room for a few ballots' worth: one factor per slot ciphertext and per proof branch)
+    per_ballot = ballot_proof.factors_per_ballot(layout)
+    randomness_pool = RandomnessPool(pubkey, capacity=max(64, 4 * per_ballot), low_water=max(16, per_ballot)).start()
 
     # ─────────────────────────────────────────────────────────────────────
     # STEP 0.2: Immediately send pubkey to server so it can accept encrypted votes
     # ─────────────────────────────────────────────────────────────────────
-    pub_payload = {"n": str(pubkey.n)}
+    pub_payload = {"n": str(pubkey.n), "ballot_layout": layout.to_dict()}
     try:
         r = requests.post("http://localhost:5000/set_public_key", json=pub_payload)
         if r.status_code == 200:
             print("✅ Public key registered with server.")
+            # Use the compact binary ballot encoding if the server advertises it
+            use_binary = wire.BALLOT_MEDIA_TYPE in r.json().get("wire_formats", [])
+            ct_width = wire.ciphertext_width(pubkey.nsquare)
         else:
             print("❌ Server returned", r.status_code, "when registering public key.")
             sys.exit(1)
@@ -60,6 +105,17 @@ if __name__ == "__main__":
         print("❌ Failed to register public key:", e)
         sys.exit(1)
 
+    # Pipelined mode: a background worker encrypts, saves and uploads each ballot
+    # (retrying over one keep-alive session), so the next voter can start at once
+    pipeline = None
+    if args.pipelined:
+        project_root = Path(__file__).parent.parent
+        pipeline = KioskPipeline(pubkey, layout, randomness_pool, use_binary=use_binary,
+                                 outbox_dir=project_root / "outbox", votes_dir=project_root / "votes",
+                                 commit_dir=project_root / "commitments").start()
+        print("🚀 Pipelined kiosk: ballots are encrypted and uploaded in the background (outbox/).")
+    turnaround = []  # vote entered → kiosk ready for the next voter, in seconds
+
     # ─────────────────────────────────────────────────────────────────────
     # STEP 1: Loop over all hard-coded voters
     # ─────────────────────────────────────────────────────────────────────
@@ -76,49 +132,97 @@ if __name__ == "__main__":
         print(f"✅ Voter '{voter_id}' authenticated successfully.\n")
 
         # ─────────────────────────────────────────────────────────────────
-        # STEP 1.2: Get and map vote
+        # STEP 1.2: Get and map vote (one choice per contest → packed plaintexts)
         # ─────────────────────────────────────────────────────────────────
-        vote_int = get_vote_input()
-        print(f"✅ You entered '{'yes' if vote_int else 'no'}' → mapped to {vote_int}.")
+        choices = {}
+        for contest in BALLOT_CONTESTS:
+            label = "Vote" if len(BALLOT_CONTESTS) == 1 else contest["name"]
+            choices[contest["name"]] = get_vote_input(contest, label)
+        plaintexts = layout.encode(choices)
+        vote_int = commitment_value(plaintexts)
+        print(f"✅ You entered {choices} → mapped to {vote_int}.")
+        voted_at = time.perf_counter()
+
+        if pipeline is not None:
+            # STEP 1.3–1.7 run on the pipeline's worker; STEP 1.8: drop our references
+            pipeline.submit(voter_id, plaintexts, vote_int)
+            vote_int = plaintexts = choices = None
+            turnaround.append(time.perf_counter() - voted_at)
+            print(f"✅ Ballot for voter '{voter_id}' queued for encryption and upload.")
+            print(f"⏱️ Kiosk ready for the next voter after {1000 * turnaround[-1]:.1f} ms.\n")
+            continue
 
         # ─────────────────────────────────────────────────────────────────
         # STEP 1.3: Encrypt the vote under the freshly generated pubkey
+        #           (obfuscation factor r^n comes from the precomputed pool)
+        #           and prove it valid (every slot 0/1, at most one choice per
+        #           contest) without revealing the choices, bound to the voter id
         # ─────────────────────────────────────────────────────────────────
-        sysrand = SystemRandom()
-        enc_vote    = pubkey.encrypt(vote_int)
-        ciphertext  = enc_vote.ciphertext()
-        exponent    = enc_vote.exponent
+        ciphertexts, proof = ballot_proof.prove_ballot(pubkey.n, layout, plaintexts, voter_id.encode(),
+                                                       randomness_pool.encrypt_with_randomness,
+                                                       randomness_pool.take)
+        exponent    = 0
 
         # Build a unique ID for this vote (used on disk and/or server logs)
         vote_id_uuid = uuid.uuid4().hex
 
-        # Create a JSON payload including voter_id, so the server knows who cast it
-        vote_payload = {
-            "voter_id":   voter_id,                  # <-- include voter_id in payload
-            "ciphertext": str(ciphertext),
-            "exponent":   exponent
-        }
+        # Create a payload including voter_id, so the server knows who cast it:
+        # a fixed-width binary frame if negotiated, otherwise JSON with a decimal string
+        # (either way with the proof)
+        if use_binary:
+            vote_payload = wire.encode_ballots([(voter_id, ciphertexts, exponent, proof)], ct_width)
+        else:
+            vote_payload = {
+                "voter_id":   voter_id,                  # <-- include voter_id in payload
+                "exponent":   exponent
+            }
+            if len(ciphertexts) == 1:
+                vote_payload["ciphertext"] = str(ciphertexts[0])
+            else:
+                vote_payload["ciphertexts"] = [str(c) for c in ciphertexts]
+            vote_payload.update(ballot_proof.ballot_to_json(proof))
 
         # ─────────────────────────────────────────────────────────────────
         # STEP 1.4: Write encrypted vote locally (optional backup)
         # ─────────────────────────────────────────────────────────────────
         votes_dir = Path(__file__).parent.parent / "votes"
         votes_dir.mkdir(exist_ok=True)
-        vote_file_path = votes_dir / f"{vote_id_uuid}.json"
-        with open(vote_file_path, "w") as f:
-            json.dump(vote_payload, f)
+        if use_binary:
+            vote_file_path = votes_dir / f"{vote_id_uuid}.bin"
+            with open(vote_file_path, "wb") as f:
+                f.write(vote_payload)
+        else:
+            vote_file_path = votes_dir / f"{vote_id_uuid}.json"
+            with open(vote_file_path, "w") as f:
+                json.dump(vote_payload, f)
         print(f"✅ Encrypted vote saved locally to votes/{vote_file_path.name}")
 
     # ─────────────────────────────────────────────────────────────────
     # STEP 1.5: Immediately POST encrypted vote to server
     # ─────────────────────────────────────────────────────────────────
         try:
-            resp = requests.post(
-                "http://localhost:5000/submit_vote",  # adjust URL if needed
-                json=vote_payload
-            )
+            if use_binary:
+                resp = requests.post(
+                    "http://localhost:5000/submit_vote",  # adjust URL if needed
+                    data=vote_payload,
+                    headers={"Content-Type": wire.BALLOT_MEDIA_TYPE}
+                )
+            else:
+                resp = requests.post(
+                    "http://localhost:5000/submit_vote",  # adjust URL if needed
+                    json=vote_payload
+                )
             if resp.status_code == 200:
                 print("✅ Encrypted vote SENT to server (POST /submit_vote).")
+            elif resp.status_code == 409:
+                # The keypair (and so the election) carries over between kiosk runs: this voter
+                # already voted in an earlier run. Drop the uncounted local copy and move on.
+                vote_file_path.unlink(missing_ok=True)
+                print(f"⚠️ Voter '{voter_id}' has already voted in this election; ballot not counted "
+                      f"(start a new election with --new-key).\n")
+                # STEP 1.8 for the rejected ballot: drop the choices, plaintexts and proof
+                vote_int = ciphertexts = plaintexts = choices = proof = vote_payload = None
+                continue
             else:
                 print(f"❌ Server returned {resp.status_code} when sending vote.")
                 print("    Response body:", resp.text)
@@ -150,7 +254,8 @@ if __name__ == "__main__":
         commit_payload = {
             "voter_id":   voter_id,
             "commitment": commitment,
-            "salt":       salt
+            "salt":       salt,
+            "vote_id":    vote_id_uuid             # lets the voter fetch a Merkle inclusion proof
         }
         try:
             resp2 = requests.post(
@@ -159,6 +264,12 @@ if __name__ == "__main__":
             )
             if resp2.status_code == 200:
                 print("✅ Commitment SENT to server (POST /submit_commitment).")
+            elif resp2.status_code == 409:
+                # The ballot is counted, but the server already holds a commitment from this
+                # voter (or with this vote id); that one stays on record, so drop the local copy.
+                commit_file_path.unlink(missing_ok=True)
+                print(f"⚠️ Server already has a commitment from voter '{voter_id}'; keeping that one "
+                      f"({resp2.json().get('error', resp2.text)}).")
             else:
                 print(f"❌ Server returned {resp2.status_code} when sending commitment.")
                 print("    Response body:", resp2.text)
@@ -171,51 +282,75 @@ if __name__ == "__main__":
         # STEP 1.8: Clear sensitive variables from memory
         # ─────────────────────────────────────────────────────────────────
         vote_int       = None
-        ciphertext     = None
+        ciphertexts    = None
+        plaintexts     = None
+        choices        = None
         exponent       = None
         salt           = None
         commitment     = None
         vote_payload   = None
         commit_payload = None
-        enc_vote       = None
+        proof          = None
 
-        print(f"✅ Completed processing for voter '{voter_id}'.\n")
+        turnaround.append(time.perf_counter() - voted_at)
+        print(f"✅ Completed processing for voter '{voter_id}'.")
+        print(f"⏱️ Kiosk ready for the next voter after {1000 * turnaround[-1]:.1f} ms.\n")
 
     # ───────────────────────────────────────────────────────────────────────────
     # STEP 3: Request the encrypted tally from server and decrypt it locally,
-    # including counting “No” votes and determining the majority.
+    # unpacking every contest's counters and determining the majority.
     # ───────────────────────────────────────────────────────────────────────────
+    if pipeline is not None:
+        print("⏳ Waiting for queued ballots to reach the server...")
+        undelivered = pipeline.close(timeout=60)
+        stats = pipeline.stats()
+        print(f"📤 Pipeline: {stats['delivered']} ballot(s) delivered, {stats['retries']} retries, "
+              f"{stats['rejected']} rejected; mean hand-off to acknowledged {stats.get('latency_ms_mean', 0.0):.1f} ms.")
+        if undelivered:
+            print(f"⚠️ {undelivered} ballot(s) still in outbox/; they are resent the next time the kiosk starts.")
+    if turnaround:
+        print(f"⏱️ Voter-to-voter turnaround ({'pipelined' if pipeline is not None else 'sequential'}): "
+              f"mean {1000 * sum(turnaround) / len(turnaround):.1f} ms, max {1000 * max(turnaround):.1f} ms.")
+
+    randomness_pool.stop()
+    pool_stats = randomness_pool.stats()
+    print(f"🎲 Randomness pool: {pool_stats['hits']} hit(s), {pool_stats['misses']} miss(es); "
+          f"mean encryption latency {pool_stats.get('latency_ms_mean', 0.0):.2f} ms.")
+
     print("=== All voters done. Requesting encrypted tally from server. ===")
     try:
         # 3.1: Fetch the encrypted sum (ciphertext + exponent) via HTTP GET
-        resp = requests.get("http://localhost:5000/get_encrypted_tally")
+        resp = requests.get(
+            "http://localhost:5000/get_encrypted_tally",
+            headers={"Accept": f"{wire.TALLY_MEDIA_TYPE}, application/json;q=0.5"}
+        )
         if resp.status_code != 200:
             print("❌ Error retrieving tally:", resp.text)
             sys.exit(1)
 
-        data = resp.json()
-        # data should look like: { "ciphertext": "<big-int-string>", "exponent": <int> }
-        ct_sum = int(data["ciphertext"])
-        exp_sum = int(data["exponent"])
+        if resp.headers.get("Content-Type", "").startswith(wire.TALLY_MEDIA_TYPE):
+            ct_sums, exp_sum = wire.decode_tally(resp.content)
+            ballot_count = int(resp.headers["X-Ballot-Count"])
+        else:
+            data = resp.json()
+            # data should look like: { "ciphertexts": ["<big-int-string>", ...], "exponent": <int>, "ballot_count": <int>, ... }
+            ct_sums = [int(c) for c in data.get("ciphertexts", [data["ciphertext"]])]
+            exp_sum = int(data["exponent"])
+            ballot_count = int(data["ballot_count"])
 
-        # 3.2: Reconstruct the EncryptedNumber under the same pubkey
-        encrypted_sum = paillier.EncryptedNumber(pubkey, ct_sum, exp_sum)
+        # 3.2: The sums are integer tallies (exponent 0)
+        if exp_sum != 0:
+            raise ValueError(f"unexpected tally exponent {exp_sum}")
 
-        # 3.3: Decrypt the sum with the private key → total number of “Yes” votes
-        total_yes = privkey.decrypt(encrypted_sum)
+        # 3.3: Decrypt the sums with the private key (CRT, big-integer backend) → packed per-option counters
+        totals = decrypt_many(privkey, ct_sums, processes=1)
 
-        # 3.4: Compute total number of voters and the number of “No” votes
-        total_voters = len(REGISTERED_VOTERS)
-        total_no = total_voters - total_yes
+        # 3.4: Unpack the counters; a contest's remainder (e.g. "No") is the ballots counted minus the rest
+        results = layout.decode(totals, ballot_count)
 
-        # 3.5: Print both counts and indicate which side has the majority
-        print(f"🗳️ Final tally: Yes = {total_yes}, No = {total_no}  (out of {total_voters} voters)")
-        if total_yes > total_no:
-            print("🏆 Outcome: Majority chose 'Yes'.")
-        elif total_no > total_yes:
-            print("🏆 Outcome: Majority chose 'No'.")
-        else:
-            print("🏆 Outcome: It's a tie.")
+        # 3.5: Print the counts and indicate which side has the majority in each contest
+        print(f"🗳️ Final tally ({ballot_count} ballot(s) counted, {len(REGISTERED_VOTERS)} registered voters):")
+        print_results(results)
     except Exception as e:
         print("❌ Failed to get or decrypt final tally:", e)
         sys.exit(1)
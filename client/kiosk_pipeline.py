@@ -0,0 +1,291 @@
+# client/kiosk_pipeline.py
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import requests
+
+from common import wire, ballot_proof
+
+RETRY_STATUSES = (429, 502, 503, 504)  # worth retrying; any other error is a rejection
+MAX_BACKOFF = 30.0                     # seconds between retries of an unreachable server
+
+
+def key_fingerprint(pubkey):
+    """Short id of the public key a ballot was encrypted under (outbox entries from another key are not resent)."""
+    return hashlib.sha256(str(pubkey.n).encode()).hexdigest()[:16]
+
+
+class Outbox:
+    """
+    Durable directory of ballots the server has not acknowledged yet, one
+    JSON file per ballot (written to a temporary file, fsynced, then renamed,
+    so an entry is either complete or absent). Ballots the server refused
+    are moved to rejected/ for the operator.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.rejected_dir = self.directory / "rejected"
+        self.rejected_dir.mkdir(parents=True, exist_ok=True)
+
+    def put(self, entry):
+        path = self.directory / f"{entry['vote_id']}.json"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def remove(self, vote_id):
+        (self.directory / f"{vote_id}.json").unlink(missing_ok=True)
+
+    def reject(self, vote_id):
+        os.replace(self.directory / f"{vote_id}.json", self.rejected_dir / f"{vote_id}.json")
+
+    def pending(self):
+        """Entries left over from an earlier run, oldest first."""
+        paths = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        return [json.loads(p.read_text()) for p in paths]
+
+
+class KioskPipeline:
+    """
+    Pipelined kiosk session: the kiosk hands each authenticated voter's
+    plaintexts to submit() and can take the next voter straight away, while a
+    background worker encrypts the ballot (pooled randomness, validity proofs
+    for JSON ballots), writes votes/<uuid> and commitments/<uuid>_commit.json,
+    records it in the outbox and uploads vote and commitment over one
+    keep-alive session.
+
+    - Uploads are retried with exponential backoff (or the server's
+      Retry-After on 429) until the server answers; the outbox entry is
+      removed only once both are acknowledged, and records which of the two
+      is still due.
+    - A ballot left in the outbox (kiosk stopped while the server was
+      unreachable) is resent the next time a pipeline starts with the same
+      public key.
+    - 409 on a retry means an earlier attempt got through and only the reply
+      was lost, so it counts as delivered.
+    - A ballot is durable once it is in the outbox; submit() only queues it
+      in memory, so close() waits for the queue to drain.
+    """
+
+    def __init__(self, pubkey, layout, randomness_pool, url="http://localhost:5000", use_binary=False,
+                 outbox_dir="outbox", votes_dir="votes", commit_dir="commitments", verbose=True):
+        self.pubkey = pubkey
+        self.layout = layout
+        self.randomness_pool = randomness_pool
+        self.url = url
+        self.use_binary = use_binary
+        self.ct_width = wire.ciphertext_width(pubkey.nsquare)
+        self.outbox = Outbox(outbox_dir)
+        self.votes_dir = Path(votes_dir)
+        self.commit_dir = Path(commit_dir)
+        self.votes_dir.mkdir(exist_ok=True)
+        self.commit_dir.mkdir(exist_ok=True)
+        self.verbose = verbose
+        self.key = key_fingerprint(pubkey)
+
+        self.handed_off = 0
+        self.delivered = 0
+        self.resent = 0
+        self.retries = 0
+        self.rejected = 0
+        self.latencies = []  # submit() to both uploads acknowledged, in seconds
+
+        self._session = requests.Session()
+        self._jobs = queue.Queue()
+        self._give_up = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="kiosk-pipeline", daemon=True)
+
+    def start(self):
+        """Start the worker, first resending whatever an earlier run left in the outbox."""
+        stale = 0
+        for entry in self.outbox.pending():
+            if entry["key"] == self.key:
+                self._jobs.put(("resend", entry, time.perf_counter()))
+            else:
+                stale += 1
+        if stale and self.verbose:
+            print(f"⚠️ {stale} ballot(s) in {self.outbox.directory} were encrypted under another public key; "
+                  "leaving them there.")
+        self._thread.start()
+        return self
+
+    def submit(self, voter_id, plaintexts, vote_int):
+        """Hand off an authenticated voter's packed plaintexts; returns immediately."""
+        self.handed_off += 1
+        self._jobs.put(("ballot", (voter_id, plaintexts, vote_int), time.perf_counter()))
+
+    def flush(self):
+        """Block until every ballot handed off so far is delivered (or rejected)."""
+        self._jobs.join()
+
+    def close(self, timeout=None):
+        """
+        Let the worker finish the queue (retrying for up to `timeout` seconds,
+        forever if None), then stop it. Returns the number of ballots still
+        waiting in the outbox.
+        """
+        self._jobs.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self._give_up.set()  # stop retrying: what is left stays in the outbox
+            self._thread.join()
+        self._session.close()
+        return len(self.outbox.pending())
+
+    def stats(self):
+        """Delivery counters and background (hand-off to acknowledged) latency summary in milliseconds."""
+        latencies = sorted(self.latencies)
+        summary = {
+            "handed_off": self.handed_off,
+            "delivered": self.delivered,
+            "resent": self.resent,
+            "retries": self.retries,
+            "rejected": self.rejected,
+        }
+        if latencies:
+            summary["latency_ms_mean"] = 1000 * sum(latencies) / len(latencies)
+            summary["latency_ms_p50"] = 1000 * latencies[len(latencies) // 2]
+            summary["latency_ms_max"] = 1000 * latencies[-1]
+        return summary
+
+    # ─────────────────────────────────────────────────────────────────
+    # Worker
+    # ─────────────────────────────────────────────────────────────────
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    return
+                kind, payload, handed_at = job
+                if kind == "ballot":
+                    entry = self._prepare(*payload)
+                    self.outbox.put(entry)
+                    first_attempt = True
+                else:
+                    entry = payload
+                    first_attempt = False  # may have reached the server before the kiosk stopped
+                if self._give_up.is_set():
+                    continue  # close() timed out: leave it in the outbox for the next run
+                if kind == "resend":
+                    self.resent += 1
+                if self._deliver(entry, first_attempt):
+                    self.delivered += 1
+                    self.latencies.append(time.perf_counter() - handed_at)
+            except Exception as e:
+                print(f"❌ Kiosk pipeline error: {e}")
+            finally:
+                self._jobs.task_done()
+
+    def _prepare(self, voter_id, plaintexts, vote_int):
+        # Encrypt (obfuscation factors from the pool) and prove the ballot valid
+        vote_id_uuid = uuid.uuid4().hex
+        ciphertexts, proof = ballot_proof.prove_ballot(self.pubkey.n, self.layout, plaintexts, voter_id.encode(),
+                                                       self.randomness_pool.encrypt_with_randomness,
+                                                       self.randomness_pool.take)
+        if self.use_binary:
+            frame = wire.encode_ballots([(voter_id, ciphertexts, 0, proof)], self.ct_width)
+            (self.votes_dir / f"{vote_id_uuid}.bin").write_bytes(frame)
+            vote = {"frame": frame.hex()}
+        else:
+            vote = {"voter_id": voter_id, "exponent": 0}
+            if len(ciphertexts) == 1:
+                vote["ciphertext"] = str(ciphertexts[0])
+            else:
+                vote["ciphertexts"] = [str(c) for c in ciphertexts]
+            vote.update(ballot_proof.ballot_to_json(proof))
+            with open(self.votes_dir / f"{vote_id_uuid}.json", "w") as f:
+                json.dump(vote, f)
+
+        # Commitment to the vote, kept locally so the voter can verify it later
+        salt = os.urandom(16).hex()
+        commitment = hashlib.sha256(f"{vote_int}{salt}".encode()).hexdigest()
+        with open(self.commit_dir / f"{vote_id_uuid}_commit.json", "w") as f:
+            json.dump({"voter_id": voter_id, "commitment": commitment, "salt": salt}, f)
+
+        return {
+            "vote_id": vote_id_uuid,
+            "voter_id": voter_id,
+            "key": self.key,
+            "stage": "vote",
+            "vote": vote,
+            "commitment": {"voter_id": voter_id, "commitment": commitment, "salt": salt, "vote_id": vote_id_uuid},
+        }
+
+    def _deliver(self, entry, first_attempt):
+        """Upload what the entry still owes the server; True once both parts are acknowledged."""
+        if entry["stage"] == "vote":
+            if "frame" in entry["vote"]:
+                sent = self._post("/submit_vote", entry, first_attempt, data=bytes.fromhex(entry["vote"]["frame"]),
+                                  headers={"Content-Type": wire.BALLOT_MEDIA_TYPE})
+            else:
+                sent = self._post("/submit_vote", entry, first_attempt, json=entry["vote"])
+            if not sent:
+                return False
+            entry["stage"] = "commitment"
+            self.outbox.put(entry)
+            first_attempt = True
+        if not self._post("/submit_commitment", entry, first_attempt, json=entry["commitment"]):
+            return False
+        self.outbox.remove(entry["vote_id"])
+        return True
+
+    def _post(self, path, entry, first_attempt, **kwargs):
+        delay = 0.5
+        while True:
+            try:
+                resp = self._session.post(self.url + path, timeout=(3, 30), **kwargs)
+            except requests.RequestException as e:
+                resp, reason = None, type(e).__name__
+            else:
+                if resp.status_code == 200 or (resp.status_code == 409 and not first_attempt):
+                    return True
+                if resp.status_code == 409 and path == "/submit_commitment":
+                    # The ballot is counted; the server already holds a commitment from this voter
+                    # (or with this vote id), which stays the one on record
+                    print(f"⚠️ Server already has a commitment from voter '{entry['voter_id']}'; "
+                          f"keeping that one ({resp.text.strip()}).")
+                    return True
+                if resp.status_code not in RETRY_STATUSES:
+                    self.rejected += 1
+                    self.outbox.reject(entry["vote_id"])
+                    if resp.status_code == 409 and path == "/submit_vote":
+                        # Voted in an earlier kiosk run under the same key: the local copies are not counted
+                        for stale in [*self.votes_dir.glob(f"{entry['vote_id']}.*"),
+                                      self.commit_dir / f"{entry['vote_id']}_commit.json"]:
+                            stale.unlink(missing_ok=True)
+                        print(f"⚠️ Voter '{entry['voter_id']}' has already voted in this election; ballot not "
+                              f"counted (moved to {self.outbox.rejected_dir}).")
+                    else:
+                        print(f"❌ Server returned {resp.status_code} for {path} (voter '{entry['voter_id']}'); "
+                              f"ballot moved to {self.outbox.rejected_dir}: {resp.text.strip()}")
+                    return False
+                reason = f"HTTP {resp.status_code}"
+
+            wait = delay
+            if resp is not None and resp.headers.get("Retry-After", "").isdigit():
+                wait = int(resp.headers["Retry-After"])
+            if self.verbose:
+                print(f"⚠️ {path} for voter '{entry['voter_id']}' failed ({reason}); retrying in {wait:.1f}s.")
+            if self._give_up.wait(wait):
+                return False
+            self.retries += 1
+            first_attempt = False
+            delay = min(2 * delay, MAX_BACKOFF)
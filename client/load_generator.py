@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# client/load_generator.py
+#
+# Non-interactive load generator: synthesizes N voters with a chosen yes/no
+# split, encrypts their ballots and proves them valid in a process pool
+# (--no-proofs skips the proofs, for a server run with --no-require-proofs),
+# submits them from many
+# concurrent workers over keep-alive connections, then decrypts the tally
+# and checks it against the generated ground truth. With --segments the
+# voters are spread over that many precincts, and every precinct's tally is
+# decrypted in one batch and checked as well. Each run registers its key in
+# a fresh election namespace (/elections/load-<random>/), so runs against the
+# same server never collide on voter ids or commitments.
+#
+#   python server/server.py --no-log --quiet &
+#   python client/load_generator.py --voters 100000 --yes-fraction 0.6 --concurrency 32 --batch-size 500
+
+import argparse
+import hashlib
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from phe import paillier
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import ballot_proof, bigint, wire
+from common.batch_decrypt import decrypt_many
+from common.packing import BallotLayout, REFERENDUM, commitment_value, print_results
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Encryption workers (one public key per process, set by the initializer)
+# ─────────────────────────────────────────────────────────────────────
+_worker_pubkey = None
+_worker_layout = None  # BallotLayout to prove ballots against (None = no proofs)
+
+
+def _init_worker(n, layout):
+    global _worker_pubkey, _worker_layout
+    _worker_pubkey = paillier.PaillierPublicKey(n)
+    _worker_layout = BallotLayout.from_dict(layout, n) if layout is not None else None
+
+
+def _encrypt_with_randomness(plaintext):
+    r = secrets.randbelow(_worker_pubkey.n - 1) + 1
+    return bigint.encrypt(_worker_pubkey, plaintext, r), r
+
+
+def _encrypt_chunk(ballots):
+    """
+    Encrypt a chunk of (voter_id, packed plaintexts) ballots; returns
+    (ciphertexts, ballot proof or None) for each.
+    """
+    if _worker_layout is None:
+        return [(tuple(bigint.encrypt(_worker_pubkey, p) for p in plaintexts), None) for _, plaintexts in ballots]
+    result = []
+    for voter_id, plaintexts in ballots:
+        ciphertexts, proof = ballot_proof.prove_ballot(_worker_pubkey.n, _worker_layout, plaintexts, voter_id.encode(),
+                                                       _encrypt_with_randomness)
+        result.append((tuple(ciphertexts), proof))
+    return result
+
+
+def encrypt_ballots(pubkey, voter_ids, plaintext_lists, layout, processes, chunk_size=256):
+    """layout: the BallotLayout to prove each ballot valid against, or None to skip the proofs."""
+    ballots = list(zip(voter_ids, plaintext_lists))
+    chunks = [ballots[i:i + chunk_size] for i in range(0, len(ballots), chunk_size)]
+    initargs = (pubkey.n, layout.to_dict() if layout is not None else None)
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=initargs) as pool:
+        return [ballot for chunk in pool.map(_encrypt_chunk, chunks) for ballot in chunk]
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Submission: one keep-alive session per worker thread
+# ─────────────────────────────────────────────────────────────────────
+_local = threading.local()
+RETRY_STATUSES = (429, 503)  # the server is busy (ingest queue full, batch not committed): wait and resend
+MAX_ATTEMPTS = 30
+MAX_BACKOFF = 5.0
+_retries = 0
+_retries_lock = threading.Lock()
+
+
+def _session():
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+    return session
+
+
+def _post(url, **kwargs):
+    """POST on this thread's session, resending after Retry-After (or a backoff) while the server is busy."""
+    global _retries
+    delay = 0.1
+    for attempt in range(MAX_ATTEMPTS):
+        resp = _session().post(url, **kwargs)
+        if resp.status_code not in RETRY_STATUSES or attempt == MAX_ATTEMPTS - 1:
+            break
+        retry_after = resp.headers.get("Retry-After", "")
+        time.sleep(float(retry_after) if retry_after.replace(".", "", 1).isdigit() else delay)
+        delay = min(2 * delay, MAX_BACKOFF)
+        with _retries_lock:
+            _retries += 1
+    resp.raise_for_status()
+    return resp
+
+
+def submit_batch(server_url, batch, segment, use_binary, ct_width):
+    """POST one batch of (voter_id, ciphertexts, exponent, proof); returns (latency seconds, accepted count)."""
+    start = time.perf_counter()
+    url = f"{server_url}/submit_vote" if len(batch) == 1 else f"{server_url}/submit_votes"
+    params = {"segment": segment} if segment is not None else None
+
+    if use_binary:
+        resp = _post(url, params=params, data=wire.encode_ballots(batch, ct_width),
+                     headers={"Content-Type": wire.BALLOT_MEDIA_TYPE})
+    elif len(batch) == 1:
+        resp = _post(url, params=params, json=json_ballot(*batch[0]))
+    else:
+        resp = _post(url, params=params, json={"ballots": [json_ballot(*b) for b in batch]})
+    accepted = 1 if len(batch) == 1 else resp.json()["accepted"]
+    return time.perf_counter() - start, accepted
+
+
+def json_ballot(voter_id, ciphertexts, exponent, proof=None):
+    ballot = {"voter_id": voter_id, "exponent": exponent}
+    if len(ciphertexts) == 1:
+        ballot["ciphertext"] = str(ciphertexts[0])
+    else:
+        ballot["ciphertexts"] = [str(c) for c in ciphertexts]
+    if proof is not None:
+        ballot.update(ballot_proof.ballot_to_json(proof))
+    return ballot
+
+
+def submit_commitment(server_url, voter_id, plaintexts):
+    salt = os.urandom(16).hex()
+    commitment = hashlib.sha256(f"{commitment_value(plaintexts)}{salt}".encode()).hexdigest()
+    _post(f"{server_url}/submit_commitment", json={"voter_id": voter_id, "commitment": commitment, "salt": salt})
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate concurrent voting load and check the tally.")
+    parser.add_argument("--server", default="http://localhost:5000")
+    parser.add_argument("--voters", type=int, default=10_000, help="number of synthetic voters")
+    parser.add_argument("--yes-fraction", type=float, default=0.5, help="probability that a voter votes yes")
+    parser.add_argument("--key-size", type=int, default=2048, help="Paillier modulus size in bits")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="encryption worker processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent submitting workers")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="ballots per request (1 = POST /submit_vote, more = POST /submit_votes)")
+    parser.add_argument("--format", choices=["binary", "json"], default="binary", help="ballot encoding")
+    parser.add_argument("--commitments", action="store_true", help="also submit one commitment per voter")
+    parser.add_argument("--no-proofs", action="store_true",
+                        help="send ballots without validity proofs (the server must run with --no-require-proofs)")
+    parser.add_argument("--segments", type=int, default=0,
+                        help="spread voters over this many precincts and check per-precinct tallies")
+    parser.add_argument("--seed", type=int, help="seed for the yes/no draw (reproducible ground truth)")
+    parser.add_argument("--election", help="election id to create (default: a fresh load-<random> namespace)")
+    args = parser.parse_args()
+
+    election_id = args.election or f"load-{os.urandom(4).hex()}"
+    server_url = f"{args.server.rstrip('/')}/elections/{election_id}"
+
+    # ─────────────────────────────────────────────────────────────────
+    # STEP 1: Key, ballot layout and registration with the server
+    # ─────────────────────────────────────────────────────────────────
+    print(f"🔑 Generating {args.key_size}-bit Paillier keypair …")
+    pubkey, privkey = bigint.generate_paillier_keypair(n_length=args.key_size)
+    layout = BallotLayout(REFERENDUM, args.voters, pubkey.n)
+    resp = requests.post(f"{server_url}/set_public_key", json={"n": str(pubkey.n), "ballot_layout": layout.to_dict()})
+    if resp.status_code != 200:
+        print("❌ Server returned", resp.status_code, "when registering public key:", resp.text.strip())
+        sys.exit(1)
+    print(f"🗳️ Registered election '{election_id}'.")
+    use_binary = args.format == "binary" and wire.BALLOT_MEDIA_TYPE in resp.json().get("wire_formats", [])
+    ct_width = wire.ciphertext_width(pubkey.nsquare)
+
+    # ─────────────────────────────────────────────────────────────────
+    # STEP 2: Synthesize voters and the ground truth
+    # ─────────────────────────────────────────────────────────────────
+    rng = random.Random(args.seed)
+    voter_ids = [f"load{i:07d}" for i in range(args.voters)]
+    choices = ["yes" if rng.random() < args.yes_fraction else "no" for _ in voter_ids]
+    plaintext_lists = [layout.encode({"referendum": choice}) for choice in choices]
+    expected = {"referendum": {"yes": choices.count("yes"), "no": choices.count("no")}}
+    segments = [f"precinct-{i % args.segments:05d}" if args.segments else None for i in range(args.voters)]
+
+    # ─────────────────────────────────────────────────────────────────
+    # STEP 3: Encrypt (and prove valid) in a process pool
+    # ─────────────────────────────────────────────────────────────────
+    start = time.perf_counter()
+    encrypted = encrypt_ballots(pubkey, voter_ids, plaintext_lists, None if args.no_proofs else layout, args.processes)
+    encrypt_seconds = time.perf_counter() - start
+    print(f"🔒 Encrypted {'' if args.no_proofs else 'and proved '}{args.voters:,} ballots in {encrypt_seconds:.2f}s "
+          f"({args.voters / encrypt_seconds:,.0f} ballots/s, {args.processes} processes).")
+
+    # ─────────────────────────────────────────────────────────────────
+    # STEP 4: Submit from concurrent workers over keep-alive sessions
+    # ─────────────────────────────────────────────────────────────────
+    by_segment = {}
+    for voter_id, (cts, proof), segment in zip(voter_ids, encrypted, segments):
+        by_segment.setdefault(segment, []).append((voter_id, cts, 0, proof))
+    batches = [(segment, ballots[i:i + args.batch_size])
+               for segment, ballots in by_segment.items() for i in range(0, len(ballots), args.batch_size)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(lambda sb: submit_batch(server_url, sb[1], sb[0], use_binary, ct_width), batches))
+        submit_seconds = time.perf_counter() - start
+        if args.commitments:
+            start = time.perf_counter()
+            list(pool.map(lambda v: submit_commitment(server_url, *v), zip(voter_ids, plaintext_lists)))
+            commit_seconds = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    accepted = sum(count for _, count in outcomes)
+    print(f"📨 Submitted {accepted:,}/{args.voters:,} ballots in {submit_seconds:.2f}s → "
+          f"{args.voters / submit_seconds:,.0f} ballots/s "
+          f"({args.concurrency} workers, batch size {args.batch_size}, {'binary' if use_binary else 'JSON'}).")
+    print(f"    Request latency: p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms.")
+    if _retries:
+        print(f"🔁 {_retries:,} request(s) resent after the server answered busy (429/503).")
+    if args.commitments:
+        print(f"📨 Submitted {args.voters:,} commitments in {commit_seconds:.2f}s → "
+              f"{args.voters / commit_seconds:,.0f} commitments/s.")
+
+    # ─────────────────────────────────────────────────────────────────
+    # STEP 5: Decrypt the tally and compare with the ground truth
+    # ─────────────────────────────────────────────────────────────────
+    data = requests.get(f"{server_url}/get_encrypted_tally").json()
+    totals = decrypt_many(privkey, [int(c) for c in data["ciphertexts"]], processes=1)
+    results = layout.decode(totals, data["ballot_count"])
+    print_results(results)
+
+    if data["ballot_count"] != args.voters or results != expected:
+        print(f"❌ Tally mismatch: server counted {data['ballot_count']} ballot(s) with {results}, "
+              f"expected {args.voters} with {expected}.")
+        sys.exit(1)
+    print(f"✅ Tally matches the generated ground truth ({args.voters:,} ballots).")
+
+    # ─────────────────────────────────────────────────────────────────
+    # STEP 6: Per-precinct tallies, decrypted in one batch
+    # ─────────────────────────────────────────────────────────────────
+    if args.segments:
+        data = requests.get(f"{server_url}/get_segment_tallies").json()
+        names = sorted(data["segments"])
+        start = time.perf_counter()
+        yes_counts = decrypt_many(privkey, [int(data["segments"][name]["ciphertexts"][0]) for name in names])
+        decrypt_seconds = time.perf_counter() - start
+
+        expected_yes = {}
+        for segment, choice in zip(segments, choices):
+            expected_yes[segment] = expected_yes.get(segment, 0) + (choice == "yes")
+        if dict(zip(names, yes_counts)) != expected_yes:
+            print("❌ Per-precinct tallies do not match the generated ground truth.")
+            sys.exit(1)
+        print(f"✅ {len(names):,} precinct tallies decrypted in {decrypt_seconds:.2f}s and match the ground truth.")
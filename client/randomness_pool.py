@@ -0,0 +1,100 @@
+# client/randomness_pool.py
+
+import threading
+import time
+from collections import deque
+
+from common.bigint import powmod
+
+
+class RandomnessPool:
+    """
+    Precomputes Paillier obfuscation factors r^n mod n² in a background thread
+    while the kiosk is idle, so encrypting a ballot is one modular multiply.
+    The same (r, r^n) pairs serve as the commitments of ballot-validity proofs
+    (common/ballot_proof.py), so proving costs only short exponentiations.
+
+    - Each factor is handed out exactly once (popped from the pool).
+    - The pool refills to `capacity` whenever it drops below `low_water`.
+    - If the pool is empty, the factor is computed on-line (a "miss").
+    """
+
+    def __init__(self, pubkey, capacity=64, low_water=16):
+        self.pubkey = pubkey
+        self.capacity = capacity
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self.latencies = []  # per-ciphertext encryption latency, in seconds
+
+        self._factors = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._refill_loop, name="randomness-pool", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _compute_factor(self):
+        r = self.pubkey.get_random_lt_n()
+        return r, powmod(r, self.pubkey.n, self.pubkey.nsquare)
+
+    def _refill_loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped and len(self._factors) >= self.low_water:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+            # Fill up to capacity; the expensive pow() runs outside the lock
+            while len(self._factors) < self.capacity:
+                factor = self._compute_factor()
+                with self._cond:
+                    if self._stopped:
+                        return
+                    self._factors.append(factor)
+
+    def take(self):
+        """Return a fresh (r, r^n mod n²) pair, never one that was handed out before."""
+        with self._cond:
+            if self._factors:
+                factor = self._factors.popleft()
+                self.hits += 1
+            else:
+                factor = None
+                self.misses += 1
+            if len(self._factors) < self.low_water:
+                self._cond.notify()
+        if factor is None:
+            factor = self._compute_factor()
+        return factor
+
+    def encrypt_with_randomness(self, plaintext):
+        """Encrypt a non-negative integer plaintext; returns (raw ciphertext, r) for proving its validity."""
+        start = time.perf_counter()
+        r, factor = self.take()
+        ciphertext = (self.pubkey.raw_encrypt(plaintext, r_value=1) * factor) % self.pubkey.nsquare
+        self.latencies.append(time.perf_counter() - start)
+        return ciphertext, r
+
+    def stats(self):
+        """Pool hit/miss counters and encryption latency summary (milliseconds)."""
+        latencies = sorted(self.latencies)
+        summary = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "available": len(self._factors),
+            "encryptions": len(latencies),
+        }
+        if latencies:
+            summary["latency_ms_mean"] = 1000 * sum(latencies) / len(latencies)
+            summary["latency_ms_p50"] = 1000 * latencies[len(latencies) // 2]
+            summary["latency_ms_max"] = 1000 * latencies[-1]
+        return summary
@@ -1,8 +1,14 @@
+import argparse
 import json
 import hashlib
 import sys
 from pathlib import Path
 
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common.merkle import verify_inclusion
+
 def get_vote_id():
     vote_id = input("Enter your vote ID (the UUID from when you voted): ").strip()
     return vote_id
@@ -24,6 +30,42 @@ def load_commitment(vote_id):
 
     return stored_commitment, stored_salt
 
+def fetch_inclusion_proof(server_url, vote_id, published=None):
+    """
+    Ask the server's bulletin board for the Merkle inclusion proof of this vote
+    and check it locally. Returns the stored commitment (hex) on success.
+
+    The proof is checked only against a published root: `published`
+    ({"root", "tree_size"}, e.g. from the tally) or, by default, the one from
+    /merkle/root, fetched before the proof. The proof is requested for that
+    exact tree size, so the server cannot fit a root of its choosing to it.
+    """
+    try:
+        if published is None:
+            published = requests.get(f"{server_url}/merkle/root").json()
+        resp = requests.get(f"{server_url}/merkle/proof/{vote_id}", params={"tree_size": published["tree_size"]})
+    except Exception as e:
+        print(f"Error contacting server: {e}")
+        sys.exit(1)
+    if resp.status_code != 200:
+        print(f"Error: server has no commitment for vote ID {vote_id} in the published tree of "
+              f"{published['tree_size']} leaves ({resp.status_code}).")
+        sys.exit(1)
+
+    proof = resp.json()
+    if proof["tree_size"] != published["tree_size"]:
+        print(f"Inclusion proof REJECTED: it is for a tree of {proof['tree_size']} leaves, "
+              f"the published root covers {published['tree_size']}.")
+        sys.exit(1)
+    path = [bytes.fromhex(h) for h in proof["path"]]
+    if not verify_inclusion(bytes.fromhex(proof["commitment"]), proof["leaf_index"], published["tree_size"], path,
+                            bytes.fromhex(published["root"])):
+        print("Inclusion proof INVALID: the server's proof does not lead to the published Merkle root.")
+        sys.exit(1)
+    print(f"🌳 Inclusion proof valid ({len(resp.content)} bytes, {len(path)} hashes): "
+          f"leaf {proof['leaf_index']} of {published['tree_size']}, published root {published['root'][:16]}…")
+    return proof["commitment"]
+
 def get_user_vote_and_salt():
     while True:
         vote = input("Prove your vote → enter 'yes' or 'no': ").strip().lower()
@@ -47,11 +89,26 @@ def verify_commitment(stored_commitment, vote_int, salt_hex):
     return recomputed == stored_commitment
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prove knowledge of your vote against its commitment.")
+    parser.add_argument("--server", metavar="URL",
+                        help="fetch the commitment with a Merkle inclusion proof from the server "
+                             "(e.g. http://localhost:5000) instead of reading commitments/")
+    parser.add_argument("--root", metavar="HEX", help="published Merkle root to check the proof against "
+                                                      "(e.g. the tally's merkle_root; default: /merkle/root)")
+    parser.add_argument("--tree-size", type=int, help="number of commitments under --root (the tally's commitment_count)")
+    args = parser.parse_args()
+    if (args.root is None) != (args.tree_size is None):
+        parser.error("--root and --tree-size go together")
+
     # Step 4.1.1: Ask for vote ID
     vote_id = get_vote_id()
 
-    # Step 4.1.2: Load stored commitment and salt
-    stored_commitment, stored_salt = load_commitment(vote_id)
+    # Step 4.1.2: Load stored commitment (from the local file, or proven-included from the server)
+    if args.server:
+        published = {"root": args.root, "tree_size": args.tree_size} if args.root is not None else None
+        stored_commitment = fetch_inclusion_proof(args.server.rstrip("/"), vote_id, published)
+    else:
+        stored_commitment, stored_salt = load_commitment(vote_id)
     print(f"🔒 Commitment loaded for vote ID {vote_id}.")
 
     # Step 4.1.3: Ask user to re-enter vote & salt
@@ -0,0 +1,325 @@
+# common/ballot_proof.py
+#
+# Ballot-validity proofs: a non-interactive zero-knowledge proof that a
+# Paillier ciphertext encrypts one of a few allowed plaintexts (0 or 1)
+# without revealing which one.
+#
+# With g = n + 1, c encrypts m exactly when u = c · g^(-m) mod n² is an n-th
+# power r^n. For each allowed m_i the proof holds one Σ-protocol transcript
+# (a_i, e_i, z_i) for "u_i is an n-th power", checked by
+#
+#     z_i^n ≡ a_i · u_i^e_i   (mod n²)
+#
+# The prover answers the true branch honestly (a = ρ^n, z = ρ · r^e) and
+# simulates the others by picking e_i and z_i first. The challenges must add
+# up, mod 2^CHALLENGE_BITS, to a Fiat–Shamir hash of the key, the ciphertext,
+# the allowed plaintexts, a context string (the voter id) and every a_i, so
+# at most one branch can be simulated after the fact: the one that is true.
+#
+# Checking a branch costs an n-bit exponentiation (z^n). verify_batch checks
+# the branch equations of many proofs at once: each is raised to a random
+# BATCH_BITS-bit weight and the weighted products are compared, which needs
+# one n-bit exponentiation in total; the short weighted powers share their
+# squarings in a multi-exponentiation, so each branch adds a handful of
+# modular multiplications. A batch containing a bad proof passes with
+# probability about 2^-BATCH_BITS; a failing batch is bisected to find the
+# bad proofs.
+#
+# A proof is a tuple (commitments, challenges, responses) of equal-length
+# integer tuples, one entry per allowed plaintext.
+#
+# A whole ballot (prove_ballot / ballot_statements) is proven slot by slot
+# rather than by listing the valid packed values of each ciphertext, a set
+# that grows exponentially with the number of contests. Every slot of the
+# BallotLayout is encrypted on its own and proven to hold 0 or 1; for each
+# contest with several options, the product of its slot ciphertexts (an
+# encryption of their sum) is proven to hold 0 or 1, i.e. at most one
+# choice. The packed ciphertexts are the slot ciphertexts combined as
+# Π c_i^(2^shift_i), which the verifier recomputes and compares with the
+# ballot. When each ciphertext holds a single slot (the referendum) the
+# slot ciphertexts are the ballot's ciphertexts and are not sent twice.
+# A ballot proof is (slot ciphertexts or None, slot proofs, contest proofs).
+
+import hashlib
+import secrets
+
+from common.bigint import powmod
+
+CHALLENGE_BITS = 128
+BATCH_BITS = 64
+BINARY = (0, 1)
+
+_CHALLENGE_MASK = (1 << CHALLENGE_BITS) - 1
+
+
+def random_factor(n, nsquare):
+    """A fresh (r, r^n mod n²) pair; RandomnessPool.take() hands out precomputed ones."""
+    r = secrets.randbelow(n - 1) + 1
+    return r, powmod(r, n, nsquare)
+
+
+def _power_of_g(x, n, nsquare):
+    # (1 + n)^x ≡ 1 + x·n (mod n²), for any integer x (negative ones included)
+    return (1 + (x % n) * n) % nsquare
+
+
+def _update(h, value):
+    data = value.to_bytes((value.bit_length() + 7) // 8 or 1, "big")
+    h.update(len(data).to_bytes(4, "big"))
+    h.update(data)
+
+
+def challenge(n, ciphertext, messages, commitments, context=b""):
+    """The Fiat–Shamir challenge the proof's challenges must add up to."""
+    h = hashlib.sha256(b"cvs-ballot-proof")
+    h.update(len(context).to_bytes(4, "big"))
+    h.update(context)
+    for value in (n, ciphertext, len(messages), *messages, *commitments):
+        _update(h, value)
+    return int.from_bytes(h.digest()[:CHALLENGE_BITS // 8], "big")
+
+
+def prove(n, ciphertext, plaintext, r, messages=BINARY, context=b"", factors=None):
+    """
+    Prove that ciphertext = g^plaintext · r^n mod n² encrypts one of `messages`.
+    factors() returns fresh (ρ, ρ^n mod n²) pairs (default: computed on the spot).
+    Raises ValueError if plaintext is not one of messages.
+    """
+    nsquare = n * n
+    if factors is None:
+        factors = lambda: random_factor(n, nsquare)
+    index = messages.index(plaintext)
+
+    commitments, challenges, responses = [], [], []
+    for i, m in enumerate(messages):
+        rho, rho_n = factors()
+        if i == index:
+            commitments.append(rho_n)
+            challenges.append(0)
+            responses.append(rho)
+            continue
+        # Simulated branch: pick the challenge and response, solve for the commitment
+        e = secrets.randbits(CHALLENGE_BITS)
+        u = ciphertext * _power_of_g(-m, n, nsquare) % nsquare
+        commitments.append(rho_n * powmod(u, -e, nsquare) % nsquare)
+        challenges.append(e)
+        responses.append(rho)
+
+    e = (challenge(n, ciphertext, messages, commitments, context) - sum(challenges)) & _CHALLENGE_MASK
+    challenges[index] = e
+    responses[index] = responses[index] * powmod(r, e, n) % n
+    return tuple(commitments), tuple(challenges), tuple(responses)
+
+
+def _well_formed(n, nsquare, ciphertext, proof, messages, context):
+    """Shape and range checks plus the Fiat–Shamir sum: everything except the branch equations."""
+    commitments, challenges, responses = proof
+    k = len(messages)
+    if not (len(commitments) == len(challenges) == len(responses) == k):
+        return False
+    if not all(0 < a < nsquare for a in commitments) or not all(0 < z < n for z in responses) \
+            or not all(0 <= e <= _CHALLENGE_MASK for e in challenges):
+        return False
+    return sum(challenges) & _CHALLENGE_MASK == challenge(n, ciphertext, messages, commitments, context)
+
+
+def _equations_hold(n, nsquare, ciphertext, proof, messages):
+    for a, e, z, m in zip(*proof, messages):
+        u_e = powmod(ciphertext, e, nsquare) * _power_of_g(-m * e, n, nsquare) % nsquare
+        if powmod(z, n, nsquare) != a * u_e % nsquare:
+            return False
+    return True
+
+
+def verify(n, ciphertext, proof, messages=BINARY, context=b""):
+    """Check one proof on its own."""
+    nsquare = n * n
+    return _well_formed(n, nsquare, ciphertext, proof, messages, context) \
+        and _equations_hold(n, nsquare, ciphertext, proof, messages)
+
+
+def _multi_pow(pairs, modulus):
+    """Π base^exponent mod modulus, sharing the squarings across all bases (bucket method)."""
+    if not pairs:
+        return 1
+    # Wider windows mean fewer passes over the bases but more buckets to combine
+    window = max(2, min(8, len(pairs).bit_length() - 3))
+    digit_mask = (1 << window) - 1
+    top = (max(e.bit_length() for _, e in pairs) - 1) // window * window
+    result = 1
+    for shift in range(top, -1, -window):
+        for _ in range(window):
+            result = result * result % modulus
+        buckets = [1] * (digit_mask + 1)
+        for base, exponent in pairs:
+            digit = (exponent >> shift) & digit_mask
+            if digit:
+                buckets[digit] = buckets[digit] * base % modulus
+        # Π bucket[d]^d as a product of running products
+        running = 1
+        for digit in range(digit_mask, 0, -1):
+            running = running * buckets[digit] % modulus
+            result = result * running % modulus
+    return result
+
+
+def _batch_holds(n, nsquare, statements):
+    z_terms, a_terms, c_terms, g_exponent = [], [], [], 0
+    for ciphertext, (commitments, challenges, responses), messages, _ in statements:
+        c_exponent = 0
+        for a, e, z, m in zip(commitments, challenges, responses, messages):
+            weight = secrets.randbits(BATCH_BITS)
+            z_terms.append((z, weight))
+            a_terms.append((a, weight))
+            c_exponent += weight * e
+            g_exponent -= weight * e * m
+        c_terms.append((ciphertext, c_exponent))
+    rhs = _multi_pow(a_terms, nsquare) * _multi_pow(c_terms, nsquare) % nsquare
+    rhs = rhs * _power_of_g(g_exponent, n, nsquare) % nsquare
+    return powmod(_multi_pow(z_terms, nsquare), n, nsquare) == rhs
+
+
+def verify_batch(n, statements):
+    """
+    statements: list of (ciphertext, proof, messages, context).
+    Returns one bool per statement, as verify() would (up to the 2^-BATCH_BITS batch error).
+    """
+    nsquare = n * n
+    results = [False] * len(statements)
+    pending = [[i for i, (c, proof, messages, context) in enumerate(statements)
+                if _well_formed(n, nsquare, c, proof, messages, context)]]
+    while pending:
+        indices = pending.pop()
+        if len(indices) == 1:
+            c, proof, messages, _ = statements[indices[0]]
+            results[indices[0]] = _equations_hold(n, nsquare, c, proof, messages)
+        elif _batch_holds(n, nsquare, [statements[i] for i in indices]):
+            for i in indices:
+                results[i] = True
+        else:
+            half = len(indices) // 2
+            pending += [indices[:half], indices[half:]]
+    return results
+
+
+def to_json(proof):
+    commitments, challenges, responses = proof
+    return {"a": [str(a) for a in commitments], "e": [str(e) for e in challenges], "z": [str(z) for z in responses]}
+
+
+def from_json(data):
+    """Raises ValueError on a malformed proof."""
+    try:
+        proof = tuple(tuple(int(x) for x in data[key]) for key in ("a", "e", "z"))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("a proof must be {'a': [...], 'e': [...], 'z': [...]} of integer strings")
+    return proof
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Whole ballots
+# ─────────────────────────────────────────────────────────────────────
+def pack(layout, slot_ciphertexts, nsquare):
+    """The packed ciphertexts Π c_i^(2^shift_i) per position: an encryption of layout.encode()'s plaintexts."""
+    packed = [None] * layout.num_ciphertexts
+    shifts = [0] * layout.num_ciphertexts
+    # Horner's rule from each position's highest slot down, so every bit shift costs one squaring
+    for c, (part, shift) in reversed(list(zip(slot_ciphertexts, layout.slot_positions))):
+        if packed[part] is None:
+            packed[part] = c
+        else:
+            packed[part] = powmod(packed[part], 1 << (shifts[part] - shift), nsquare) * c % nsquare
+        shifts[part] = shift
+    return packed
+
+
+def _contest_ciphertext(group, slot_ciphertexts, nsquare):
+    product = 1
+    for index in group:
+        product = product * slot_ciphertexts[index] % nsquare
+    return product
+
+
+def factors_per_ballot(layout):
+    """(r, r^n) pairs prove_ballot draws for one ballot: a slot ciphertext per slot, two per 0/1 proof."""
+    return len(layout.slots) + len(BINARY) * (len(layout.slots) + len(layout.contest_groups))
+
+
+def prove_ballot(n, layout, plaintexts, context, encrypt, factors=None):
+    """
+    Encrypt one ballot's packed plaintexts (layout.encode()) slot by slot and prove it valid.
+    encrypt(m) returns (ciphertext, r), e.g. RandomnessPool.encrypt_with_randomness;
+    factors() returns fresh (ρ, ρ^n mod n²) pairs for the proofs (default: computed on the spot).
+    Returns (packed ciphertexts, ballot proof).
+    """
+    nsquare = n * n
+    values = layout.slot_values(plaintexts)
+    slots = [encrypt(value) for value in values]
+    slot_ciphertexts = [c for c, _ in slots]
+    slot_proofs = tuple(prove(n, c, value, r, BINARY, context, factors) for (c, r), value in zip(slots, values))
+    contest_proofs = []
+    for group in layout.contest_groups:
+        r = 1
+        for index in group:
+            r = r * slots[index][1] % n
+        contest_proofs.append(prove(n, _contest_ciphertext(group, slot_ciphertexts, nsquare),
+                                    sum(values[index] for index in group), r, BINARY, context, factors))
+    if len(slots) == layout.num_ciphertexts:
+        return slot_ciphertexts, (None, slot_proofs, tuple(contest_proofs))
+    return pack(layout, slot_ciphertexts, nsquare), (tuple(slot_ciphertexts), slot_proofs, tuple(contest_proofs))
+
+
+def ballot_statements(n, layout, ciphertexts, proof, context=b""):
+    """
+    The (ciphertext, proof, messages, context) statements verify_batch must
+    accept for a ballot with these packed ciphertexts to be valid.
+    Raises ValueError if the ballot proof does not fit the layout or its slot
+    ciphertexts do not pack into `ciphertexts`.
+    """
+    nsquare = n * n
+    slot_ciphertexts, slot_proofs, contest_proofs = proof
+    slots = len(layout.slots)
+    if slot_ciphertexts is None:
+        if slots != layout.num_ciphertexts:
+            raise ValueError("a packed ballot's proof needs its 'slot_ciphertexts'")
+        slot_ciphertexts = ciphertexts
+    else:
+        if len(slot_ciphertexts) != slots or not all(0 < c < nsquare for c in slot_ciphertexts):
+            raise ValueError(f"expected {slots} slot ciphertext(s) in [1, n²)")
+        if pack(layout, slot_ciphertexts, nsquare) != list(ciphertexts):
+            raise ValueError("the slot ciphertexts do not pack into the ballot's ciphertexts")
+    if len(slot_proofs) != slots or len(contest_proofs) != len(layout.contest_groups):
+        raise ValueError(f"expected {slots} slot proof(s) and {len(layout.contest_groups)} contest proof(s), "
+                         f"got {len(slot_proofs)} and {len(contest_proofs)}")
+    statements = [(c, slot_proof, BINARY, context) for c, slot_proof in zip(slot_ciphertexts, slot_proofs)]
+    for group, contest_proof in zip(layout.contest_groups, contest_proofs):
+        statements.append((_contest_ciphertext(group, slot_ciphertexts, nsquare), contest_proof, BINARY, context))
+    return statements
+
+
+def ballot_to_json(proof):
+    """The JSON ballot fields of a ballot proof: "proofs" (one per slot), "contest_proofs", "slot_ciphertexts"."""
+    slot_ciphertexts, slot_proofs, contest_proofs = proof
+    fields = {"proofs": [to_json(p) for p in slot_proofs]}
+    if contest_proofs:
+        fields["contest_proofs"] = [to_json(p) for p in contest_proofs]
+    if slot_ciphertexts is not None:
+        fields["slot_ciphertexts"] = [str(c) for c in slot_ciphertexts]
+    return fields
+
+
+def ballot_from_json(ballot):
+    """The ballot proof of a JSON ballot (None if it has none). Raises ValueError on a malformed one."""
+    if ballot.get("proofs") is None:
+        return None
+    for key in ("proofs", "contest_proofs", "slot_ciphertexts"):
+        if not isinstance(ballot.get(key, []), list):
+            raise ValueError(f"'{key}' must be a list")
+    try:
+        slot_ciphertexts = ballot.get("slot_ciphertexts")
+        if slot_ciphertexts is not None:
+            slot_ciphertexts = tuple(int(c) for c in slot_ciphertexts)
+    except (TypeError, ValueError):
+        raise ValueError("'slot_ciphertexts' must be integer strings")
+    return (slot_ciphertexts, tuple(from_json(p) for p in ballot["proofs"]),
+            tuple(from_json(p) for p in ballot.get("contest_proofs", [])))
@@ -0,0 +1,79 @@
+# common/batch_decrypt.py
+#
+# Decrypt many Paillier ciphertexts at once (e.g. one tally per precinct).
+#
+# Each decryption uses the Chinese Remainder Theorem: two exponentiations
+# modulo p² and q² with half-size exponents instead of one modulo n², with
+# the per-key constants (hp, hq, p⁻¹ mod q) taken from the private key
+# (stored in the key file, see common/keyfile.py) rather than recomputed. Ciphertexts are split into chunks and decrypted in a
+# process pool; small batches are decrypted in-process to skip pool start-up.
+#
+# Results are raw plaintexts in [0, n): tallies are never negative, so the
+# signed decoding of phe's EncodedNumber is not needed.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from common.bigint import powmod, invert
+
+
+class CrtDecryptor:
+    def __init__(self, p, q, hp=None, hq=None, p_inverse=None):
+        self.p, self.q = p, q
+        self.psquare, self.qsquare = p * p, q * q
+        self.n = p * q
+        g = self.n + 1
+        self.hp = hp or invert(self._l(powmod(g, p - 1, self.psquare), p), p)
+        self.hq = hq or invert(self._l(powmod(g, q - 1, self.qsquare), q), q)
+        self.p_inverse = p_inverse or invert(p, q)
+
+    @classmethod
+    def for_key(cls, privkey):
+        """Decryptor for a phe PaillierPrivateKey, reusing its precomputed constants."""
+        return cls(*_crt_values(privkey))
+
+    @staticmethod
+    def _l(x, m):
+        return (x - 1) // m
+
+    def decrypt(self, ciphertext):
+        mp = self._l(powmod(ciphertext, self.p - 1, self.psquare), self.p) * self.hp % self.p
+        mq = self._l(powmod(ciphertext, self.q - 1, self.qsquare), self.q) * self.hq % self.q
+        return mp + ((mq - mp) * self.p_inverse % self.q) * self.p
+
+
+def _crt_values(privkey):
+    return privkey.p, privkey.q, privkey.hp, privkey.hq, privkey.p_inverse
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Worker processes (one decryptor per process, set by the initializer)
+# ─────────────────────────────────────────────────────────────────────
+_worker_decryptor = None
+
+
+def _init_worker(p, q, hp, hq, p_inverse):
+    global _worker_decryptor
+    _worker_decryptor = CrtDecryptor(p, q, hp, hq, p_inverse)
+
+
+def _decrypt_chunk(ciphertexts):
+    return [_worker_decryptor.decrypt(c) for c in ciphertexts]
+
+
+def decrypt_many(privkey, ciphertexts, processes=None, chunk_size=64, min_parallel=32):
+    """
+    Decrypt raw ciphertext integers (exponent 0) with a phe PaillierPrivateKey.
+    Returns the plaintexts in the same order.
+    """
+    ciphertexts = list(ciphertexts)
+    if processes == 1 or len(ciphertexts) < min_parallel:
+        decryptor = CrtDecryptor.for_key(privkey)
+        return [decryptor.decrypt(c) for c in ciphertexts]
+
+    processes = processes or os.cpu_count()
+    chunk_size = max(1, min(chunk_size, -(-len(ciphertexts) // processes)))
+    chunks = [ciphertexts[i:i + chunk_size] for i in range(0, len(ciphertexts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=_crt_values(privkey)) as pool:
+        return [m for chunk in pool.map(_decrypt_chunk, chunks) for m in chunk]
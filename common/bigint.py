@@ -0,0 +1,207 @@
+# common/bigint.py
+#
+# Big-integer backend for the project's own Paillier arithmetic: modular
+# products, powmod, inverse and prime generation (and, built on them,
+# keygen and encryption). GMP via gmpy2 is used when it is installed, pure
+# Python otherwise; CVS_BIGINT=python forces the pure-Python backend and
+# CVS_BIGINT=gmpy2 makes a missing gmpy2 an error.
+#
+# Values go in and come out as plain Python ints, so the rest of the code
+# (wire encoding, JSON, pickled keys) never sees an mpz. `backend` is the
+# active backend and `NAME` its name; PythonBackend and Gmpy2Backend stay
+# importable for side-by-side benchmarks (bench/bench_bigint.py) and the
+# gmpy2 smoke check (server/gmpy2_smoke.py).
+
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from phe import paillier
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+MILLER_RABIN_ROUNDS = 40  # error below 4^-40 for any odd composite
+PRIME_SEARCH_CHUNK = 16   # random candidates tested per task in a parallel prime search
+SMALL_PRIMES = [p for p in range(3, 2000, 2) if all(p % d for d in range(3, int(p ** 0.5) + 1, 2))]
+
+
+def _candidate(bits):
+    # Top two bits set, so the product of two such primes has exactly 2·bits bits
+    return secrets.randbits(bits) | (3 << (bits - 2)) | 1
+
+
+class PythonBackend:
+    name = "python"
+
+    @staticmethod
+    def powmod(base, exponent, modulus):
+        return pow(base, exponent, modulus)
+
+    @staticmethod
+    def invert(a, modulus):
+        return pow(a, -1, modulus)
+
+    @staticmethod
+    def mulmod(a, b, modulus):
+        return a * b % modulus
+
+    @staticmethod
+    def prod_mod(values, modulus, start=1):
+        product = start
+        for v in values:
+            product = product * v % modulus
+        return product
+
+    @staticmethod
+    def is_prime(n):
+        if n < 2:
+            return False
+        if n == 2:
+            return True
+        for p in SMALL_PRIMES:
+            if n % p == 0:
+                return n == p
+        d, s = n - 1, 0
+        while d % 2 == 0:
+            d, s = d // 2, s + 1
+        for _ in range(MILLER_RABIN_ROUNDS):
+            x = pow(secrets.randbelow(n - 3) + 2, d, n)
+            if x in (1, n - 1):
+                continue
+            for _ in range(s - 1):
+                x = x * x % n
+                if x == n - 1:
+                    break
+            else:
+                return False
+        return True
+
+    @classmethod
+    def random_prime(cls, bits):
+        while True:
+            candidate = _candidate(bits)
+            if cls.is_prime(candidate):
+                return candidate
+
+
+class Gmpy2Backend:
+    name = "gmpy2"
+
+    @staticmethod
+    def powmod(base, exponent, modulus):
+        return int(gmpy2.powmod(base, exponent, modulus))
+
+    @staticmethod
+    def invert(a, modulus):
+        return int(gmpy2.invert(a, modulus))
+
+    @staticmethod
+    def mulmod(a, b, modulus):
+        return int(gmpy2.mpz(a) * b % modulus)
+
+    @staticmethod
+    def prod_mod(values, modulus, start=1):
+        modulus = gmpy2.mpz(modulus)
+        product = gmpy2.mpz(start)
+        for v in values:
+            product = product * v % modulus
+        return int(product)
+
+    @staticmethod
+    def is_prime(n):
+        return bool(gmpy2.is_prime(n, MILLER_RABIN_ROUNDS))
+
+    @staticmethod
+    def random_prime(bits):
+        # Random odd start (from the OS CSPRNG, not GMP's generator), then the next prime after it
+        while True:
+            prime = int(gmpy2.next_prime(_candidate(bits)))
+            if prime.bit_length() == bits:
+                return prime
+
+
+BACKENDS = {"python": PythonBackend}
+if gmpy2 is not None:
+    BACKENDS["gmpy2"] = Gmpy2Backend
+
+
+def _select():
+    choice = os.environ.get("CVS_BIGINT", "auto")
+    if choice == "auto":
+        return Gmpy2Backend if gmpy2 is not None else PythonBackend
+    if choice not in BACKENDS:
+        raise ImportError(f"CVS_BIGINT={choice!r} is not available (have: {', '.join(BACKENDS)})")
+    return BACKENDS[choice]
+
+
+backend = _select()
+NAME = backend.name
+powmod = backend.powmod
+invert = backend.invert
+mulmod = backend.mulmod
+prod_mod = backend.prod_mod
+is_prime = backend.is_prime
+random_prime = backend.random_prime
+
+
+def _search_primes(backend_name, bits, tries):
+    # One task of a parallel prime search: a prime of `bits` bits among `tries` random candidates, or None
+    using = BACKENDS[backend_name]
+    for _ in range(tries):
+        candidate = _candidate(bits)
+        if using.is_prime(candidate):
+            return candidate
+    return None
+
+
+def _parallel_primes(sizes, using, processes):
+    """One distinct random prime per entry of `sizes` (bit lengths), searched for in `processes` worker processes."""
+    found = [None] * len(sizes)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = {}
+        while None in found:
+            # Keep every worker busy, spreading tasks over the sizes still missing
+            missing = [i for i, prime in enumerate(found) if prime is None]
+            while len(pending) < processes:
+                i = missing[len(pending) % len(missing)]
+                pending[pool.submit(_search_primes, using.name, sizes[i], PRIME_SEARCH_CHUNK)] = sizes[i]
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                bits, prime = pending.pop(future), future.result()
+                slot = next((i for i, size in enumerate(sizes) if size == bits and found[i] is None), None)
+                if prime is not None and slot is not None and prime not in found:
+                    found[slot] = prime
+        for future in pending:
+            future.cancel()
+    return found
+
+
+def generate_paillier_keypair(n_length=paillier.DEFAULT_KEYSIZE, using=None, processes=1):
+    """
+    Like phe.paillier.generate_paillier_keypair, with the primes drawn by this
+    backend (or `using`); processes > 1 searches for them in that many worker
+    processes at once.
+    """
+    using = using or backend
+    sizes = (n_length // 2, n_length - n_length // 2)
+    while True:
+        if processes > 1:
+            p, q = _parallel_primes(sizes, using, processes)
+        else:
+            p, q = using.random_prime(sizes[0]), using.random_prime(sizes[1])
+        n = p * q
+        if p != q and n.bit_length() == n_length:
+            break
+    public_key = paillier.PaillierPublicKey(n)
+    return public_key, paillier.PaillierPrivateKey(public_key, p, q)
+
+
+def encrypt(pubkey, plaintext, r=None, using=None):
+    """Raw Paillier encryption of a non-negative integer below n: (1 + m·n) · r^n mod n²."""
+    using = using or backend
+    if r is None:
+        r = secrets.randbelow(pubkey.n - 1) + 1
+    return using.mulmod(1 + plaintext * pubkey.n, using.powmod(r, pubkey.n, pubkey.nsquare), pubkey.nsquare)
@@ -0,0 +1,154 @@
+# common/keyfile.py
+#
+# Versioned Paillier key files. A key file is a small JSON document with
+# every big integer in hex: the public file holds n and n², the private
+# file adds p, q and the CRT decryption constants phe would otherwise
+# recompute on load (p², q², hp, hq, p⁻¹ mod q). Loading is therefore a
+# parse plus a consistency check, not a round of modular exponentiations,
+# and the files do not depend on phe's pickled class layout.
+#
+#   {"format": "cvs-paillier-key", "version": 1, "kind": "private",
+#    "key_size": 3072, "n": "…", "nsquare": "…", "p": "…", "q": "…",
+#    "psquare": "…", "qsquare": "…", "hp": "…", "hq": "…", "p_inverse": "…"}
+#
+# The private file is written with mode 0600. Keys pickled by earlier
+# versions (keys/pubkey.pkl, keys/privkey.pkl) are still read.
+
+import json
+import os
+import pickle
+from pathlib import Path
+
+from phe import paillier
+
+FORMAT = "cvs-paillier-key"
+VERSION = 1
+PUBLIC_KEY_FILE = "paillier_public.json"
+PRIVATE_KEY_FILE = "paillier_private.json"
+LEGACY_PUBLIC_KEY_FILE = "pubkey.pkl"
+LEGACY_PRIVATE_KEY_FILE = "privkey.pkl"
+
+PRIVATE_FIELDS = ("p", "q", "psquare", "qsquare", "hp", "hq", "p_inverse")
+
+
+def _public_dict(pubkey):
+    return {
+        "format": FORMAT,
+        "version": VERSION,
+        "kind": "public",
+        "key_size": pubkey.n.bit_length(),
+        "n": format(pubkey.n, "x"),
+        "nsquare": format(pubkey.nsquare, "x"),
+    }
+
+
+def _private_dict(privkey):
+    data = _public_dict(privkey.public_key)
+    data["kind"] = "private"
+    data.update((name, format(getattr(privkey, name), "x")) for name in PRIVATE_FIELDS)
+    return data
+
+
+def _write(path, data, mode):
+    # Temporary file then rename, so a crash never leaves half a key behind
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save_public_key(path, pubkey):
+    _write(path, _public_dict(pubkey), 0o644)
+
+
+def save_private_key(path, privkey):
+    _write(path, _private_dict(privkey), 0o600)
+
+
+def save_keypair(directory, pubkey, privkey):
+    """Write paillier_public.json and paillier_private.json into `directory`; returns their paths."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    save_public_key(directory / PUBLIC_KEY_FILE, pubkey)
+    save_private_key(directory / PRIVATE_KEY_FILE, privkey)
+    return directory / PUBLIC_KEY_FILE, directory / PRIVATE_KEY_FILE
+
+
+def _read(path, kind):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("format") != FORMAT:
+        raise ValueError(f"{path} is not a Paillier key file")
+    if data.get("version") != VERSION:
+        raise ValueError(f"{path}: unsupported key file version {data.get('version')!r}")
+    if kind == "private" and data.get("kind") != "private":
+        raise ValueError(f"{path} holds a public key only")
+    return {name: int(value, 16) if name not in ("format", "version", "kind", "key_size") else value
+            for name, value in data.items()}
+
+
+def _public_key(n, nsquare):
+    # Same attributes as PaillierPublicKey.__init__, without recomputing n²
+    if nsquare != n * n:
+        raise ValueError("corrupt key file: nsquare != n²")
+    pubkey = object.__new__(paillier.PaillierPublicKey)
+    pubkey.g = n + 1
+    pubkey.n = n
+    pubkey.nsquare = nsquare
+    pubkey.max_int = n // 3 - 1
+    return pubkey
+
+
+def load_public_key(path):
+    """phe PaillierPublicKey from a key file (public or private) or a legacy pickle."""
+    if str(path).endswith(".pkl"):
+        with open(path, "rb") as f:
+            key = pickle.load(f)
+        return key.public_key if isinstance(key, paillier.PaillierPrivateKey) else key
+    data = _read(path, "public")
+    return _public_key(data["n"], data["nsquare"])
+
+
+def load_private_key(path, pubkey=None):
+    """
+    phe PaillierPrivateKey from a private key file (or a legacy pickle), with
+    the stored CRT constants taken as they are rather than recomputed.
+    `pubkey`, if given, is shared with the private key instead of a second copy.
+    """
+    if str(path).endswith(".pkl"):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    data = _read(path, "private")
+    pubkey = pubkey or _public_key(data["n"], data["nsquare"])
+    p, q = data["p"], data["q"]
+    if pubkey.n != data["n"] or p * q != pubkey.n or not p < q:
+        raise ValueError(f"corrupt key file {path}: p·q does not match n")
+    if data["psquare"] != p * p or data["qsquare"] != q * q or data["p_inverse"] * p % q != 1:
+        raise ValueError(f"corrupt key file {path}: inconsistent CRT values")
+    privkey = object.__new__(paillier.PaillierPrivateKey)
+    privkey.public_key = pubkey
+    for name in PRIVATE_FIELDS:
+        setattr(privkey, name, data[name])
+    return privkey
+
+
+def key_paths(directory):
+    """(public, private) key paths in `directory`: the key files, else the legacy pickles, else None."""
+    directory = Path(directory)
+    for public, private in ((PUBLIC_KEY_FILE, PRIVATE_KEY_FILE), (LEGACY_PUBLIC_KEY_FILE, LEGACY_PRIVATE_KEY_FILE)):
+        if (directory / public).exists() and (directory / private).exists():
+            return directory / public, directory / private
+    return None
+
+
+def load_keypair(directory):
+    """(public key, private key) from `directory`, preferring key files over legacy pickles."""
+    paths = key_paths(directory)
+    if paths is None:
+        raise FileNotFoundError(f"no Paillier keypair in {directory}")
+    pubkey = load_public_key(paths[0])
+    return pubkey, load_private_key(paths[1], pubkey)
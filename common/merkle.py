@@ -0,0 +1,132 @@
+# common/merkle.py
+#
+# Append-only Merkle tree over commitment digests (RFC 6962 / RFC 9162 shape):
+#
+#     leaf hash = SHA256(0x00 || commitment_digest)
+#     node hash = SHA256(0x01 || left || right)
+#
+# The server appends one leaf per accepted commitment (O(log n) amortized)
+# and serves inclusion proofs of O(log n) hashes, also against the root of
+# any earlier tree size (leaves are only appended, so earlier roots stay
+# computable); voters verify a proof against the published root with
+# verify_inclusion().
+
+import hashlib
+
+HASH_SIZE = 32
+
+
+def leaf_hash(digest):
+    return hashlib.sha256(b"\x00" + digest).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _largest_power_of_two_below(n):
+    """Largest power of two strictly smaller than n (n >= 2)."""
+    return 1 << ((n - 1).bit_length() - 1)
+
+
+class MerkleTree:
+    """
+    levels[h] holds, back to back in one bytearray, the hashes of every
+    complete subtree of 2**h leaves, left to right. Storing raw 32-byte
+    hashes contiguously keeps a million-leaf tree at ~64 MB.
+    """
+
+    def __init__(self):
+        self.levels = [bytearray()]
+        self.size = 0
+
+    def _node(self, level, index):
+        start = index * HASH_SIZE
+        return bytes(self.levels[level][start:start + HASH_SIZE])
+
+    def append(self, digest):
+        """Add a leaf for `digest`; returns its leaf index."""
+        index = self.size
+        node = leaf_hash(digest)
+        self.levels[0] += node
+        self.size += 1
+
+        # Whenever a level gets an even number of nodes, the last two form a new parent
+        level, position = 0, index
+        while position % 2 == 1:
+            left = self._node(level, position - 1)
+            node = node_hash(left, node)
+            level += 1
+            position //= 2
+            if level == len(self.levels):
+                self.levels.append(bytearray())
+            self.levels[level] += node
+        return index
+
+    def _subtree(self, start, count):
+        """Hash of leaves [start, start + count); `start` is a multiple of the largest power of two in count."""
+        if count & (count - 1) == 0:
+            level = count.bit_length() - 1
+            return self._node(level, start >> level)
+        k = _largest_power_of_two_below(count)
+        return node_hash(self._subtree(start, k), self._subtree(start + k, count - k))
+
+    def _check_size(self, size):
+        if size is None:
+            return self.size
+        if not 0 <= size <= self.size:
+            raise IndexError(f"tree size {size} out of range for tree of size {self.size}")
+        return size
+
+    def root(self, size=None):
+        """Root of the current tree, or of its first `size` leaves (the tree as it was at that size)."""
+        size = self._check_size(size)
+        if size == 0:
+            return hashlib.sha256(b"").digest()
+        return self._subtree(0, size)
+
+    def proof(self, index, size=None):
+        """
+        Audit path (list of sibling hashes, leaf to root) for leaf `index` in
+        the current tree, or in the tree of its first `size` leaves.
+        """
+        size = self._check_size(size)
+        if not 0 <= index < size:
+            raise IndexError(f"leaf index {index} out of range for tree of size {size}")
+        path = []
+        start, count, m = 0, size, index
+        # Walk down from the root, collecting the sibling subtree at each split
+        while count > 1:
+            k = _largest_power_of_two_below(count)
+            if m < k:
+                path.append(self._subtree(start + k, count - k))
+                count = k
+            else:
+                path.append(self._subtree(start, k))
+                start, count, m = start + k, count - k, m - k
+        path.reverse()
+        return path
+
+
+def verify_inclusion(digest, index, tree_size, path, root):
+    """
+    Check that `digest` is leaf `index` of the tree of `tree_size` leaves with
+    the given `root`, using the audit path from MerkleTree.proof().
+    """
+    if not 0 <= index < tree_size:
+        return False
+    fn, sn = index, tree_size - 1
+    node = leaf_hash(digest)
+    for sibling in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            node = node_hash(sibling, node)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            node = node_hash(node, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and node == root
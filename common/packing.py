@@ -0,0 +1,132 @@
+# common/packing.py
+#
+# Packed ballots: every option of every contest gets its own bit-slot in a
+# Paillier plaintext, so one ciphertext carries many counters at once.
+#
+#     plaintext = Σ  choice[i] << (slot_bits · i)      (i = slot within this ciphertext)
+#
+# slot_bits is sized from the number of registered voters, so even if every
+# voter picks the same option its counter cannot overflow into the next slot.
+# Homomorphic addition of packed plaintexts therefore adds every counter
+# independently, and a ballot with k options needs ceil(k / slots_per_ciphertext)
+# ciphertexts instead of k.
+#
+# A contest may name a "remainder" label for voters who select none of its
+# options. The classic referendum is {"name": "referendum", "options": ["yes"],
+# "remainder": "no"}: its packed plaintext is exactly the old vote_int (1/0).
+
+from functools import cached_property
+
+REFERENDUM = [{"name": "referendum", "options": ["yes"], "remainder": "no"}]
+
+
+class BallotLayout:
+    """
+    contests: list of {"name": str, "options": [str, ...], "remainder": str (optional)}
+    max_voters: upper bound on ballots counted (sizes the slots)
+    n: Paillier modulus (sizes how many slots fit in one plaintext)
+    """
+
+    def __init__(self, contests, max_voters, n):
+        if max_voters < 1:
+            raise ValueError("max_voters must be at least 1")
+        self.contests = contests
+        self.max_voters = max_voters
+        self.slots = [(c["name"], option) for c in contests for option in c["options"]]
+        if not self.slots:
+            raise ValueError("ballot layout has no options")
+
+        # A counter can reach max_voters, which needs max_voters.bit_length() bits.
+        # phe only encrypts plaintexts up to n // 3 - 1 without flagging overflow.
+        self.slot_bits = max_voters.bit_length()
+        usable_bits = (n // 3 - 1).bit_length() - 1
+        self.slots_per_ciphertext = usable_bits // self.slot_bits
+        if self.slots_per_ciphertext < 1:
+            raise ValueError("key is too small for this many voters")
+        self.num_ciphertexts = -(-len(self.slots) // self.slots_per_ciphertext)
+
+    def to_dict(self):
+        return {"contests": self.contests, "max_voters": self.max_voters}
+
+    @classmethod
+    def from_dict(cls, data, n):
+        return cls(data["contests"], int(data["max_voters"]), n)
+
+    def encode(self, choices):
+        """
+        choices: {contest name: chosen option, or None / the remainder label for no selection}.
+        Returns the list of num_ciphertexts plaintext integers to encrypt.
+        """
+        plaintexts = [0] * self.num_ciphertexts
+        for contest in self.contests:
+            choice = choices.get(contest["name"])
+            if choice is None or choice == contest.get("remainder"):
+                continue
+            if choice not in contest["options"]:
+                raise ValueError(f"'{choice}' is not an option of contest '{contest['name']}'")
+            index = self.slots.index((contest["name"], choice))
+            part, slot = divmod(index, self.slots_per_ciphertext)
+            plaintexts[part] += 1 << (self.slot_bits * slot)
+        return plaintexts
+
+    @cached_property
+    def slot_positions(self):
+        """(ciphertext position, bit shift) of each slot, in slot order."""
+        positions = []
+        for index in range(len(self.slots)):
+            part, slot = divmod(index, self.slots_per_ciphertext)
+            positions.append((part, self.slot_bits * slot))
+        return positions
+
+    @cached_property
+    def contest_groups(self):
+        """
+        Slot indices of each contest with several options, whose slots a
+        ballot-validity proof shows add up to at most one (a single-option
+        contest is covered by its slot's own 0/1 proof).
+        """
+        groups = []
+        for contest in self.contests:
+            group = tuple(index for index, slot in enumerate(self.slots) if slot[0] == contest["name"])
+            if len(group) > 1:
+                groups.append(group)
+        return groups
+
+    def slot_values(self, plaintexts):
+        """The 0/1 choice in each slot of one ballot's packed plaintexts, in slot order."""
+        mask = (1 << self.slot_bits) - 1
+        return [(plaintexts[part] >> shift) & mask for part, shift in self.slot_positions]
+
+    def decode(self, totals, ballots):
+        """
+        totals: decrypted sums, one per ciphertext position; ballots: number of ballots counted.
+        Returns {contest name: {option: count}} (including the remainder label, if any).
+        """
+        mask = (1 << self.slot_bits) - 1
+        counts = {}
+        for index, (contest, option) in enumerate(self.slots):
+            part, slot = divmod(index, self.slots_per_ciphertext)
+            counts.setdefault(contest, {})[option] = (totals[part] >> (self.slot_bits * slot)) & mask
+        for contest in self.contests:
+            if "remainder" in contest:
+                result = counts[contest["name"]]
+                result[contest["remainder"]] = ballots - sum(result.values())
+        return counts
+
+
+def commitment_value(plaintexts):
+    """String committed to with the salt: the packed plaintext(s), '/'-joined (just vote_int for a referendum)."""
+    return "/".join(str(p) for p in plaintexts)
+
+
+def print_results(results):
+    """Print per-contest counts and the leading option of each contest."""
+    for contest, counts in results.items():
+        line = ", ".join(f"{option.capitalize()} = {count}" for option, count in counts.items())
+        print(f"🗳️ {contest}: {line}")
+        best = max(counts.values())
+        leaders = [option for option, count in counts.items() if count == best]
+        if len(leaders) == 1:
+            print(f"🏆 Outcome: Majority chose '{leaders[0].capitalize()}'.")
+        else:
+            print(f"🏆 Outcome: It's a tie between {', '.join(repr(l) for l in leaders)}.")
@@ -0,0 +1,220 @@
+# common/wire.py
+#
+# Compact binary encoding for ciphertexts, shared by client, server and the
+# on-disk ballot files. JSON with decimal strings stays as the fallback.
+#
+# Ballot frame (one or more ballots; a packed ballot has several ciphertext parts):
+#     b"CVB3" | width: u16 | count: u32 |
+#         count × ( id_len: u16 | voter_id: utf-8 | exponent: i32 | parts: u8 | parts × width bytes | proof )
+#
+# each followed by its ballot-validity proof (common/ballot_proof.py), if any:
+#     kind: u8 (0 = none, 1 = proof, 2 = proof with slot ciphertexts) |
+#         [kind 2: slots: u16 | slots × width bytes] |
+#         slot proofs: u16 | slot proofs × sigma | contest proofs: u16 | contest proofs × sigma
+#     sigma = branches: u8 | branches × ( a: width bytes | e: 16 bytes | z: width bytes )
+#
+# Tally frame (one encrypted sum per ciphertext position):
+#     b"CVT2" | width: u16 | parts: u16 | exponent: i32 | parts × width bytes
+#
+# Version 1 frames (b"CVB1" / b"CVT1", always a single part and no parts
+# field) and version 2 ballot frames (b"CVB2", no proofs) are still accepted
+# by the decoders.
+#
+# All integers are big-endian; `width` is the byte length of n², so every
+# ciphertext occupies the same number of bytes.
+
+import struct
+
+BALLOT_MEDIA_TYPE = "application/vnd.cvs.ballots"
+TALLY_MEDIA_TYPE = "application/vnd.cvs.tally"
+
+BALLOT_MAGIC_V1 = b"CVB1"
+BALLOT_MAGIC_V2 = b"CVB2"
+BALLOT_MAGIC = b"CVB3"
+TALLY_MAGIC_V1 = b"CVT1"
+TALLY_MAGIC = b"CVT2"
+
+_FRAME_HEADER = struct.Struct(">4sHI")
+_TALLY_HEADER_V1 = struct.Struct(">4sHi")
+_TALLY_HEADER = struct.Struct(">4sHHi")
+_ID_LEN = struct.Struct(">H")
+_EXPONENT = struct.Struct(">i")
+_PARTS = struct.Struct(">B")
+_COUNT = struct.Struct(">H")
+CHALLENGE_BYTES = 16  # ballot_proof.CHALLENGE_BITS // 8
+
+NO_PROOF, PROOF, PROOF_WITH_SLOTS = 0, 1, 2
+
+
+def ciphertext_width(nsquare):
+    """Number of bytes needed for any ciphertext under this key."""
+    return (nsquare.bit_length() + 7) // 8
+
+
+def _encode_sigmas(parts, proofs, width):
+    parts.append(_COUNT.pack(len(proofs)))
+    for commitments, challenges, responses in proofs:
+        parts.append(_PARTS.pack(len(commitments)))
+        for a, e, z in zip(commitments, challenges, responses):
+            parts.append(a.to_bytes(width, "big"))
+            parts.append(e.to_bytes(CHALLENGE_BYTES, "big"))
+            parts.append(z.to_bytes(width, "big"))
+
+
+def _encode_proof(parts, proof, width):
+    if proof is None:
+        parts.append(_PARTS.pack(NO_PROOF))
+        return
+    slot_ciphertexts, slot_proofs, contest_proofs = proof
+    if slot_ciphertexts is None:
+        parts.append(_PARTS.pack(PROOF))
+    else:
+        parts.append(_PARTS.pack(PROOF_WITH_SLOTS))
+        parts.append(_COUNT.pack(len(slot_ciphertexts)))
+        parts.extend(c.to_bytes(width, "big") for c in slot_ciphertexts)
+    _encode_sigmas(parts, slot_proofs, width)
+    _encode_sigmas(parts, contest_proofs, width)
+
+
+def encode_ballots(ballots, width):
+    """
+    ballots: iterable of (voter_id, [ciphertext_int, ...], exponent), each
+    optionally followed by its ballot proof (ballot_proof.prove_ballot). Returns bytes.
+    """
+    ballots = list(ballots)
+    parts = [_FRAME_HEADER.pack(BALLOT_MAGIC, width, len(ballots))]
+    for voter_id, ciphertexts, exponent, *proof in ballots:
+        vid = voter_id.encode()
+        parts.append(_ID_LEN.pack(len(vid)))
+        parts.append(vid)
+        parts.append(_EXPONENT.pack(exponent))
+        parts.append(_PARTS.pack(len(ciphertexts)))
+        for ciphertext in ciphertexts:
+            parts.append(ciphertext.to_bytes(width, "big"))
+        _encode_proof(parts, proof[0] if proof else None, width)
+    return b"".join(parts)
+
+
+def _take(view, offset, size):
+    if offset + size > len(view):
+        raise ValueError("truncated ballot frame")
+    return int.from_bytes(view[offset:offset + size], "big"), offset + size
+
+
+def _decode_sigmas(view, offset, width):
+    (count,) = _COUNT.unpack_from(view, offset)
+    offset += _COUNT.size
+    proofs = []
+    for _ in range(count):
+        (branches,) = _PARTS.unpack_from(view, offset)
+        offset += _PARTS.size
+        commitments, challenges, responses = [], [], []
+        for _ in range(branches):
+            a, offset = _take(view, offset, width)
+            e, offset = _take(view, offset, CHALLENGE_BYTES)
+            z, offset = _take(view, offset, width)
+            commitments.append(a)
+            challenges.append(e)
+            responses.append(z)
+        proofs.append((tuple(commitments), tuple(challenges), tuple(responses)))
+    return tuple(proofs), offset
+
+
+def _decode_proof(view, offset, width):
+    (kind,) = _PARTS.unpack_from(view, offset)
+    offset += _PARTS.size
+    if kind == NO_PROOF:
+        return None, offset
+    if kind not in (PROOF, PROOF_WITH_SLOTS):
+        raise ValueError(f"unknown proof kind {kind}")
+    slot_ciphertexts = None
+    if kind == PROOF_WITH_SLOTS:
+        (slots,) = _COUNT.unpack_from(view, offset)
+        offset += _COUNT.size
+        slot_ciphertexts = []
+        for _ in range(slots):
+            c, offset = _take(view, offset, width)
+            slot_ciphertexts.append(c)
+        slot_ciphertexts = tuple(slot_ciphertexts)
+    slot_proofs, offset = _decode_sigmas(view, offset, width)
+    contest_proofs, offset = _decode_sigmas(view, offset, width)
+    return (slot_ciphertexts, slot_proofs, contest_proofs), offset
+
+
+def decode_ballots(data, width=None):
+    """
+    Parse a ballot frame into a list of (voter_id, (ciphertext_int, ...), exponent).
+    If width is given, the frame must have been encoded for that width.
+    Raises ValueError on malformed input.
+    """
+    return [ballot[:3] for ballot in decode_proven_ballots(data, width)]
+
+
+def decode_proven_ballots(data, width=None):
+    """
+    Like decode_ballots, with each ballot's proof as a fourth element: the ballot
+    proof ballot_proof.ballot_statements takes, or None if the ballot has none.
+    """
+    view = memoryview(data)
+    if len(view) < _FRAME_HEADER.size:
+        raise ValueError("ballot frame too short")
+    magic, frame_width, count = _FRAME_HEADER.unpack_from(view, 0)
+    if magic not in (BALLOT_MAGIC, BALLOT_MAGIC_V2, BALLOT_MAGIC_V1):
+        raise ValueError("not a ballot frame")
+    if width is not None and frame_width != width:
+        raise ValueError(f"ciphertext width {frame_width} does not match key ({width} bytes)")
+
+    offset = _FRAME_HEADER.size
+    ballots = []
+    try:
+        for _ in range(count):
+            (id_len,) = _ID_LEN.unpack_from(view, offset)
+            offset += _ID_LEN.size
+            voter_id = bytes(view[offset:offset + id_len]).decode()
+            if not voter_id:
+                raise ValueError("empty voter id")
+            offset += id_len
+            (exponent,) = _EXPONENT.unpack_from(view, offset)
+            offset += _EXPONENT.size
+            num_parts = 1
+            if magic != BALLOT_MAGIC_V1:
+                (num_parts,) = _PARTS.unpack_from(view, offset)
+                offset += _PARTS.size
+            if offset + num_parts * frame_width > len(view):
+                raise ValueError("truncated ciphertext")
+            ciphertexts = []
+            for _ in range(num_parts):
+                ciphertexts.append(int.from_bytes(view[offset:offset + frame_width], "big"))
+                offset += frame_width
+            proof = None
+            if magic == BALLOT_MAGIC:
+                proof, offset = _decode_proof(view, offset, frame_width)
+            ballots.append((voter_id, tuple(ciphertexts), exponent, proof))
+    except struct.error:
+        raise ValueError("truncated ballot frame")
+    if offset != len(view):
+        raise ValueError("trailing bytes after ballot frame")
+    return ballots
+
+
+def encode_tally(ciphertexts, exponent, width):
+    body = [_TALLY_HEADER.pack(TALLY_MAGIC, width, len(ciphertexts), exponent)]
+    body.extend(c.to_bytes(width, "big") for c in ciphertexts)
+    return b"".join(body)
+
+
+def decode_tally(data):
+    """Parse a tally frame into ([ciphertext_int, ...], exponent). Raises ValueError on malformed input."""
+    if data[:4] == TALLY_MAGIC_V1 and len(data) >= _TALLY_HEADER_V1.size:
+        _, width, exponent = _TALLY_HEADER_V1.unpack_from(data, 0)
+        offset, num_parts = _TALLY_HEADER_V1.size, 1
+    elif data[:4] == TALLY_MAGIC and len(data) >= _TALLY_HEADER.size:
+        _, width, num_parts, exponent = _TALLY_HEADER.unpack_from(data, 0)
+        offset = _TALLY_HEADER.size
+    else:
+        raise ValueError("malformed tally frame")
+    if len(data) != offset + num_parts * width:
+        raise ValueError("malformed tally frame")
+    ciphertexts = [int.from_bytes(data[offset + i * width:offset + (i + 1) * width], "big")
+                   for i in range(num_parts)]
+    return ciphertexts, exponent
@@ -1,15 +1,27 @@
-import pickle
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
 from phe import paillier
 
-# 1. Generate a Paillier keypair
-pubkey, privkey = paillier.generate_paillier_keypair()
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import bigint, keyfile
+
+parser = argparse.ArgumentParser(description="Generate a Paillier keypair into key files (common/keyfile.py).")
+parser.add_argument("--key-size", type=int, default=paillier.DEFAULT_KEYSIZE, help="modulus size in bits")
+parser.add_argument("--processes", type=int, default=os.cpu_count(), help="prime-search worker processes")
+parser.add_argument("--out-dir", default=str(Path(__file__).parent), help="directory for the key files")
+args = parser.parse_args()
 
-# 2. Save the public key
-with open("keys/pubkey.pkl", "wb") as f:
-    pickle.dump(pubkey, f)
+# 1. Generate a Paillier keypair (primes searched for in parallel by the big-integer backend: gmpy2 if installed)
+start = time.perf_counter()
+pubkey, privkey = bigint.generate_paillier_keypair(args.key_size, processes=args.processes)
+elapsed = time.perf_counter() - start
 
-# 3. Save the private key
-with open("keys/privkey.pkl", "wb") as f:
-    pickle.dump(privkey, f)
+# 2. Save both keys, the private one with its precomputed CRT decryption values
+public_path, private_path = keyfile.save_keypair(args.out_dir, pubkey, privkey)
 
-print("Paillier keypair generated and saved in keys/")
\ No newline at end of file
+print(f"{args.key_size}-bit Paillier keypair generated in {elapsed:.2f} s with {args.processes} process(es) "
+      f"and saved to {public_path} and {private_path} ({bigint.NAME} big-integer backend)")
@@ -1,85 +1,311 @@
 #!/usr/bin/env python3
-import subprocess
+# main.py
+#
+# Launcher for the confidential voting system: an interactive menu, or a
+# non-interactive CLI with one subcommand per action:
+#
+#   python main.py                                   # menu
+#   python main.py keygen --key-size 3072
+#   python main.py tally --votes-dir votes/
+#   python main.py server-tally --server http://localhost:5000 --election city-2026
+#   python main.py server -- --no-log --quiet        # arguments after -- go to the script
+#
+# Every action runs in this process. Subsystems (phe, requests, flask, the
+# server/ and client/ modules) are imported the first time an action needs
+# them and stay imported. The built-in actions (keygen, tally, server-tally,
+# segments) also share the Paillier keys from keys/ (common/keyfile.py) and
+# one HTTP session, loaded once. The script actions (vote, server, verify,
+# verify-vote, load) run their script as if started directly: they reuse the
+# warm imports, but load their own keys and open their own connections.
+# Each action reports its start-up time (lazy imports + key loading) next to
+# its total time.
+
+import argparse
+import importlib
+import os
 import sys
+import time
 from pathlib import Path
 
-def run_script(script_path, args=None):
+PROJECT_ROOT = Path(__file__).parent
+KEYS_DIR = PROJECT_ROOT / "keys"
+DEFAULT_SERVER = "http://localhost:5000"
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Shared state across actions: imported modules, keys, HTTP session
+# ─────────────────────────────────────────────────────────────────────
+class Context:
+    def __init__(self):
+        self.startup_seconds = 0.0  # lazy imports + key loading during the current action
+        self.history = []           # (command, startup seconds, total seconds, exit code)
+        self._keys = None
+        self._http = None
+
+    def module(self, name, path=None):
+        """Import a module on first use (path: directory to put on sys.path for sibling imports)."""
+        if name in sys.modules:
+            return sys.modules[name]
+        start = time.perf_counter()
+        if path is not None and str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+        module = importlib.import_module(name)
+        self.startup_seconds += time.perf_counter() - start
+        return module
+
+    def keys(self):
+        """(public key, private key) from keys/ (key files, or the legacy pickles), loaded once."""
+        if self._keys is None:
+            keyfile = self.module("common.keyfile", PROJECT_ROOT)
+            start = time.perf_counter()
+            self._keys = keyfile.load_keypair(KEYS_DIR)
+            self.startup_seconds += time.perf_counter() - start
+        return self._keys
+
+    def set_keys(self, pubkey, privkey):
+        self._keys = pubkey, privkey
+
+    def http(self):
+        """One keep-alive requests.Session for every action that talks to the server."""
+        if self._http is None:
+            self._http = self.module("requests").Session()
+        return self._http
+
+
+def run_script(ctx, script_path, args):
     """
-    Helper to run a Python script (in the same venv).
-    script_path: Path to the .py file you want to run
-    args: an optional list of additional arguments to pass
+    Run a script as __main__ inside this interpreter (its own directory first
+    on sys.path, as when started directly); returns its exit code.
     """
-    if args is None:
-        args = []
+    runpy = ctx.module("runpy")
+    saved_argv, saved_path = sys.argv, list(sys.path)
+    sys.argv = [str(script_path)] + list(args)
+    sys.path.insert(0, str(script_path.parent))
     try:
-        # Use the same Python interpreter that launched this script:
-        python_exe = sys.executable
-        cmd = [python_exe, str(script_path)] + args
-        result = subprocess.run(cmd, capture_output=False)
-        # If the script returns a non-zero exit code, propagate it
-        if result.returncode != 0:
-            print(f"\nScript {script_path.name} exited with code {result.returncode}\n")
-        return result.returncode
-    except FileNotFoundError:
-        print(f"Could not find {script_path}")
+        runpy.run_path(str(script_path), run_name="__main__")
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code)
         return 1
+    except KeyboardInterrupt:
+        print()
+        return 130
+    finally:
+        sys.argv, sys.path[:] = saved_argv, saved_path
 
-def generate_keys():
-    print("\n=== Generating Paillier keypair ===")
-    keygen_script = Path(__file__).parent / "keys" / "keygen_paillier.py"
-    return run_script(keygen_script)
 
-def cast_vote():
-    print("\n=== Casting a new vote ===")
-    client_script = Path(__file__).parent / "client" / "client.py"
-    return run_script(client_script)
+# ─────────────────────────────────────────────────────────────────────
+# Actions. Each takes (ctx, args) and returns an exit code; args are the
+# remaining command-line arguments (parsed by the action itself).
+# ─────────────────────────────────────────────────────────────────────
+def generate_keys(ctx, args):
+    parser = argparse.ArgumentParser(prog="main.py keygen", description="Generate a Paillier keypair into keys/.")
+    parser.add_argument("--key-size", type=int, default=2048, help="modulus size in bits")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="prime-search worker processes")
+    opts = parser.parse_args(args)
 
-def tally_votes():
-    print("\n=== Tallying votes on server ===")
-    server_script = Path(__file__).parent / "server" / "server.py"
-    return run_script(server_script)
+    bigint = ctx.module("common.bigint", PROJECT_ROOT)
+    keyfile = ctx.module("common.keyfile", PROJECT_ROOT)
+    start = time.perf_counter()
+    pubkey, privkey = bigint.generate_paillier_keypair(n_length=opts.key_size, processes=opts.processes)
+    keyfile.save_keypair(KEYS_DIR, pubkey, privkey)
+    ctx.set_keys(pubkey, privkey)
+    print(f"🔑 {opts.key_size}-bit Paillier keypair generated in {time.perf_counter() - start:.2f} s and saved in "
+          f"keys/ ({bigint.NAME} big-integer backend, {opts.processes} process(es))")
+    return 0
 
-def verify_all_votes():
-    print("\n=== Verifying all commitments ===")
-    verify_script = Path(__file__).parent / "server" / "verify_all.py"
-    return run_script(verify_script)
 
-def show_menu():
-    print("""
-=== Confidential Voting System Launcher ===
+def cast_vote(ctx, args):
+    ctx.module("phe")
+    ctx.module("requests")
+    return run_script(ctx, PROJECT_ROOT / "client" / "client.py", args)
 
-Please choose an action (enter the number):
 
-  1) Generate Paillier keypair (keys/keygen_paillier.py)
-  2) Cast a new vote (client/client.py)
-  3) Tally votes (server/server.py)
-  4) Verify all commitments (server/verify_all.py)
-  5) Exit
-""")
+def run_server(ctx, args):
+    ctx.module("flask")
+    ctx.module("phe")
+    return run_script(ctx, PROJECT_ROOT / "server" / "server.py", args)
 
-if __name__ == "__main__":
+
+def tally_votes(ctx, args):
+    """Offline tally of votes/ with the key from keys/ (see server/tally.py)."""
+    parser = argparse.ArgumentParser(prog="main.py tally", description="Tally the encrypted ballots in votes/.")
+    parser.add_argument("--votes-dir", default=str(PROJECT_ROOT / "votes"))
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="ballot files per worker task")
+    opts = parser.parse_args(args)
+
+    tally = ctx.module("tally", PROJECT_ROOT / "server")
+    packing = ctx.module("common.packing", PROJECT_ROOT)
+    pubkey, privkey = ctx.keys()
+    if not Path(opts.votes_dir).is_dir():
+        print(f"❌ Error: votes directory not found at {opts.votes_dir}")
+        return 1
+
+    encrypted_sums, counted, skipped = tally.tally_directory(opts.votes_dir, pubkey, 1, opts.processes,
+                                                             opts.chunk_size)
+    batch_decrypt = ctx.module("common.batch_decrypt", PROJECT_ROOT)
+    totals = batch_decrypt.decrypt_many(privkey, [s.ciphertext(be_secure=False) for s in encrypted_sums], processes=1)
+    try:
+        results = tally.decode_tally(totals, counted, pubkey.n)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"📊 {counted} ballots counted, {skipped} skipped")
+    packing.print_results(results)
+    return 0
+
+
+def server_tally(ctx, args):
+    """Fetch the running encrypted tally from the server and decrypt it with the key from keys/."""
+    parser = argparse.ArgumentParser(prog="main.py server-tally", description="Decrypt the server's running tally.")
+    parser.add_argument("--server", default=DEFAULT_SERVER)
+    parser.add_argument("--election", help="election id (default: the server's default election)")
+    opts = parser.parse_args(args)
+
+    batch_decrypt = ctx.module("common.batch_decrypt", PROJECT_ROOT)
+    packing = ctx.module("common.packing", PROJECT_ROOT)
+    pubkey, privkey = ctx.keys()
+    base = opts.server.rstrip("/") + (f"/elections/{opts.election}" if opts.election else "")
+
+    resp = ctx.http().get(f"{base}/get_encrypted_tally")
+    if resp.status_code != 200:
+        print("❌ Error retrieving tally:", resp.text)
+        return 1
+    data = resp.json()
+    totals = batch_decrypt.decrypt_many(privkey, [int(c) for c in data["ciphertexts"]], processes=1)
+    count = data["ballot_count"]
+    if data.get("ballot_layout"):
+        layout = packing.BallotLayout.from_dict(data["ballot_layout"], pubkey.n)
+    else:
+        layout = packing.BallotLayout(packing.REFERENDUM, max(count, 1), pubkey.n)
+    print(f"🗳️ Tally of {count} ballot(s):")
+    packing.print_results(layout.decode(totals, count))
+    return 0
+
+
+def segment_tallies(ctx, args):
+    """Decrypt every segment's tally in one batch (see server/segment_tally.py)."""
+    parser = argparse.ArgumentParser(prog="main.py segments", description="Decrypt per-segment tallies.")
+    parser.add_argument("--server", default=DEFAULT_SERVER)
+    parser.add_argument("--election", help="election id (default: the server's default election)")
+    parser.add_argument("--processes", type=int, default=None, help="decryption worker processes")
+    opts = parser.parse_args(args)
+
+    segment_tally = ctx.module("segment_tally", PROJECT_ROOT / "server")
+    packing = ctx.module("common.packing", PROJECT_ROOT)
+    _, privkey = ctx.keys()
+    base = opts.server.rstrip("/") + (f"/elections/{opts.election}" if opts.election else "")
+
+    resp = ctx.http().get(f"{base}/get_segment_tallies")
+    if resp.status_code != 200:
+        print("❌ Error retrieving segment tallies:", resp.text)
+        return 1
+    data = resp.json()
+    for name, results in segment_tally.decrypt_segments(privkey, data, opts.processes).items():
+        print(f"📍 Segment '{name}' ({data['segments'][name]['ballot_count']} ballot(s)):")
+        packing.print_results(results)
+    return 0
+
+
+def verify_all_votes(ctx, args):
+    return run_script(ctx, PROJECT_ROOT / "server" / "verify_all.py", args)
+
+
+def verify_vote(ctx, args):
+    ctx.module("requests")
+    return run_script(ctx, PROJECT_ROOT / "client" / "verify_vote.py", args)
+
+
+def load_test(ctx, args):
+    ctx.module("phe")
+    ctx.module("requests")
+    return run_script(ctx, PROJECT_ROOT / "client" / "load_generator.py", args)
+
+
+def show_stats(ctx, args):
+    if not ctx.history:
+        print("No actions run yet.")
+        return 0
+    print(f"{'command':<14} {'startup ms':>11} {'total s':>9}  exit")
+    for command, startup, total, rc in ctx.history:
+        print(f"{command:<14} {startup * 1000:>11.1f} {total:>9.3f}  {rc}")
+    return 0
+
+
+# name → (menu label, action)
+COMMANDS = {
+    "keygen": ("Generate Paillier keypair (keys/)", generate_keys),
+    "vote": ("Cast votes at a kiosk (client/client.py)", cast_vote),
+    "server": ("Run the tally server (server/server.py)", run_server),
+    "tally": ("Tally votes/ offline with keys/ (server/tally.py)", tally_votes),
+    "server-tally": ("Decrypt the server's running tally with keys/", server_tally),
+    "segments": ("Decrypt per-segment tallies with keys/ (server/segment_tally.py)", segment_tallies),
+    "verify": ("Verify all commitments (server/verify_all.py)", verify_all_votes),
+    "verify-vote": ("Verify my own vote (client/verify_vote.py)", verify_vote),
+    "load": ("Generate load against the server (client/load_generator.py)", load_test),
+    "stats": ("Show start-up and run times of the actions so far", show_stats),
+}
+
+
+def dispatch(ctx, command, args):
+    _, action = COMMANDS[command]
+    ctx.startup_seconds = 0.0
+    start = time.perf_counter()
+    try:
+        rc = action(ctx, args)
+    except SystemExit as e:  # argparse errors and --help inside an action
+        rc = e.code if isinstance(e.code, int) else 1
+    except Exception as e:
+        print(f"❌ {command} failed: {e}")
+        rc = 1
+    total = time.perf_counter() - start
+    if command != "stats":
+        ctx.history.append((command, ctx.startup_seconds, total, rc))
+        print(f"⏱️  {command}: start-up {ctx.startup_seconds * 1000:.1f} ms (imports, keys), total {total:.3f}s")
+    return rc
+
+
+def show_menu():
+    print("\n=== Confidential Voting System Launcher ===\n")
+    print("Please choose an action (enter the number or the command name):\n")
+    for i, (name, (label, _)) in enumerate(COMMANDS.items(), start=1):
+        print(f"  {i:>2}) {label}  [{name}]")
+    print(f"  {len(COMMANDS) + 1:>2}) Exit\n")
+
+
+def interactive(ctx):
+    names = list(COMMANDS)
     while True:
         show_menu()
         choice = input("Your choice: ").strip()
-
-        if choice == "1":
-            rc = generate_keys()
-        elif choice == "2":
-            rc = cast_vote()
-        elif choice == "3":
-            rc = tally_votes()
-        elif choice == "4":
-            rc = verify_all_votes()
-        elif choice == "5":
+        if choice in (str(len(names) + 1), "exit", "quit"):
             print("Exiting. Goodbye!")
-            sys.exit(0)
-        else:
-            print("Invalid choice. Please enter 1, 2, 3, 4, or 5.")
+            return 0
+        command, *args = choice.split() or [""]
+        if command.isdigit() and 1 <= int(command) <= len(names):
+            command = names[int(command) - 1]
+        if command not in COMMANDS:
+            print(f"Invalid choice. Please enter 1-{len(names) + 1} or one of: {', '.join(names)}.")
             continue
 
-        # After each action, loop back to menu if rc == 0
-        if rc == 0:
-            input("\n--- Press ENTER to return to the main menu ---\n")
-        else:
-            print("\nThere was an error in the last step. Returning to main menu.\n")
-            input("--- Press ENTER to continue ---\n")
+        rc = dispatch(ctx, command, args)
+        # After each action, loop back to menu
+        if rc != 0:
+            print("\nThere was an error in the last step. Returning to main menu.")
+        input("\n--- Press ENTER to return to the main menu ---\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        sys.exit(interactive(Context()))
+
+    parser = argparse.ArgumentParser(description="Confidential voting system launcher.",
+                                     epilog="Run without arguments for the interactive menu.")
+    parser.add_argument("command", choices=list(COMMANDS), help="action to run")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments for the action (see main.py <command> -h)")
+    cli = parser.parse_args()
+    args = cli.args[1:] if cli.args[:1] == ["--"] else cli.args
+    sys.exit(dispatch(Context(), cli.command, args))
@@ -0,0 +1,199 @@
+# server/accumulator.py
+
+import sys
+import threading
+from pathlib import Path
+
+from phe import paillier
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import bigint
+from homomorphic import multiply_ciphertexts
+
+TAG_MODULUS = 1 << 128  # ballot-id tags are summed mod 2^128 (an order-independent multiset digest)
+
+
+class _Shard:
+    __slots__ = ("lock", "products", "count", "tag")
+
+    def __init__(self, parts):
+        self.lock = threading.Lock()
+        self.products = [1] * parts
+        self.count = 0
+        self.tag = 0
+
+    def memory_bytes(self):
+        return (sys.getsizeof(self) + sys.getsizeof(self.lock) + sys.getsizeof(self.products)
+                + sum(sys.getsizeof(p) for p in self.products))
+
+
+class ShardedAccumulator:
+    """
+    Thread-safe homomorphic running sum split into independent shards.
+
+    Each request thread multiplies its ballots into the shard picked by its
+    native thread id, so parallel submitters almost never wait on the same
+    lock. The shards are only combined when the tally is requested.
+
+    A ballot is a tuple of `parts` ciphertexts (one per packed plaintext);
+    every position keeps its own running product. Callers may also pass a
+    `tag` (e.g. the sum of the ballots' voter-id digests); tags are summed
+    mod 2^128 under the same shard lock as the products, so merge_tagged()
+    returns a digest of exactly the ballots in the sum.
+
+    Shards are created the first time a thread maps to them, so a small
+    election that only ever sees a few request threads stays small.
+    """
+
+    def __init__(self, pubkey, parts=1, num_shards=16):
+        self.pubkey = pubkey
+        self.parts = parts
+        self.nsquare = pubkey.nsquare
+        self._shards = [None] * num_shards
+        self._create_lock = threading.Lock()
+
+    def _shard(self, index=None):
+        if index is None:
+            index = threading.get_native_id() % len(self._shards)
+        shard = self._shards[index]
+        if shard is None:
+            with self._create_lock:
+                shard = self._shards[index]
+                if shard is None:
+                    shard = self._shards[index] = _Shard(self.parts)
+        return shard
+
+    def _created_shards(self):
+        return [shard for shard in self._shards if shard is not None]
+
+    def add(self, ciphertexts, tag=0):
+        """Homomorphically add one ballot (a tuple of raw ciphertexts, exponent 0)."""
+        shard = self._shard()
+        with shard.lock:
+            products = shard.products
+            for i, c in enumerate(ciphertexts):
+                products[i] = bigint.mulmod(products[i], c, self.nsquare)
+            shard.count += 1
+            shard.tag = (shard.tag + tag) % TAG_MODULUS
+
+    def add_many(self, ballots, tag=0):
+        """Homomorphically add a list of ballots with a single shard update."""
+        batch = [multiply_ciphertexts((b[i] for b in ballots), self.nsquare) for i in range(self.parts)]
+        shard = self._shard()
+        with shard.lock:
+            products = shard.products
+            for i, c in enumerate(batch):
+                products[i] = bigint.mulmod(products[i], c, self.nsquare)
+            shard.count += len(ballots)
+            shard.tag = (shard.tag + tag) % TAG_MODULUS
+
+    def seed(self, products, count, tag=0):
+        """Fold in previously computed partial products (e.g. recovered from the ballot log)."""
+        shard = self._shard(0)
+        with shard.lock:
+            for i, c in enumerate(products):
+                shard.products[i] = bigint.mulmod(shard.products[i], c, self.nsquare)
+            shard.count += count
+            shard.tag = (shard.tag + tag) % TAG_MODULUS
+
+    def merge(self):
+        """Return (raw products of all shards mod n², one per position; number of ballots added)."""
+        products, count, _ = self.merge_tagged()
+        return products, count
+
+    def merge_tagged(self):
+        """Like merge(), plus the sum of the added ballots' tags mod 2^128."""
+        products, count, tag = [1] * self.parts, 0, 0
+        for shard in self._created_shards():
+            with shard.lock:
+                for i, c in enumerate(shard.products):
+                    products[i] = bigint.mulmod(products[i], c, self.nsquare)
+                count += shard.count
+                tag += shard.tag
+        return products, count, tag % TAG_MODULUS
+
+    def compact(self):
+        """Fold every shard into the first one, freeing the others' running products."""
+        products, count, tag = [1] * self.parts, 0, 0
+        for shard in self._shards[1:]:
+            if shard is None:
+                continue
+            with shard.lock:
+                for i, c in enumerate(shard.products):
+                    products[i] = bigint.mulmod(products[i], c, self.nsquare)
+                count += shard.count
+                tag += shard.tag
+                shard.products = [1] * self.parts
+                shard.count = 0
+                shard.tag = 0
+        if count:
+            self.seed(products, count, tag % TAG_MODULUS)
+
+    def memory_bytes(self):
+        return sys.getsizeof(self._shards) + sum(shard.memory_bytes() for shard in self._created_shards())
+
+    def encrypted_sums(self):
+        """Merge all shards: (one EncryptedNumber per ciphertext position, number of ballots added)."""
+        products, count = self.merge()
+        return [paillier.EncryptedNumber(self.pubkey, p, 0) for p in products], count
+
+    def __len__(self):
+        return sum(shard.count for shard in self._created_shards())
+
+
+class SegmentedAccumulator:
+    """
+    Separate running products per segment (precinct, kiosk, hour, ...), kept
+    alongside the global ShardedAccumulator. Segments are created on first
+    use; each has its own lock, so only ballots for the same segment contend.
+    """
+
+    def __init__(self, pubkey, parts=1):
+        self.pubkey = pubkey
+        self.parts = parts
+        self.nsquare = pubkey.nsquare
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def _segment(self, name):
+        segment = self._segments.get(name)
+        if segment is None:
+            with self._lock:
+                segment = self._segments.setdefault(name, _Shard(self.parts))
+        return segment
+
+    def add_many(self, name, ballots):
+        """Homomorphically add a list of ballots (tuples of raw ciphertexts) to segment `name`."""
+        batch = [multiply_ciphertexts((b[i] for b in ballots), self.nsquare) for i in range(self.parts)]
+        segment = self._segment(name)
+        with segment.lock:
+            products = segment.products
+            for i, c in enumerate(batch):
+                products[i] = bigint.mulmod(products[i], c, self.nsquare)
+            segment.count += len(ballots)
+
+    def seed(self, name, products, count):
+        segment = self._segment(name)
+        with segment.lock:
+            for i, c in enumerate(products):
+                segment.products[i] = bigint.mulmod(segment.products[i], c, self.nsquare)
+            segment.count += count
+
+    def snapshot(self):
+        """Return {segment: (raw products mod n², number of ballots)}."""
+        with self._lock:
+            segments = list(self._segments.items())
+        result = {}
+        for name, segment in segments:
+            with segment.lock:
+                result[name] = (list(segment.products), segment.count)
+        return result
+
+    def memory_bytes(self):
+        with self._lock:
+            segments = list(self._segments.items())
+        return sys.getsizeof(self._segments) + sum(sys.getsizeof(name) + segment.memory_bytes()
+                                                   for name, segment in segments)
+
+    def __len__(self):
+        return len(self._segments)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# server/accumulator_stress.py
+#
+# Concurrency stress test: many threads submit ballots through the Flask app
+# at the same time (single and batch endpoints), then we check that the
+# decrypted tally counts every single ballot.
+
+import contextlib
+import io
+import threading
+
+from phe import paillier
+
+import server
+
+NUM_THREADS = 32
+BALLOTS_PER_THREAD = 200
+BATCH_SIZE = 25
+
+# 1. Small keypair: we are testing for lost updates, not cryptographic strength
+pubkey, privkey = paillier.generate_paillier_keypair(n_length=1024)
+
+# 2. Pre-build the ballots. r = 1 keeps encryption cheap; each ciphertext is
+#    still a valid encryption of 0 or 1 under pubkey. The server rejects
+#    replayed ciphertexts, so every ballot is re-randomised by a different
+#    power of one encryption of zero (one modular multiply each).
+zero = pubkey.raw_encrypt(0, r_value=2)
+
+
+def distinct_encryptions(plaintext, count):
+    c, result = pubkey.raw_encrypt(plaintext, r_value=1), []
+    for _ in range(count):
+        c = c * zero % pubkey.nsquare
+        result.append(str(c))
+    return result
+
+
+yes_cts = distinct_encryptions(1, NUM_THREADS * BALLOTS_PER_THREAD)
+no_cts = distinct_encryptions(0, NUM_THREADS)
+
+server.require_proofs = False  # the r = 1 ballots below carry no validity proofs; lost updates are under test
+client = server.app.test_client()
+with contextlib.redirect_stdout(io.StringIO()):
+    assert client.post("/set_public_key", json={"n": str(pubkey.n)}).status_code == 200
+
+errors = []
+start_barrier = threading.Barrier(NUM_THREADS)
+
+
+def submitter(thread_index):
+    # Every thread posts its own test client requests; even threads use the
+    # single-ballot endpoint, odd threads use the batch endpoint.
+    ballots = [{"voter_id": f"t{thread_index}-v{i}", "exponent": 0,
+                "ciphertext": yes_cts[thread_index * BALLOTS_PER_THREAD + i]} for i in range(BALLOTS_PER_THREAD)]
+    local_client = server.app.test_client()
+    start_barrier.wait()
+    try:
+        if thread_index % 2 == 0:
+            for ballot in ballots:
+                resp = local_client.post("/submit_vote", json=ballot)
+                assert resp.status_code == 200, resp.get_data(as_text=True)
+        else:
+            for i in range(0, len(ballots), BATCH_SIZE):
+                resp = local_client.post("/submit_votes", json={"ballots": ballots[i:i + BATCH_SIZE]})
+                assert resp.status_code == 200 and resp.get_json()["rejected"] == 0
+        # A few "no" ballots as well, so the tally is not trivially equal to the count
+        resp = local_client.post("/submit_vote", json={"voter_id": f"t{thread_index}-no",
+                                                       "ciphertext": no_cts[thread_index], "exponent": 0})
+        assert resp.status_code == 200
+        # A second vote under the same voter id, and a replayed ciphertext under a new one, are both rejected
+        resp = local_client.post("/submit_vote", json=dict(ballots[1], ciphertext=yes_cts[-1 - thread_index]))
+        assert resp.status_code == 409, resp.get_data(as_text=True)
+        resp = local_client.post("/submit_vote", json=dict(ballots[0], voter_id=f"t{thread_index}-replay"))
+        assert resp.status_code == 409, resp.get_data(as_text=True)
+    except Exception as e:  # surface failures from worker threads in the main thread
+        errors.append(e)
+
+
+# 3. Hammer the server from many threads at once
+with contextlib.redirect_stdout(io.StringIO()):
+    threads = [threading.Thread(target=submitter, args=(i,)) for i in range(NUM_THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    tally = client.get("/get_encrypted_tally").get_json()
+
+assert not errors, errors
+
+# 4. Every ballot must be in the sum
+expected_yes = NUM_THREADS * BALLOTS_PER_THREAD
+expected_count = expected_yes + NUM_THREADS
+total_yes = privkey.decrypt(paillier.EncryptedNumber(pubkey, int(tally["ciphertext"]), int(tally["exponent"])))
+assert total_yes == expected_yes, f"Expected {expected_yes} yes votes, got {total_yes}"
+assert len(server.elections.get(server.DEFAULT_ELECTION).accumulator) == expected_count, \
+    f"Expected {expected_count} ballots, accumulator holds {len(server.elections.get(server.DEFAULT_ELECTION).accumulator)}"
+
+print(f"Accumulator stress test passed: {expected_count} ballots from {NUM_THREADS} threads, none lost.")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# server/aggregation_smoke.py
+#
+# End-to-end check of hierarchical aggregation: starts a parent server and two
+# aggregator nodes (--upstream parent) as subprocesses, submits ballots to the
+# aggregators only, then checks that the parent's tally decrypts to the total
+# over both sites, that its ballot count adds up, and that its ballot-id digest
+# is the sum of the aggregators' digests.
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+from phe import paillier
+
+ROOT = Path(__file__).parent.parent
+PARENT_PORT = 5100
+CHILD_PORTS = (5101, 5102)
+TOKEN = "smoke-test-token"
+BALLOTS_PER_CHILD = 150
+DIGEST_MODULUS = 1 << 128
+
+
+def spawn(port, *extra):
+    return subprocess.Popen([sys.executable, str(ROOT / "server" / "server.py"), "--no-log", "--quiet",
+                             "--no-require-proofs", "--port", str(port), "--partial-token", TOKEN, *extra],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_for_server(url, timeout=15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/metrics", timeout=1)
+            return True
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    return False
+
+
+def get_tally(url):
+    """The JSON tally, or None while the server has no key yet."""
+    resp = requests.get(f"{url}/get_encrypted_tally", timeout=10)
+    return resp.json() if resp.status_code == 200 else None
+
+
+# Small keypair and cheap distinct encryptions (r = 1 re-randomised by powers
+# of one encryption of zero), as in accumulator_stress.py
+pubkey, privkey = paillier.generate_paillier_keypair(n_length=1024)
+zero = pubkey.raw_encrypt(0, r_value=2)
+ones, c = [], pubkey.raw_encrypt(1, r_value=1)
+for _ in range(len(CHILD_PORTS) * BALLOTS_PER_CHILD):
+    c = c * zero % pubkey.nsquare
+    ones.append(str(c))
+
+parent_url = f"http://localhost:{PARENT_PORT}"
+processes = [spawn(PARENT_PORT)]
+processes += [spawn(port, "--upstream", parent_url, "--node-id", f"site-{i}", "--forward-interval", "0.2")
+              for i, port in enumerate(CHILD_PORTS)]
+child_urls = [f"http://localhost:{port}" for port in CHILD_PORTS]
+
+try:
+    for url in [parent_url] + child_urls:
+        assert wait_for_server(url), f"no server at {url}"
+
+    # 1. Unauthenticated partials are refused
+    resp = requests.post(f"{parent_url}/submit_partial", json={}, timeout=5)
+    assert resp.status_code == 401, resp.text
+
+    # 2. Every site votes: child i gets BALLOTS_PER_CHILD ballots, the first (i + 1) * 10 of them "yes"
+    expected_yes = 0
+    for i, url in enumerate(child_urls):
+        assert requests.post(f"{url}/set_public_key", json={"n": str(pubkey.n)}, timeout=5).status_code == 200
+        yes = (i + 1) * 10
+        expected_yes += yes
+        ballots = [{"voter_id": f"site{i}-voter{j}", "exponent": 0,
+                    "ciphertext": ones[i * BALLOTS_PER_CHILD + j] if j < yes else str(pow(zero, j + 2, pubkey.nsquare))}
+                   for j in range(BALLOTS_PER_CHILD)]
+        resp = requests.post(f"{url}/submit_votes", json={"ballots": ballots}, timeout=30)
+        assert resp.status_code == 200 and resp.json()["rejected"] == 0, resp.text
+
+    # 3. Wait for both partials to reach the parent
+    expected_count = len(CHILD_PORTS) * BALLOTS_PER_CHILD
+    deadline = time.time() + 15
+    tally = get_tally(parent_url)
+    while (tally is None or tally["ballot_count"] != expected_count) and time.time() < deadline:
+        time.sleep(0.2)
+        tally = get_tally(parent_url)
+    assert tally is not None and tally["ballot_count"] == expected_count, tally
+
+    total = privkey.decrypt(paillier.EncryptedNumber(pubkey, int(tally["ciphertext"]), tally["exponent"]))
+    assert total == expected_yes, (total, expected_yes)
+
+    digests = [int(get_tally(url)["ballot_ids_digest"], 16) for url in child_urls]
+    assert int(tally["ballot_ids_digest"], 16) == sum(digests) % DIGEST_MODULUS
+
+    summary = requests.get(f"{parent_url}/elections/default", timeout=5).json()
+    assert sorted(summary["child_nodes"]) == ["site-0", "site-1"], summary["child_nodes"]
+
+    print(f"✅ Parent tally: {total} yes out of {tally['ballot_count']} ballot(s) from {len(CHILD_PORTS)} "
+          f"aggregator node(s); ballot-id digest {tally['ballot_ids_digest']} matches.")
+finally:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
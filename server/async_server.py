@@ -0,0 +1,601 @@
+# server/async_server.py
+#
+# asyncio variant of server.py for many concurrent kiosks. It is an ASGI
+# application (`app`), served by uvicorn when that is installed and by a
+# small built-in HTTP/1.1 server (keep-alive, Content-Length bodies)
+# otherwise. It shares server.py's state and ballot-log code (elections,
+# duplicate filter, commitments, tally building) and serves the same
+# endpoints, plain and under /elections/<election_id>/:
+#
+#   POST /set_public_key   POST /submit_vote   POST /submit_commitment
+#   GET  /get_encrypted_tally                  GET  /metrics
+#
+# Every connection lives on one event loop; nothing CPU-bound runs there:
+# - ballot-validity proofs, the modular products of accepted ballots and the
+#   tally's re-randomization run in a process pool (--workers);
+# - ballot-log appends and durability waits run on a thread.
+# Accepted ballots are committed in micro-batches: while one batch is being
+# multiplied and logged, the next one gathers. Each batch's product is split
+# over the pool workers, and the request is answered once its batch is
+# durable, as with server.py. More than --ingest-queue ballots in flight get
+# 429 with Retry-After.
+#
+# Not served here: /submit_votes, /submit_partial, segment tallies, Merkle
+# proofs and tally long-polling (If-None-Match still gets a 304).
+#
+#   python server/async_server.py --port 5000 --workers 4
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import re
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, unquote
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import server as core
+from common import wire
+from common.packing import BallotLayout
+from homomorphic import validate_ballot, check_ballot_proofs, multiply_ciphertexts, rerandomize
+from commitment_store import CommitmentStore, DUPLICATE_VOTER, DUPLICATE_COMMITMENT, DUPLICATE_VOTE_ID
+from dedup import ADMITTED, ELECTION_FULL, REPLAYED_BALLOT
+from elections import DEFAULT_ELECTION, ELECTION_ID
+
+MAX_BODY = 1 << 20  # bytes; larger requests get 413
+ROUTE = re.compile(r"(?:/elections/(?P<election_id>[^/]+))?"
+                   r"/(?P<endpoint>set_public_key|submit_vote|submit_commitment|get_encrypted_tally|metrics)")
+
+pool = None  # ProcessPoolExecutor for the bignum work, created at startup
+pool_workers = 2
+ingest = None  # AsyncIngest batching accepted ballots into the running sums
+ingest_capacity = 10000
+max_batch = 512
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Process-pool work (module-level functions, so the pool can pickle them)
+# ────────────────────────────────────────────────────────────────────────────
+def _ignore_interrupts():
+    # Ctrl-C reaches the whole process group; the parent shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def multiply_columns(nsquare, parts, ballots):
+    """Per-position products mod n² of a list of ballots (tuples of raw ciphertexts)."""
+    return [multiply_ciphertexts((b[i] for b in ballots), nsquare) for i in range(parts)]
+
+
+async def in_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+async def in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Micro-batched commits of accepted ballots
+# ────────────────────────────────────────────────────────────────────────────
+class AsyncIngest:
+    """
+    The event-loop counterpart of ingest_queue.IngestQueue: requests
+    reserve() space, add() their admitted ballots and await the commit. One
+    task drains the queue batch by batch, so ballots arriving during a commit
+    form the next batch. A batch that fails to commit raises in every request
+    waiting on it, with the deduplicator's admission of whatever did not reach
+    the sums withdrawn, so those voters can resend.
+    """
+
+    def __init__(self, capacity, max_batch):
+        self.capacity = capacity
+        self.max_batch = max_batch
+        self.depth = 0  # ballots reserved, queued or being committed
+        self._pending = deque()  # (election, segment, ballots, voter_ids, enqueued, future)
+        self._committing = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def reserve(self, count):
+        if self.depth + count > self.capacity and self.depth > 0:
+            return False
+        self.depth += count
+        return True
+
+    def release(self, count):
+        self.depth -= count
+
+    async def add(self, election, segment, ballots, voter_ids):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((election, segment, ballots, voter_ids, time.perf_counter(), future))
+        self._wakeup.set()
+        await future
+
+    async def stop(self):
+        """Commit everything still queued, then stop the drain task."""
+        while self._pending or self._committing:
+            await asyncio.sleep(0.01)
+        self._task.cancel()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                batch, size = [], 0
+                while self._pending and (not batch or size + len(self._pending[0][2]) <= self.max_batch):
+                    batch.append(self._pending.popleft())
+                    size += len(batch[-1][2])
+                self._committing = True
+                error = None
+                try:
+                    await self._commit(batch)
+                except Exception as e:
+                    error = e
+                self._committing = False
+                self.depth -= size
+                core.INGEST_BATCH_SIZE.observe(size)
+                finished = time.perf_counter()
+                for *_, enqueued, future in batch:
+                    core.INGEST_LATENCY.observe(finished - enqueued)
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+
+    async def _commit(self, batch):
+        groups = {}
+        for election, segment, ballots, voter_ids, _, _ in batch:
+            group = groups.setdefault((id(election), segment), (election, segment, [], []))
+            group[2].extend(ballots)
+            group[3].extend(voter_ids)
+        groups = list(groups.values())
+
+        # Each group's product, split over the pool workers, then combined here (one multiply per chunk)
+        try:
+            chunked = []
+            for election, _, ballots, _ in groups:
+                step = -(-len(ballots) // pool_workers)
+                chunked.append(asyncio.gather(*(in_pool(multiply_columns, election.nsquare, election.parts,
+                                                        ballots[i:i + step]) for i in range(0, len(ballots), step))))
+            products = []
+            for (election, _, _, _), chunks in zip(groups, chunked):
+                columns = await chunks
+                products.append([multiply_ciphertexts(column, election.nsquare) for column in zip(*columns)])
+        except Exception:
+            # Nothing reached the sums yet: let every voter in the batch resend
+            for election, _, ballots, voter_ids in groups:
+                if voter_ids:
+                    election.dedup.withdraw(voter_ids, ballots)
+            raise
+
+        # Log append, fold into the sums and durability wait, as server.py does
+        # (it withdraws the admission of any group it could not fold in before raising)
+        await in_thread(core.record_ballot_groups, groups, products)
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Requests and responses
+# ────────────────────────────────────────────────────────────────────────────
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        self.body = body
+
+    @property
+    def mimetype(self):
+        return self.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    def json(self):
+        """The parsed JSON body, or None (like Flask's request.get_json(silent=True))."""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+def respond(status, body, content_type="application/json", headers=None):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    return status, body, content_type, headers or {}
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Endpoints (same behaviour and messages as server.py)
+# ────────────────────────────────────────────────────────────────────────────
+async def set_public_key(request, election_id):
+    if not ELECTION_ID.fullmatch(election_id):
+        return respond(400, {"error": "Election id must be 1-64 letters, digits, '.', '_' or '-'"})
+    data = request.json()
+    if not isinstance(data, dict) or "n" not in data:
+        return respond(400, {"error": "Invalid JSON payload; expected 'n'"})
+    try:
+        n = int(data["n"])
+    except ValueError:
+        return respond(400, {"error": "'n' must be an integer string"})
+
+    layout = data.get("ballot_layout")
+    parts = 1
+    if layout is not None:
+        try:
+            parts = BallotLayout.from_dict(layout, n).num_ciphertexts
+        except (KeyError, TypeError, ValueError) as e:
+            return respond(400, {"error": f"Invalid 'ballot_layout': {e}"})
+
+    wire_formats = ["json", wire.BALLOT_MEDIA_TYPE]
+    proofs = "required" if core.require_proofs else "optional"
+    existing = core.elections.get(election_id)
+    if existing is not None and existing.same_key(n, layout):
+        return respond(200, {"status": "public key already set", "election_id": election_id,
+                             "wire_formats": wire_formats, "ballot_proofs": proofs})
+    if existing is not None and election_id != DEFAULT_ELECTION:
+        return respond(409, {"error": f"Election '{election_id}' already has a different public key"})
+
+    await in_thread(core.start_election, election_id, n, layout, parts)
+    core.log(f"✅ /set_public_key: Received public key n={n} for election '{election_id}'.")
+    return respond(200, {"status": "public key stored", "election_id": election_id, "wire_formats": wire_formats,
+                         "ballot_proofs": proofs})
+
+
+def find_election(election_id, open_only=False, missing="Public key has not been set yet"):
+    """Return (election, None) or (None, error response)."""
+    election = core.elections.get(election_id)
+    if election is None:
+        if election_id == DEFAULT_ELECTION:
+            return None, respond(400, {"error": missing})
+        return None, respond(404, {"error": f"Unknown election '{election_id}'"})
+    if open_only and not election.is_open:
+        return None, respond(409, {"error": f"Election '{election_id}' is archived"})
+    return election, None
+
+
+def throttled():
+    core.BALLOTS.inc(result="throttled")
+    return respond(429, {"error": "Server is busy; retry after the indicated delay"}, headers={"Retry-After": "1"})
+
+
+def ingest_failed(error):
+    """503 for an admitted ballot whose batch failed to commit (its admission is withdrawn, so it can be resent)."""
+    core.BALLOTS.inc(result="failed")
+    print(f"❌ Could not record a ballot: {type(error).__name__}: {error}")
+    return respond(503, {"error": "Could not record the ballot(s); retry after the indicated delay"},
+                   headers={"Retry-After": "1"})
+
+
+async def submit_vote(request, election_id):
+    election, error = find_election(election_id, open_only=True)
+    if error is not None:
+        return error
+
+    segment = request.args.get("segment")
+    if request.mimetype == wire.BALLOT_MEDIA_TYPE:
+        try:
+            ballots, error = wire.decode_proven_ballots(request.body, wire.ciphertext_width(election.nsquare)), None
+        except ValueError as e:
+            ballots, error = None, f"Invalid binary ballot frame: {e}"
+    else:
+        data = request.json()
+        try:
+            ballots, error = [(*core.parse_json_ballot(data), core.parse_json_proofs(data))], None
+            segment = data.get("segment", segment)
+        except ValueError as e:
+            ballots, error = None, f"Invalid JSON payload; {e}"
+    if error is None:
+        try:
+            segment = core.parse_segment(segment)
+        except ValueError as e:
+            error = f"Invalid segment: {e}"
+    if error is not None:
+        core.BALLOTS.inc(result="rejected")
+        return respond(400, {"error": error})
+    if len(ballots) != 1:
+        core.BALLOTS.inc(len(ballots), result="rejected")
+        return respond(400, {"error": "Expected exactly one ballot; use /submit_votes for batches"})
+    voter_id, ciphertexts, exponent, proofs = ballots[0]
+
+    error = validate_ballot(ciphertexts, exponent, election.nsquare, election.parts)
+    if error is not None:
+        core.BALLOTS.inc(result="rejected")
+        return respond(400, {"error": f"Invalid ballot: {error}"})
+
+    if not ingest.reserve(1):
+        return throttled()
+    try:
+        if proofs is not None or core.require_proofs:
+            [error] = await in_pool(check_ballot_proofs, election.pubkey.n, [(voter_id, ciphertexts, proofs)],
+                                    election.ballot_layout, core.require_proofs)
+            if error is not None:
+                core.BALLOTS.inc(result="invalid_proof")
+                ingest.release(1)
+                return respond(400, {"error": f"Invalid ballot: {error}"})
+        outcome = election.admit(voter_id, ciphertexts)
+    except BaseException:
+        ingest.release(1)
+        raise
+    if outcome != ADMITTED:
+        core.BALLOTS.inc(result=outcome)
+        ingest.release(1)
+        if outcome == REPLAYED_BALLOT:
+            return respond(409, {"error": "This ballot has already been submitted"})
+        if outcome == ELECTION_FULL:
+            return respond(409, {"error": f"Election '{election.id}' has reached its limit of "
+                                          f"{election.max_ballots} ballot(s)"})
+        return respond(409, {"error": f"Voter '{voter_id}' has already voted"})
+
+    try:
+        await ingest.add(election, segment, [ciphertexts], [voter_id])
+    except Exception as e:
+        return ingest_failed(e)
+    core.BALLOTS.inc(result="accepted")
+    core.log(f"✅ /submit_vote: Received vote from '{voter_id}'. Added to running sum.")
+    return respond(200, {"status": "vote recorded"})
+
+
+async def submit_commitment(request, election_id):
+    store = core.find_commitments(election_id)
+    if store is None:
+        return respond(404, {"error": f"Unknown election '{election_id}'"})
+    election = core.elections.get(election_id)
+    if election is not None and not election.is_open:
+        return respond(409, {"error": f"Election '{election_id}' is archived"})
+
+    data = request.json()
+    if not isinstance(data, dict) or "voter_id" not in data or "commitment" not in data or "salt" not in data:
+        return respond(400, {"error": "Invalid JSON payload; expected 'voter_id', 'commitment', and 'salt'"})
+    digest = CommitmentStore.parse_digest(data["commitment"])
+    if digest is None:
+        return respond(400, {"error": "'commitment' must be a 64-character SHA-256 hex digest"})
+    if not CommitmentStore.valid_fields(data["voter_id"], data["salt"], data.get("vote_id")):
+        return respond(400, {"error": "'voter_id', 'salt' and 'vote_id' must be strings"})
+
+    outcome = await in_thread(core.record_commitment, election_id, store, data["voter_id"], digest, data["salt"],
+                              data.get("vote_id"))
+    core.COMMITMENTS.inc(result=outcome)
+    if outcome == DUPLICATE_VOTER:
+        return respond(409, {"error": f"Voter '{data['voter_id']}' has already submitted a commitment"})
+    if outcome == DUPLICATE_COMMITMENT:
+        return respond(409, {"error": "This commitment hash has already been submitted"})
+    if outcome == DUPLICATE_VOTE_ID:
+        return respond(409, {"error": "This vote_id has already been submitted"})
+    core.log(f"✅ /submit_commitment: Stored commitment for voter '{data['voter_id']}'.")
+    return respond(200, {"status": "commitment recorded"})
+
+
+def pooled_rerandomize(n, products):
+    # Called on a thread by TallyCache.get(); blocks that thread (not the loop) on the pool
+    return pool.submit(rerandomize, n, products).result()
+
+
+async def get_encrypted_tally(request, election_id):
+    election, error = find_election(election_id, missing="No votes recorded or public key not set")
+    if error is not None:
+        return error
+
+    accept = request.headers.get("accept", "")
+    binary = wire.TALLY_MEDIA_TYPE in accept and "application/json" not in accept.split(",")[0]
+    kind = "binary" if binary else "json"
+    tally_cache = election.tally_cache
+    etag = f'"{tally_cache.etag(kind, tally_cache.version)}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return respond(304, b"", headers={"ETag": etag})
+
+    version, (body, mimetype, headers) = await in_thread(
+        tally_cache.get, kind, lambda: core.build_tally(election, binary, pooled_rerandomize))
+    headers = dict(headers, ETag=f'"{tally_cache.etag(kind, version)}"', Vary="Accept")
+    headers["Cache-Control"] = "no-cache"
+    return respond(200, body, mimetype, headers)
+
+
+async def get_metrics(request, election_id):
+    return respond(200, core.metrics.render().encode(), core.Registry.CONTENT_TYPE)
+
+
+ENDPOINTS = {
+    "set_public_key": ("POST", set_public_key),
+    "submit_vote": ("POST", submit_vote),
+    "submit_commitment": ("POST", submit_commitment),
+    "get_encrypted_tally": ("GET", get_encrypted_tally),
+    "metrics": ("GET", get_metrics),
+}
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# ASGI application
+# ────────────────────────────────────────────────────────────────────────────
+async def startup():
+    global pool, ingest
+    # Spawned (not forked) workers: the ballot log's commit thread is already running
+    pool = ProcessPoolExecutor(pool_workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_ignore_interrupts)
+    await asyncio.gather(*(in_pool(multiply_columns, 1, 0, []) for _ in range(pool_workers)))  # start them now
+    ingest = AsyncIngest(ingest_capacity, max_batch)
+
+
+async def shutdown():
+    if ingest is not None:
+        await ingest.stop()
+    if pool is not None:
+        pool.shutdown()
+
+
+async def dispatch(request):
+    match = ROUTE.fullmatch(request.path)
+    if match is None:
+        return "unmatched", respond(404, {"error": "Not found"})
+    election_id = match["election_id"] or DEFAULT_ELECTION
+    method, handler = ENDPOINTS[match["endpoint"]]
+    rule = ("/elections/<election_id>/" if match["election_id"] else "/") + match["endpoint"]
+    if request.method != method:
+        return rule, respond(405, {"error": "Method not allowed"})
+    if match["endpoint"] == "metrics" and match["election_id"]:
+        return "unmatched", respond(404, {"error": "Not found"})
+    return rule, await handler(request, unquote(election_id))
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    start = time.perf_counter()
+    body, more = b"", True
+    while more:
+        message = await receive()
+        body += message.get("body", b"")
+        more = message.get("more_body", False)
+    request = Request(scope, body)
+    try:
+        rule, (status, body, content_type, headers) = await dispatch(request)
+    except Exception as e:
+        print(f"❌ {request.method} {request.path}: {e!r}")
+        rule, (status, body, content_type, headers) = "unmatched", respond(500, {"error": "Internal server error"})
+    core.REQUESTS.inc(endpoint=rule, method=request.method, status=status)
+    core.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=rule)
+
+    raw_headers = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    raw_headers += [(k.lower().encode(), str(v).encode()) for k, v in headers.items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Built-in HTTP/1.1 server (used when uvicorn is not installed)
+# ────────────────────────────────────────────────────────────────────────────
+async def simple_response(writer, status):
+    body = json.dumps({"error": HTTPStatus(status).phrase}).encode()
+    writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+
+
+async def serve_connection(reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                method, target, version = line.decode("latin-1").split()
+            except ValueError:
+                return await simple_response(writer, 400)
+            headers = []
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header.decode("latin-1").partition(":")
+                headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+            fields = dict(headers)
+            if b"transfer-encoding" in fields:
+                return await simple_response(writer, 411)
+            length = int(fields.get(b"content-length", b"0"))
+            if length > MAX_BODY:
+                return await simple_response(writer, 413)
+            body = await reader.readexactly(length) if length else b""
+
+            path, _, query = target.partition("?")
+            scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": version[5:], "method": method,
+                     "scheme": "http", "path": unquote(path), "raw_path": path.encode("latin-1"),
+                     "query_string": query.encode("latin-1"), "headers": headers,
+                     "client": writer.get_extra_info("peername"), "server": writer.get_extra_info("sockname")}
+            sent = []
+
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(message):
+                sent.append(message)
+
+            await app(scope, receive, send)
+            status = sent[0]["status"]
+            keep_alive = version == "HTTP/1.1" and fields.get(b"connection", b"").lower() != b"close"
+            head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n".encode()]
+            head += [k + b": " + v + b"\r\n" for k, v in sent[0]["headers"]]
+            head.append(b"\r\n" if keep_alive else b"Connection: close\r\n\r\n")
+            writer.write(b"".join(head) + b"".join(m.get("body", b"") for m in sent[1:]))
+            await writer.drain()
+            if not keep_alive:
+                return
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port):
+    await startup()
+    listener = await asyncio.start_server(serve_connection, host, port, backlog=4096)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confidential voting server (asyncio / ASGI variant).")
+    parser.add_argument("--log-dir", default=str(Path(__file__).parent.parent / "ballot_log"),
+                        help="directory for the append-only ballot log and checkpoints")
+    parser.add_argument("--no-log", action="store_true", help="keep state in memory only (lost on restart)")
+    parser.add_argument("--quiet", action="store_true", help="no per-request console lines (see /metrics instead)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--require-proofs", action=argparse.BooleanOptionalAction, default=True,
+                        help="reject ballots without a ballot-validity proof (on by default; "
+                             "--no-require-proofs accepts unproven ballots, e.g. for load tests)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="processes for proof checks, ballot products and tally re-randomization")
+    parser.add_argument("--ingest-queue", type=int, default=10000,
+                        help="ballots in flight before answering 429")
+    parser.add_argument("--max-batch", type=int, default=512, help="most ballots committed in one micro-batch")
+    parser.add_argument("--server", choices=("auto", "builtin", "uvicorn"), default="auto",
+                        help="HTTP server: uvicorn if installed (auto), or the built-in asyncio one")
+    args = parser.parse_args()
+    core.verbose = not args.quiet
+    core.require_proofs = args.require_proofs
+    pool_workers = max(1, args.workers)
+    ingest_capacity = args.ingest_queue
+    max_batch = args.max_batch
+    if args.server == "uvicorn" and uvicorn is None:
+        parser.error("uvicorn is not installed (pip install uvicorn)")
+
+    if not args.no_log:
+        core.ballot_log = core.open_ballot_log(args.log_dir)
+
+    use_uvicorn = uvicorn is not None and args.server != "builtin"
+    print(f"🧮 Big-integer backend: {core.bigint.NAME}; {pool_workers} worker process(es)")
+    print(f"🚀 Starting asyncio server ({'uvicorn' if use_uvicorn else 'built-in HTTP/1.1'}) "
+          f"on http://localhost:{args.port} …")
+    try:
+        if use_uvicorn:
+            uvicorn.run(app, host=args.host, port=args.port, log_level="warning", backlog=4096)
+        else:
+            asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if core.ballot_log is not None:
+            core.ballot_log.close(checkpoint=True)
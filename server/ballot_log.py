@@ -0,0 +1,487 @@
+# server/ballot_log.py
+#
+# Crash-safe, append-only ballot log for the server.
+#
+# Every accepted ballot, voter id digest and commitment is appended as a length-prefixed
+# binary record:
+#
+#     [ length: u32 BE ][ crc32(type + payload): u32 BE ][ type: u8 ][ payload ]
+#
+# Records for any election other than DEFAULT_ELECTION set ELECTION_FLAG in
+# the type byte and start their payload with the election id:
+#
+#     [ id length: u16 BE ][ election id: UTF-8 ][ payload as for the default election ]
+#
+# so logs written before election namespaces replay unchanged.
+#
+# A background thread fsyncs the log in groups ("group commit"), so many
+# concurrent requests share one fsync. Periodically every election's state
+# (running products, ballot count, per-segment products, commitments,
+# duplicate-ballot filter) is
+# written to a checkpoint file together with the log offset it covers; on
+# startup only the records after that offset are replayed, reading the log
+# through mmap. Appends pause only while that state is copied; encoding it
+# as JSON and writing it happen after they resume.
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import bigint
+from dedup import DIGEST_SIZE, ballot_digest, voter_digest
+from elections import DEFAULT_ELECTION
+
+HEADER = struct.Struct(">IIB")
+
+RECORD_KEY = 1         # payload: UTF-8 JSON {"n": hex, "parts", "layout"} (starts a new election)
+RECORD_BALLOT = 2      # payload: the ballot's ciphertext parts, each fixed-width big-endian
+RECORD_COMMITMENT = 3  # payload: UTF-8 JSON {"voter_id", "commitment", "salt"}
+RECORD_SEGMENT_BALLOT = 4  # payload: segment length: u16 | segment: UTF-8 | ciphertext parts as in RECORD_BALLOT
+RECORD_ARCHIVE = 5     # payload: empty (the election stops accepting ballots)
+RECORD_VOTERS = 6      # payload: 16-byte BLAKE2b digests of admitted voter ids, concatenated
+RECORD_PARTIAL = 7     # payload: JSON {"node_id", "version", "products", "ballots", "tag", "segments"}
+
+ELECTION_FLAG = 0x80
+RECORD_TYPES = frozenset(t | flag for t in range(RECORD_KEY, RECORD_PARTIAL + 1) for flag in (0, ELECTION_FLAG))
+
+CHECKPOINT_VERSION = 6
+READABLE_CHECKPOINT_VERSIONS = (2, 3, 4, 5, 6)  # 2 predates segments, 2–3 election namespaces, 2–4 dedup state,
+                                                # 2–5 aggregator partials
+
+SEGMENT_LEN = struct.Struct(">H")
+ELECTION_ID_LEN = struct.Struct(">H")
+
+
+def ciphertext_width(n):
+    return ((n * n).bit_length() + 7) // 8
+
+
+def _empty_state():
+    return {"n": None, "parts": 1, "layout": None, "products": [1], "ballots": 0, "segments": {},
+            "commitments": [], "archived": False, "dedup": None, "voter_digests": [], "ballot_digests": [],
+            "ids_tag": 0, "partials": {}}
+
+
+def partial_to_json(partial):
+    """A child node's partial sum with hex products, as logged and checkpointed."""
+    return {
+        "version": partial["version"],
+        "products": [format(p, "x") for p in partial["products"]],
+        "ballots": partial["ballots"],
+        "tag": format(partial["tag"], "x"),
+        "segments": {name: [[format(p, "x") for p in products], count]
+                     for name, (products, count) in partial["segments"].items()},
+        "received": partial["received"],
+    }
+
+
+def partial_from_json(data):
+    return {
+        "version": data["version"],
+        "products": [int(p, 16) for p in data["products"]],
+        "ballots": data["ballots"],
+        "tag": int(data["tag"], 16),
+        "segments": {name: ([int(p, 16) for p in products], count)
+                     for name, (products, count) in data["segments"].items()},
+        "received": data["received"],
+    }
+
+
+def _state_from_checkpoint(entry):
+    return {
+        "n": int(entry["n"]) if entry["n"] is not None else None,
+        "parts": len(entry["products"]),
+        "layout": entry["layout"],
+        "products": [int(p, 16) for p in entry["products"]],
+        "ballots": entry["ballots"],
+        "segments": {name: [[int(p, 16) for p in seg["products"]], seg["ballots"]]
+                     for name, seg in entry.get("segments", {}).items()},
+        "commitments": entry["commitments"],
+        "archived": entry.get("archived", False),
+        "dedup": entry.get("dedup"),
+        "voter_digests": [],
+        "ballot_digests": [],
+        "ids_tag": int(entry.get("ids_tag", "0"), 16),
+        "partials": {node_id: partial_from_json(p) for node_id, p in entry.get("partials", {}).items()},
+    }
+
+
+def _state_to_checkpoint(state):
+    return {
+        "n": str(state["n"]) if state["n"] is not None else None,
+        "layout": state["layout"],
+        "products": [format(p, "x") for p in state["products"]],
+        "ballots": state["ballots"],
+        "segments": {name: {"products": [format(p, "x") for p in seg_products], "ballots": seg_ballots}
+                     for name, (seg_products, seg_ballots) in state["segments"].items()},
+        "commitments": [record.to_dict() for record in state["commitments"]],
+        "archived": state["archived"],
+        "dedup": state["dedup"].to_dict() if state["dedup"] is not None else None,
+        "ids_tag": format(state["ids_tag"], "x"),
+        "partials": {node_id: partial_to_json(p) for node_id, p in state["partials"].items()},
+    }
+
+
+class _ApplyGate:
+    """
+    Shared/exclusive gate. Request threads hold it shared while they append a
+    record and apply it to the accumulator; a checkpoint holds it exclusively
+    so the (log offset, running product) pair it captures is consistent.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._exclusive_waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._exclusive or self._exclusive_waiting:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                if not self._shared:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._exclusive_waiting += 1
+            while self._exclusive or self._shared:
+                self._cond.wait()
+            self._exclusive_waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+
+class BallotLog:
+    """
+    Append-only ballot/commitment log with group-commit fsync and checkpoints.
+
+    checkpoint_source: callable returning {election_id: state} for the current
+    in-memory state, each state shaped like the ones recover() returns except
+    that commitments are CommitmentRecords and dedup is a BallotDeduplicator
+    (or None). It is called with all appends paused, so it should only copy;
+    the states are serialized after appends resume and must not change.
+    """
+
+    def __init__(self, log_dir, commit_interval=0.005, checkpoint_every=10000):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.log_path = self.log_dir / "ballots.log"
+        self.checkpoint_path = self.log_dir / "checkpoint.json"
+        self.commit_interval = commit_interval
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_source = None
+
+        self._gate = _ApplyGate()
+        self._write_lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()  # one checkpoint at a time, written in snapshot order
+        self._durable = threading.Condition()
+        self._appended_seq = 0
+        self._durable_seq = 0
+        self._ballots_since_checkpoint = 0
+        self._widths = {}  # election id → ciphertext width in bytes under its key
+        self._closed = False
+        self._stopping = False  # tells the flusher to exit (set by close() before the final checkpoint)
+        self._file = None
+        self._flusher = None
+
+    # ────────────────────────────────────────────────────────────────────
+    # Startup: load checkpoint and replay the tail of the log
+    # ────────────────────────────────────────────────────────────────────
+    def _load_checkpoint(self):
+        if not self.checkpoint_path.exists():
+            return None
+        with open(self.checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("version") not in READABLE_CHECKPOINT_VERSIONS:
+            raise ValueError(f"Unsupported checkpoint version {checkpoint.get('version')}")
+        return checkpoint
+
+    def _iter_records(self, buf, offset):
+        """
+        Yield (offset, end_offset, type, payload) for each record, stopping at a
+        torn tail: a last record cut short or failing its CRC, possibly followed
+        by zero fill (the file grew before its data reached the disk). That is
+        all a crash mid-write can leave. A bad record with anything else after
+        it means the log itself is damaged: raise rather than drop the accepted
+        ballots that follow it. (A record running past the end of the file is
+        only torn if no intact record follows its header; otherwise its length
+        field is what got damaged.)
+        """
+        size = len(buf)
+        while offset + HEADER.size <= size:
+            length, crc, rtype = HEADER.unpack_from(buf, offset)
+            start = offset + HEADER.size
+            end = start + length
+            if end > size:
+                following = self._next_intact_record(buf, start)
+                if following is not None:
+                    raise ValueError(f"{self.log_path}: record at offset {offset} claims {length} byte(s), past the "
+                                     f"end of the log, but an intact record follows at offset {following}; the log "
+                                     f"is corrupt (left as it is)")
+                return
+            payload = buf[start:end]
+            if zlib.crc32(payload, zlib.crc32(bytes([rtype]))) != crc:
+                if buf[end:].strip(b"\0"):
+                    raise ValueError(f"{self.log_path}: record at offset {offset} fails its CRC check with "
+                                     f"{size - end} byte(s) of log after it; the log is corrupt (left as it is)")
+                return
+            yield offset, end, rtype, payload
+            offset = end
+
+    @staticmethod
+    def _next_intact_record(buf, offset):
+        """Offset of the first record at or after `offset` with a known type and a matching CRC, or None."""
+        size = len(buf)
+        for candidate in range(offset, size - HEADER.size + 1):
+            length, crc, rtype = HEADER.unpack_from(buf, candidate)
+            end = candidate + HEADER.size + length
+            if rtype in RECORD_TYPES and end <= size \
+                    and zlib.crc32(buf[candidate + HEADER.size:end], zlib.crc32(bytes([rtype]))) == crc:
+                return candidate
+        return None
+
+    def recover(self):
+        """
+        Rebuild server state from the last checkpoint plus the log tail.
+        Returns {"elections": {election_id: state}, "replayed_records": count}; each
+        state has keys n, parts, layout, products, ballots, segments
+        ({name: [products, ballots]}), commitments, archived, dedup (the
+        duplicate filter as of the checkpoint, or None), voter_digests /
+        ballot_digests admitted since then, ids_tag (ballot-id digest of the
+        checkpointed products) and partials ({node id: latest partial sum}) (n is
+        None if the election's key was never set), plus "truncated_bytes", the
+        size of a torn tail dropped from the log. Opens the log for appending.
+        Raises ValueError if the log is corrupt anywhere but its tail.
+        """
+        checkpoint = self._load_checkpoint()
+        if checkpoint is None:
+            offset, states = 0, {}
+        elif checkpoint["version"] < 4:
+            offset, states = checkpoint["offset"], {DEFAULT_ELECTION: _state_from_checkpoint(checkpoint)}
+        else:
+            offset = checkpoint["offset"]
+            states = {eid: _state_from_checkpoint(entry) for eid, entry in checkpoint["elections"].items()}
+
+        replayed = 0
+        good_end = offset
+        if self.log_path.exists() and self.log_path.stat().st_size > offset:
+            with open(self.log_path, "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for record_offset, good_end, rtype, payload in self._iter_records(buf, offset):
+                    replayed += 1
+                    election_id = DEFAULT_ELECTION
+                    if rtype & ELECTION_FLAG:
+                        (id_len,) = ELECTION_ID_LEN.unpack_from(payload, 0)
+                        election_id = payload[ELECTION_ID_LEN.size:ELECTION_ID_LEN.size + id_len].decode()
+                        payload = payload[ELECTION_ID_LEN.size + id_len:]
+                        rtype &= ~ELECTION_FLAG
+                    state = states.setdefault(election_id, _empty_state())
+
+                    if rtype == RECORD_KEY:
+                        # A new public key restarts the tally; commitments are kept unless the key
+                        # itself changed (as on the live server)
+                        key = json.loads(payload)
+                        if state["n"] is not None and state["n"] != int(key["n"], 16):
+                            state["commitments"] = []
+                        state.update(n=int(key["n"], 16), parts=key["parts"], layout=key["layout"],
+                                     products=[1] * key["parts"], ballots=0, segments={}, archived=False,
+                                     dedup=None, voter_digests=[], ballot_digests=[], ids_tag=0, partials={})
+                    elif rtype == RECORD_ARCHIVE:
+                        state["archived"] = True
+                    elif rtype == RECORD_PARTIAL:
+                        data = json.loads(payload)
+                        current = state["partials"].get(data["node_id"])
+                        if current is None or current["version"] < data["version"]:
+                            state["partials"][data["node_id"]] = partial_from_json(data)
+                    elif rtype == RECORD_VOTERS:
+                        state["voter_digests"].extend(bytes(payload[i:i + DIGEST_SIZE])
+                                                      for i in range(0, len(payload), DIGEST_SIZE))
+                    elif rtype in (RECORD_BALLOT, RECORD_SEGMENT_BALLOT):
+                        if state["n"] is None:
+                            raise ValueError(f"{self.log_path}: ballot record at offset {record_offset} for "
+                                             f"election '{election_id}' precedes its public key; the log is corrupt")
+                        nsquare = state["n"] ** 2
+                        width = ciphertext_width(state["n"])
+                        start = 0
+                        if rtype == RECORD_SEGMENT_BALLOT:
+                            (seg_len,) = SEGMENT_LEN.unpack_from(payload, 0)
+                            start = SEGMENT_LEN.size + seg_len
+                            name = bytes(payload[SEGMENT_LEN.size:start]).decode()
+                            segment = state["segments"].setdefault(name, [[1] * state["parts"], 0])
+                        products = state["products"]
+                        for i in range(state["parts"]):
+                            c = int.from_bytes(payload[start + i * width:start + (i + 1) * width], "big")
+                            products[i] = bigint.mulmod(products[i], c, nsquare)
+                            if rtype == RECORD_SEGMENT_BALLOT:
+                                segment[0][i] = bigint.mulmod(segment[0][i], c, nsquare)
+                        state["ballots"] += 1
+                        state["ballot_digests"].append(ballot_digest(payload[start:start + state["parts"] * width]))
+                        if rtype == RECORD_SEGMENT_BALLOT:
+                            segment[1] += 1
+                    elif rtype == RECORD_COMMITMENT:
+                        state["commitments"].append(json.loads(payload))
+
+        # Drop a torn tail left by a crash mid-write, then continue appending after it
+        self._file = open(self.log_path, "ab")
+        truncated = self._file.tell() - good_end
+        if truncated > 0:
+            self._file.truncate(good_end)
+            self._file.seek(good_end)
+        self._ballots_since_checkpoint = replayed
+        self._widths = {eid: ciphertext_width(state["n"]) for eid, state in states.items() if state["n"]}
+        self._flusher = threading.Thread(target=self._flush_loop, name="ballot-log-flusher", daemon=True)
+        self._flusher.start()
+        return {"elections": states, "replayed_records": replayed, "truncated_bytes": max(truncated, 0)}
+
+    # ────────────────────────────────────────────────────────────────────
+    # Appending
+    # ────────────────────────────────────────────────────────────────────
+    def _append(self, rtype, payload, election_id=DEFAULT_ELECTION):
+        if election_id != DEFAULT_ELECTION:
+            name = election_id.encode()
+            rtype |= ELECTION_FLAG
+            payload = ELECTION_ID_LEN.pack(len(name)) + name + payload
+        header = HEADER.pack(len(payload), zlib.crc32(payload, zlib.crc32(bytes([rtype]))), rtype)
+        with self._write_lock:
+            self._file.write(header)
+            self._file.write(payload)
+            self._appended_seq += 1
+            if rtype & ~ELECTION_FLAG in (RECORD_BALLOT, RECORD_SEGMENT_BALLOT):
+                self._ballots_since_checkpoint += 1
+            return self._appended_seq
+
+    @contextmanager
+    def appending(self):
+        """
+        Hold this while appending records *and* applying them to in-memory
+        state, so a checkpoint never sees one without the other.
+        """
+        with self._gate.shared():
+            yield self
+
+    def append_key(self, n, parts, layout, election_id=DEFAULT_ELECTION):
+        self._widths[election_id] = ciphertext_width(n)
+        key = {"n": format(n, "x"), "parts": parts, "layout": layout}
+        return self._append(RECORD_KEY, json.dumps(key, separators=(",", ":")).encode(), election_id)
+
+    def append_ballots(self, ballots, segment=None, election_id=DEFAULT_ELECTION):
+        """ballots: list of tuples of raw ciphertexts (one tuple per ballot), optionally tagged with a segment."""
+        rtype, prefix = RECORD_BALLOT, b""
+        if segment is not None:
+            name = segment.encode()
+            rtype, prefix = RECORD_SEGMENT_BALLOT, SEGMENT_LEN.pack(len(name)) + name
+        width = self._widths[election_id]
+        seq = 0
+        for ballot in ballots:
+            seq = self._append(rtype, prefix + b"".join(c.to_bytes(width, "big") for c in ballot), election_id)
+        return seq
+
+    def append_voters(self, voter_ids, election_id=DEFAULT_ELECTION):
+        """Record the digests of admitted voter ids, so duplicate detection survives a restart."""
+        return self._append(RECORD_VOTERS, b"".join(voter_digest(v) for v in voter_ids), election_id)
+
+    def append_partial(self, node_id, partial, election_id=DEFAULT_ELECTION):
+        entry = dict(partial_to_json(partial), node_id=node_id)
+        return self._append(RECORD_PARTIAL, json.dumps(entry, separators=(",", ":")).encode(), election_id)
+
+    def append_commitment(self, commitment, election_id=DEFAULT_ELECTION):
+        return self._append(RECORD_COMMITMENT, json.dumps(commitment, separators=(",", ":")).encode(), election_id)
+
+    def append_archive(self, election_id=DEFAULT_ELECTION):
+        return self._append(RECORD_ARCHIVE, b"", election_id)
+
+    def wait_durable(self, seq):
+        """Block until record `seq` (and everything before it) has been fsynced."""
+        with self._durable:
+            while self._durable_seq < seq and not self._closed:
+                self._durable.wait()
+
+    # ────────────────────────────────────────────────────────────────────
+    # Group commit and checkpoints (background thread)
+    # ────────────────────────────────────────────────────────────────────
+    def _sync(self):
+        with self._write_lock:
+            seq = self._appended_seq
+            self._file.flush()
+        os.fsync(self._file.fileno())
+        with self._durable:
+            self._durable_seq = seq
+            self._durable.notify_all()
+
+    def _flush_loop(self):
+        while not self._stopping:
+            time.sleep(self.commit_interval)
+            if self._appended_seq != self._durable_seq:
+                self._sync()
+            if self.checkpoint_source is not None and self._ballots_since_checkpoint >= self.checkpoint_every:
+                self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Write the current state and the log offset it covers, atomically.
+        Appends wait only for the fsync and checkpoint_source(); the JSON
+        encoding of every commitment and of the dedup state happens after.
+        Checkpoints are serialized, so a slower, older one can never replace
+        a newer one, and each is written to its own temporary file.
+        """
+        if self.checkpoint_source is None:
+            return
+        with self._checkpoint_lock:
+            with self._gate.exclusive():
+                self._sync()
+                offset = self._file.tell()
+                states = self.checkpoint_source()
+                self._ballots_since_checkpoint = 0
+            checkpoint = {
+                "version": CHECKPOINT_VERSION,
+                "offset": offset,
+                "elections": {eid: _state_to_checkpoint(state) for eid, state in states.items()},
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=self.log_dir, prefix="checkpoint.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(checkpoint, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.checkpoint_path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+    def close(self, checkpoint=False):
+        """Stop the flusher, then (with checkpoint=True) write a final checkpoint and fsync the rest."""
+        if self._file is None:
+            return
+        self._stopping = True
+        self._flusher.join()
+        if checkpoint:
+            self.checkpoint()
+        self._sync()
+        self._closed = True
+        with self._durable:
+            self._durable.notify_all()
+        self._file.close()
+        self._file = None
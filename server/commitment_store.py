@@ -0,0 +1,162 @@
+# server/commitment_store.py
+
+import hashlib
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common.merkle import MerkleTree
+
+DIGEST_SIZE = 32  # SHA-256
+
+# Outcomes of CommitmentStore.add
+RECORDED = "recorded"
+DUPLICATE_VOTER = "duplicate_voter"
+DUPLICATE_COMMITMENT = "duplicate_commitment"
+DUPLICATE_VOTE_ID = "duplicate_vote_id"
+
+
+def _pack_salt(salt):
+    """Keep canonical lowercase hex salts as raw bytes (half the size); anything else stays a str."""
+    try:
+        raw = bytes.fromhex(salt)
+    except ValueError:
+        return salt
+    return raw if raw.hex() == salt else salt
+
+
+def _unpack_salt(salt):
+    return salt.hex() if isinstance(salt, bytes) else salt
+
+
+class CommitmentRecord:
+    __slots__ = ("voter_id", "digest", "salt", "vote_id", "leaf_index")
+
+    def __init__(self, voter_id, digest, salt, vote_id, leaf_index):
+        self.voter_id = voter_id
+        self.digest = digest          # raw 32-byte SHA-256 digest
+        self.salt = salt              # raw bytes, or str for non-canonical salts
+        self.vote_id = vote_id        # client-side ballot UUID, if the client sent one
+        self.leaf_index = leaf_index  # position in the Merkle tree
+
+    def to_dict(self):
+        entry = {"voter_id": self.voter_id, "commitment": self.digest.hex(), "salt": _unpack_salt(self.salt)}
+        if self.vote_id is not None:
+            entry["vote_id"] = self.vote_id
+        return entry
+
+
+class CommitmentStore:
+    """
+    Commitments indexed by voter_id, by commitment digest and by vote_id, so
+    "has this voter committed?", Phase 2 lookups and duplicate detection
+    are dictionary lookups instead of scans over every commitment.
+    Every accepted commitment is also appended to a Merkle tree whose root
+    is published with the tally.
+    """
+
+    def __init__(self):
+        self._by_voter = {}
+        self._by_digest = {}
+        self._by_vote_id = {}
+        self.tree = MerkleTree()
+        self._lock = threading.Lock()
+        self._record_bytes = 0  # records and their fields, counted as they are added
+
+    @staticmethod
+    def parse_digest(commitment_hex):
+        """Return the 32-byte digest for a hex commitment, or None if it is not valid SHA-256 hex."""
+        try:
+            digest = bytes.fromhex(commitment_hex)
+        except (ValueError, TypeError):
+            return None
+        return digest if len(digest) == DIGEST_SIZE else None
+
+    @staticmethod
+    def valid_fields(voter_id, salt, vote_id=None):
+        """True if voter_id and salt are strings and vote_id is a string or absent (JSON may carry anything)."""
+        return isinstance(voter_id, str) and isinstance(salt, str) and (vote_id is None or isinstance(vote_id, str))
+
+    def add(self, voter_id, digest, salt, vote_id=None):
+        """Store a commitment; returns RECORDED, DUPLICATE_VOTER, DUPLICATE_COMMITMENT or DUPLICATE_VOTE_ID."""
+        with self._lock:
+            if voter_id in self._by_voter:
+                return DUPLICATE_VOTER
+            if digest in self._by_digest:
+                return DUPLICATE_COMMITMENT
+            if vote_id is not None and vote_id in self._by_vote_id:
+                return DUPLICATE_VOTE_ID
+            leaf_index = self.tree.append(digest)
+            record = CommitmentRecord(voter_id, digest, _pack_salt(salt), vote_id, leaf_index)
+            self._record_bytes += sys.getsizeof(record) + sys.getsizeof(voter_id) + sys.getsizeof(digest) \
+                + sys.getsizeof(record.salt) + (sys.getsizeof(vote_id) if vote_id is not None else 0)
+            self._by_voter[voter_id] = record
+            self._by_digest[digest] = record
+            if vote_id is not None:
+                self._by_vote_id[vote_id] = record
+            return RECORDED
+
+    def get(self, voter_id):
+        return self._by_voter.get(voter_id)
+
+    def get_by_digest(self, digest):
+        return self._by_digest.get(digest)
+
+    def get_by_vote_id(self, vote_id):
+        return self._by_vote_id.get(vote_id)
+
+    def root(self):
+        """Return (Merkle root bytes, number of leaves) as one consistent pair."""
+        with self._lock:
+            return self.tree.root(), self.tree.size
+
+    def inclusion_proof(self, record, tree_size=None):
+        """
+        Return (audit path, tree size, root) proving `record` is in the current
+        tree, or in the tree of `tree_size` leaves (e.g. the size of a root the
+        voter already holds). Raises IndexError if the record is not in that tree.
+        """
+        with self._lock:
+            size = self.tree.size if tree_size is None else tree_size
+            return self.tree.proof(record.leaf_index, size), size, self.tree.root(size)
+
+    def verify(self, voter_id, vote_int, salt):
+        """
+        Recompute SHA256(f"{vote_int}{salt}") and compare to the stored commitment.
+        Returns None if the voter has no commitment, otherwise True/False.
+        """
+        record = self._by_voter.get(voter_id)
+        if record is None:
+            return None
+        return hashlib.sha256(f"{vote_int}{salt}".encode()).digest() == record.digest
+
+    def load(self, entries):
+        """Bulk-load dicts as produced by to_list() (e.g. from a ballot-log checkpoint)."""
+        for entry in entries:
+            self.add(entry["voter_id"], bytes.fromhex(entry["commitment"]), entry["salt"], entry.get("vote_id"))
+
+    def clear(self):
+        """Forget every commitment (the election restarted under a new key)."""
+        with self._lock:
+            self._by_voter, self._by_digest, self._by_vote_id = {}, {}, {}
+            self.tree = MerkleTree()
+            self._record_bytes = 0
+
+    def records(self):
+        """The records stored so far, in insertion order (a cheap copy: records never change once added)."""
+        with self._lock:
+            return tuple(self._by_voter.values())
+
+    def to_list(self):
+        return [record.to_dict() for record in self.records()]
+
+    def memory_bytes(self):
+        """Approximate bytes held: index dicts, records and the Merkle tree levels (O(1), not a walk over records)."""
+        with self._lock:
+            total = sum(sys.getsizeof(index) for index in (self._by_voter, self._by_digest, self._by_vote_id))
+            total += sum(sys.getsizeof(level) for level in self.tree.levels)
+            return total + self._record_bytes
+
+    def __len__(self):
+        return len(self._by_voter)
@@ -0,0 +1,227 @@
+# server/dedup.py
+#
+# Duplicate suppression on ballot ingestion, per election:
+#   • an exact set of voter ids (stored as 16-byte BLAKE2b digests), so a
+#     voter id is admitted at most once;
+#   • a scalable Bloom filter over ballot digests (BLAKE2b of the fixed-width
+#     ciphertext bytes, as written to the ballot log), so a replayed
+#     ciphertext is rejected even under a fresh voter id.
+#
+# Both checks are O(1). The Bloom filter starts small and adds layers of
+# doubling capacity (each with half the false-positive rate of the one
+# before), so thousands of small elections stay cheap while a large one
+# needs about 6 bytes per ballot. A false positive rejects an honest ballot
+# as a replay with probability below `error_rate`; its voter id is not
+# consumed, so the voter can re-encrypt and submit again.
+
+import base64
+import hashlib
+import math
+import sys
+import threading
+
+DIGEST_SIZE = 16
+DEFAULT_ERROR_RATE = 1e-9
+INITIAL_CAPACITY = 1024
+
+# Outcomes of BallotDeduplicator.admit
+ADMITTED = "accepted"
+DUPLICATE_VOTER = "duplicate_voter"
+REPLAYED_BALLOT = "replayed_ballot"
+ELECTION_FULL = "election_full"
+
+
+def voter_digest(voter_id):
+    return hashlib.blake2b(voter_id.encode(), digest_size=DIGEST_SIZE, person=b"cvs-voter").digest()
+
+
+def voter_tag(voter_ids):
+    """Sum of the voter-id digests mod 2^128: an order-independent digest of which ballots a sum includes."""
+    return sum(int.from_bytes(voter_digest(v), "big") for v in voter_ids) % (1 << (8 * DIGEST_SIZE))
+
+
+def ballot_digest(data):
+    """data: the ballot's ciphertexts, each big-endian at the key's fixed width, concatenated."""
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE, person=b"cvs-ballot").digest()
+
+
+class BloomFilter:
+    # Probe sequences: "enhanced" double hashing, or plain "double" hashing as
+    # used by checkpoints written before it (kept readable, not used for new layers)
+    def __init__(self, capacity, error_rate, bits=None, count=0, probing="enhanced"):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.probing = probing
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, digest):
+        # The two halves of the digest generate all k positions. Plain double
+        # hashing (h1 + i·h2) collapses onto a few bits when h2 shares a large
+        # factor with num_bits, a false positive about once per num_bits
+        # ballots; enhanced double hashing (h1 + i·h2 + (i³ − i)/6) keeps the
+        # k positions spread out whatever h2 is.
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        if self.probing == "double":
+            return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+        positions = []
+        for i in range(self.num_hashes):
+            positions.append(h1 % self.num_bits)
+            h1 += h2
+            h2 += i + 1
+        return positions
+
+    def __contains__(self, digest):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(digest))
+
+    def add(self, digest):
+        for p in self._positions(digest):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+
+class ScalableBloomFilter:
+    """Bloom filter layers of doubling capacity; the total false-positive rate stays below error_rate."""
+
+    def __init__(self, error_rate=DEFAULT_ERROR_RATE, initial_capacity=INITIAL_CAPACITY, layers=None):
+        self.error_rate = error_rate
+        self.layers = layers if layers is not None else [BloomFilter(initial_capacity, error_rate / 2)]
+
+    def __contains__(self, digest):
+        return any(digest in layer for layer in self.layers)
+
+    def add(self, digest):
+        if self.layers[-1].full:
+            last = self.layers[-1]
+            self.layers.append(BloomFilter(last.capacity * 2, last.error_rate / 2))
+        self.layers[-1].add(digest)
+
+    def copy(self):
+        layers = [BloomFilter(layer.capacity, layer.error_rate, layer.bits, layer.count, layer.probing)
+                  for layer in self.layers]
+        return ScalableBloomFilter(self.error_rate, layers=layers)
+
+    def __len__(self):
+        return sum(layer.count for layer in self.layers)
+
+    def memory_bytes(self):
+        return sum(sys.getsizeof(layer.bits) for layer in self.layers)
+
+    def to_dict(self):
+        return {
+            "error_rate": self.error_rate,
+            "layers": [{"capacity": layer.capacity, "error_rate": layer.error_rate, "count": layer.count,
+                        "probing": layer.probing, "bits": base64.b64encode(layer.bits).decode()}
+                       for layer in self.layers],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        layers = [BloomFilter(layer["capacity"], layer["error_rate"], base64.b64decode(layer["bits"]), layer["count"],
+                              layer.get("probing", "double"))
+                  for layer in data["layers"]]
+        return cls(data["error_rate"], layers=layers)
+
+
+class BallotDeduplicator:
+    """
+    Admits a ballot only if its voter id is new and its ciphertexts have not
+    been seen before; counts what it rejects. `width` is the byte width of
+    one ciphertext under the election's key.
+    """
+
+    def __init__(self, width, error_rate=DEFAULT_ERROR_RATE):
+        self.width = width
+        self._voters = set()
+        self._ballots = ScalableBloomFilter(error_rate)
+        self._withdrawn = set()  # digests of ballots whose admission was withdrawn (still in the Bloom filter)
+        self._lock = threading.Lock()
+        self.rejected = {DUPLICATE_VOTER: 0, REPLAYED_BALLOT: 0, ELECTION_FULL: 0}
+
+    def admit(self, voter_id, ciphertexts, limit=None):
+        """
+        Return ADMITTED (and remember the ballot), DUPLICATE_VOTER,
+        REPLAYED_BALLOT or, once `limit` voters are admitted, ELECTION_FULL.
+        """
+        voter = voter_digest(voter_id)
+        ballot = ballot_digest(b"".join(c.to_bytes(self.width, "big") for c in ciphertexts))
+        with self._lock:
+            if limit is not None and len(self._voters) >= limit:
+                self.rejected[ELECTION_FULL] += 1
+                return ELECTION_FULL
+            if voter in self._voters:
+                self.rejected[DUPLICATE_VOTER] += 1
+                return DUPLICATE_VOTER
+            if ballot in self._ballots and ballot not in self._withdrawn:
+                self.rejected[REPLAYED_BALLOT] += 1
+                return REPLAYED_BALLOT
+            self._voters.add(voter)
+            self._ballots.add(ballot)
+            self._withdrawn.discard(ballot)
+        return ADMITTED
+
+    def withdraw(self, voter_ids, ballots):
+        """
+        Undo admit() for ballots that never reached the sums (their commit
+        failed), so their voters can resend them. A Bloom filter cannot drop
+        entries, so the ballots' digests are remembered as withdrawn instead.
+        """
+        voters = [voter_digest(voter_id) for voter_id in voter_ids]
+        digests = [ballot_digest(b"".join(c.to_bytes(self.width, "big") for c in ciphertexts))
+                   for ciphertexts in ballots]
+        with self._lock:
+            self._voters.difference_update(voters)
+            self._withdrawn.update(digests)
+
+    def replay(self, voter_digests, ballot_digests):
+        """Re-add digests recovered from the ballot log (adding a known digest again is harmless)."""
+        with self._lock:
+            self._voters.update(voter_digests)
+            for digest in ballot_digests:
+                self._ballots.add(digest)
+
+    def __len__(self):
+        return len(self._voters)
+
+    def memory_bytes(self):
+        with self._lock:
+            voters = sys.getsizeof(self._voters) + len(self._voters) * sys.getsizeof(b"\0" * DIGEST_SIZE)
+            return voters + self._ballots.memory_bytes()
+
+    def copy(self):
+        """An independent copy, e.g. to serialize for a checkpoint while ballots keep arriving."""
+        with self._lock:
+            twin = BallotDeduplicator(self.width, self._ballots.error_rate)
+            twin._voters = set(self._voters)
+            twin._ballots = self._ballots.copy()
+            twin._withdrawn = set(self._withdrawn)
+            twin.rejected = dict(self.rejected)
+            return twin
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "voters": base64.b64encode(b"".join(self._voters)).decode(),
+                "ballots": self._ballots.to_dict(),
+                "withdrawn": base64.b64encode(b"".join(self._withdrawn)).decode(),
+                "rejected": dict(self.rejected),
+            }
+
+    @classmethod
+    def from_dict(cls, width, data):
+        dedup = cls(width)
+        voters = base64.b64decode(data["voters"])
+        dedup._voters = {voters[i:i + DIGEST_SIZE] for i in range(0, len(voters), DIGEST_SIZE)}
+        dedup._ballots = ScalableBloomFilter.from_dict(data["ballots"])
+        withdrawn = base64.b64decode(data.get("withdrawn", ""))  # absent in checkpoints from before withdraw()
+        dedup._withdrawn = {withdrawn[i:i + DIGEST_SIZE] for i in range(0, len(withdrawn), DIGEST_SIZE)}
+        dedup.rejected.update(data["rejected"])
+        return dedup
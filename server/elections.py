@@ -0,0 +1,210 @@
+# server/elections.py
+#
+# Election namespaces. Each election (/elections/<id>/...) has its own public
+# key (phe caches n² on it), running sums, commitments, duplicate-ballot
+# filter and tally cache, and is
+# created and archived independently. The un-prefixed endpoints (/submit_vote,
+# /get_encrypted_tally, ...) act on the DEFAULT_ELECTION.
+#
+# An election also holds the latest cumulative partial sum reported by each
+# aggregator node below this server (see server/forwarder.py); its tally is
+# its own accumulator combined with those partials.
+
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+from phe import paillier
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import bigint, wire
+from common.packing import BallotLayout, REFERENDUM
+
+from accumulator import ShardedAccumulator, SegmentedAccumulator, TAG_MODULUS
+from commitment_store import CommitmentStore
+from dedup import BallotDeduplicator, ELECTION_FULL
+from tally_cache import TallyCache
+
+DEFAULT_ELECTION = "default"
+ELECTION_ID = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+OPEN = "open"
+ARCHIVED = "archived"
+
+# Outcomes of Election.record_partial (besides ELECTION_FULL)
+PARTIAL_RECORDED = "recorded"
+PARTIAL_STALE = "stale"
+
+
+class Election:
+    def __init__(self, election_id, n, layout=None, parts=1, commitments=None):
+        self.id = election_id
+        self.pubkey = paillier.PaillierPublicKey(n)
+        self.layout = layout  # packed-ballot layout dict (None = single yes/no ciphertext)
+        self.parts = parts
+        # Slots and contests the ballot-validity proofs cover (no layout: one yes/no ciphertext)
+        self.ballot_layout = BallotLayout.from_dict(layout, n) if layout is not None else BallotLayout(REFERENDUM, 1, n)
+        self.accumulator = ShardedAccumulator(self.pubkey, parts)
+        self.segments = SegmentedAccumulator(self.pubkey, parts)
+        self.commitments = commitments if commitments is not None else CommitmentStore()
+        self.dedup = BallotDeduplicator(wire.ciphertext_width(self.pubkey.nsquare))
+        self.tally_cache = TallyCache()
+        self.partials = {}  # node id → latest partial: {version, products, ballots, tag, segments, received}
+        self._partials_lock = threading.Lock()
+        self.status = OPEN
+        self.created = time.time()
+
+    @property
+    def nsquare(self):
+        return self.pubkey.nsquare
+
+    @property
+    def is_open(self):
+        return self.status == OPEN
+
+    def same_key(self, n, layout):
+        return self.pubkey.n == n and self.layout == layout
+
+    @property
+    def max_ballots(self):
+        """Ballots the packed counters can hold (None without a layout: a lone yes/no ciphertext has no slots)."""
+        return self.ballot_layout.max_voters if self.layout is not None else None
+
+    def admit(self, voter_id, ciphertexts):
+        """dedup.admit(), refusing with ELECTION_FULL once max_ballots ballots are in, here or in partials."""
+        if self.max_ballots is None:
+            return self.dedup.admit(voter_id, ciphertexts)
+        with self._partials_lock:
+            forwarded = sum(partial["ballots"] for partial in self.partials.values())
+            return self.dedup.admit(voter_id, ciphertexts, limit=self.max_ballots - forwarded)
+
+    def record_partial(self, node_id, partial):
+        """
+        Keep `partial` as node_id's contribution unless a newer one is already
+        held; returns PARTIAL_RECORDED, PARTIAL_STALE or ELECTION_FULL (it
+        would take the election past max_ballots).
+        """
+        with self._partials_lock:
+            current = self.partials.get(node_id)
+            if current is not None and current["version"] >= partial["version"]:
+                return PARTIAL_STALE
+            if self.max_ballots is not None:
+                others = sum(p["ballots"] for node, p in self.partials.items() if node != node_id)
+                if len(self.dedup) + others + partial["ballots"] > self.max_ballots:
+                    return ELECTION_FULL
+            self.partials[node_id] = partial
+            return PARTIAL_RECORDED
+
+    def merged(self):
+        """(products, ballot count, ballot-id tag) over this node's ballots and every child node's partial."""
+        products, count, tag = self.accumulator.merge_tagged()
+        with self._partials_lock:
+            partials = list(self.partials.values())
+        for partial in partials:
+            products = [bigint.mulmod(p, c, self.nsquare) for p, c in zip(products, partial["products"])]
+            count += partial["ballots"]
+            tag += partial["tag"]
+        return products, count, tag % TAG_MODULUS
+
+    def segment_snapshot(self):
+        """{segment: (products, ballot count)} over this node's segments and the child nodes' ones."""
+        segments = self.segments.snapshot()
+        with self._partials_lock:
+            partials = list(self.partials.values())
+        for partial in partials:
+            for name, (products, count) in partial["segments"].items():
+                own, own_count = segments.get(name, ([1] * self.parts, 0))
+                segments[name] = ([bigint.mulmod(p, c, self.nsquare) for p, c in zip(own, products)], own_count + count)
+        return segments
+
+    def archive(self):
+        """Stop accepting ballots and commitments; fold the accumulator shards into one."""
+        self.status = ARCHIVED
+        self.accumulator.compact()
+        self.tally_cache.bump()
+
+    def memory_bytes(self):
+        key = sum(sys.getsizeof(v) for v in (self.pubkey.n, self.pubkey.nsquare, self.pubkey.g, self.pubkey.max_int))
+        with self._partials_lock:
+            partials = sum(sys.getsizeof(partial) + sum(sys.getsizeof(p) for p in partial["products"])
+                           for partial in self.partials.values())
+        return (sys.getsizeof(self) + key + self.accumulator.memory_bytes() + self.segments.memory_bytes()
+                + self.commitments.memory_bytes() + self.dedup.memory_bytes() + self.tally_cache.memory_bytes()
+                + partials)
+
+    def summary(self):
+        return {
+            "election_id": self.id,
+            "status": self.status,
+            "created": self.created,
+            "parts": self.parts,
+            "ballot_layout": self.layout,
+            "ballot_count": len(self.accumulator) + sum(p["ballots"] for p in list(self.partials.values())),
+            "child_nodes": {node_id: {"ballot_count": p["ballots"], "received": p["received"]}
+                            for node_id, p in list(self.partials.items())},
+            "segment_count": len(self.segments),
+            "commitment_count": len(self.commitments),
+            "rejected_ballots": dict(self.dedup.rejected),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+    def snapshot(self):
+        """State for a ballot-log checkpoint (copies only; BallotLog serializes it after appends resume)."""
+        products, count, tag = self.accumulator.merge_tagged()
+        with self._partials_lock:
+            partials = dict(self.partials)
+        return {
+            "n": self.pubkey.n,
+            "parts": self.parts,
+            "layout": self.layout,
+            "products": products,
+            "ballots": count,
+            "ids_tag": tag,
+            "partials": partials,
+            "segments": self.segments.snapshot(),
+            "commitments": self.commitments.records(),
+            "archived": self.status == ARCHIVED,
+            "dedup": self.dedup.copy(),
+            "voter_digests": [],
+            "ballot_digests": [],
+        }
+
+    @classmethod
+    def from_state(cls, election_id, state, commitments=None):
+        election = cls(election_id, state["n"], state["layout"], state["parts"], commitments)
+        tag = state["ids_tag"] + sum(int.from_bytes(d, "big") for d in state["voter_digests"])
+        election.accumulator.seed(state["products"], state["ballots"], tag % TAG_MODULUS)
+        election.partials = dict(state["partials"])
+        for name, (products, count) in state["segments"].items():
+            election.segments.seed(name, products, count)
+        election.commitments.load(state["commitments"])
+        if state["dedup"] is not None:
+            election.dedup = BallotDeduplicator.from_dict(election.dedup.width, state["dedup"])
+        election.dedup.replay(state["voter_digests"], state["ballot_digests"])
+        if state["archived"]:
+            election.archive()
+        return election
+
+
+class ElectionRegistry:
+    """All elections hosted by this process, by id."""
+
+    def __init__(self):
+        self._elections = {}
+        self._lock = threading.Lock()
+
+    def get(self, election_id):
+        return self._elections.get(election_id)
+
+    def put(self, election):
+        with self._lock:
+            self._elections[election.id] = election
+
+    def all(self):
+        with self._lock:
+            return list(self._elections.values())
+
+    def __len__(self):
+        return len(self._elections)
@@ -0,0 +1,101 @@
+# server/forwarder.py
+#
+# Aggregator-node role. A server started with --upstream <parent URL> takes
+# ballots from its kiosks like any other server, and a background thread
+# reports each election's partial sum to the parent every few seconds:
+#
+#     POST <parent>[/elections/<id>]/submit_partial
+#     { "node_id": "site-a", "version": <ns timestamp>, "ciphertexts": ["...", ...],
+#       "ballot_count": 1234, "ballot_ids_digest": "<hex>",
+#       "segments": { "<segment>": { "ciphertexts": [...], "ballot_count": 12 }, ... } }
+#
+# Every report carries the node's whole running sum rather than what changed
+# since the last one, so a lost, repeated or reordered report does no harm:
+# the parent keeps the newest version per node and combines a handful of
+# partials instead of every ballot. A node with aggregators of its own
+# reports its sum combined with theirs, so nodes can be stacked.
+#
+# The ballot-id digest is the sum of the included voter-id digests mod 2^128
+# (server/dedup.py); digests of sibling nodes add up to the parent's.
+
+import threading
+import time
+
+import requests
+
+from elections import DEFAULT_ELECTION
+
+
+class PartialForwarder:
+    def __init__(self, elections, upstream, node_id, interval=2.0, token=None, counter=None, log=print):
+        self.elections = elections
+        self.upstream = upstream.rstrip("/")
+        self.node_id = node_id
+        self.interval = interval
+        self.counter = counter  # metrics Counter with a "result" label, if any
+        self.log = log
+        self._session = requests.Session()
+        if token is not None:
+            self._session.headers["Authorization"] = f"Bearer {token}"
+        self._registered = set()  # (election id, n) pairs whose key the parent has
+        self._sent = {}           # election id → (Election, tally version) last reported
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="partial-forwarder", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the thread and report anything not yet sent."""
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def _url(self, election, path):
+        prefix = "" if election.id == DEFAULT_ELECTION else f"/elections/{election.id}"
+        return f"{self.upstream}{prefix}{path}"
+
+    def flush(self):
+        for election in self.elections.all():
+            version = election.tally_cache.version
+            sent = self._sent.get(election.id)
+            if sent is not None and sent[0] is election and sent[1] == version:
+                continue
+            try:
+                self._forward(election)
+            except (requests.RequestException, RuntimeError) as e:
+                if self.counter is not None:
+                    self.counter.inc(result="error")
+                self.log(f"❌ Forwarding election '{election.id}' to {self.upstream} failed: {e}")
+                continue
+            self._sent[election.id] = (election, version)
+            if self.counter is not None:
+                self.counter.inc(result="sent")
+
+    def _forward(self, election):
+        if (election.id, election.pubkey.n) not in self._registered:
+            resp = self._session.post(self._url(election, "/set_public_key"),
+                                      json={"n": str(election.pubkey.n), "ballot_layout": election.layout}, timeout=10)
+            if resp.status_code != 200:
+                raise RuntimeError(f"parent refused the public key ({resp.status_code}: {resp.text.strip()})")
+            self._registered.add((election.id, election.pubkey.n))
+
+        version = time.time_ns()
+        products, count, tag = election.merged()
+        body = {
+            "node_id": self.node_id,
+            "version": version,
+            "ciphertexts": [str(p) for p in products],
+            "ballot_count": count,
+            "ballot_ids_digest": format(tag, "032x"),
+            "segments": {name: {"ciphertexts": [str(p) for p in seg_products], "ballot_count": seg_count}
+                         for name, (seg_products, seg_count) in election.segment_snapshot().items()},
+        }
+        resp = self._session.post(self._url(election, "/submit_partial"), json=body, timeout=30)
+        if resp.status_code != 200:
+            raise RuntimeError(f"parent rejected the partial sum ({resp.status_code}: {resp.text.strip()})")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# server/gmpy2_smoke.py
+#
+# Checks the gmpy2 big-integer backend (common/bigint.py) against the
+# pure-Python one: powmod, invert, mulmod and prod_mod on Paillier-sized
+# numbers, keygen and encryption, and the server's running sums
+# (ShardedAccumulator, SegmentedAccumulator) decrypting to the right tally.
+# Every result must come back as a plain int, since the wire format, JSON and
+# the ballot log all expect one. Skipped when gmpy2 cannot be imported.
+
+import importlib.util
+import os
+import secrets
+import sys
+
+if importlib.util.find_spec("gmpy2") is None:
+    print("⚠️ gmpy2 is not installed; nothing to check.")
+    sys.exit(0)
+
+os.environ["CVS_BIGINT"] = "gmpy2"  # the accumulators below must run on gmpy2, not fall back
+
+from accumulator import ShardedAccumulator, SegmentedAccumulator
+from common import bigint
+from homomorphic import multiply_ciphertexts
+
+BALLOTS = 200
+ROUNDS = 50
+
+python, gmp = bigint.PythonBackend, bigint.Gmpy2Backend
+assert bigint.NAME == "gmpy2", bigint.NAME
+
+
+def same(name, expected, got):
+    assert type(got) is int, f"{name} returned {type(got).__name__}, not int"
+    assert got == expected, f"{name} disagrees with the pure-Python backend"
+
+
+# 1. Keygen: gmpy2 primes, checked by the pure-Python primality test
+pubkey, privkey = bigint.generate_paillier_keypair(1024)
+n, nsquare = pubkey.n, pubkey.nsquare
+assert python.is_prime(privkey.p) and python.is_prime(privkey.q) and n.bit_length() == 1024
+
+# 2. The primitives, side by side on random Paillier-sized operands
+for _ in range(ROUNDS):
+    a, b, e = secrets.randbelow(nsquare), secrets.randbelow(nsquare), secrets.randbits(1024)
+    same("powmod", python.powmod(a, e, nsquare), gmp.powmod(a, e, nsquare))
+    same("mulmod", python.mulmod(a, b, nsquare), gmp.mulmod(a, b, nsquare))
+    unit = secrets.randbelow(n - 1) + 1
+    same("invert", python.invert(unit, n), gmp.invert(unit, n))
+values = [secrets.randbelow(nsquare) for _ in range(ROUNDS)]
+same("prod_mod", python.prod_mod(values, nsquare, 7), gmp.prod_mod(values, nsquare, 7))
+r = secrets.randbelow(n - 1) + 1
+same("encrypt", bigint.encrypt(pubkey, 1, r, using=python), bigint.encrypt(pubkey, 1, r, using=gmp))
+
+# 3. Running sums: single adds, batches, a seed and a segment, all on gmpy2
+votes = [secrets.randbelow(2) for _ in range(BALLOTS)]
+ciphertexts = [bigint.encrypt(pubkey, v) for v in votes]
+accumulator = ShardedAccumulator(pubkey)
+segments = SegmentedAccumulator(pubkey)
+half = BALLOTS // 2
+for c in ciphertexts[:half]:
+    accumulator.add((c,))
+accumulator.add_many([(c,) for c in ciphertexts[half:-10]])
+accumulator.seed([multiply_ciphertexts(ciphertexts[-10:], nsquare)], 10)
+accumulator.compact()
+segments.add_many("kiosk-1", [(c,) for c in ciphertexts])
+
+products, count = accumulator.merge()
+same("ShardedAccumulator", python.prod_mod(ciphertexts, nsquare), products[0])
+segment_products, segment_count = segments.snapshot()["kiosk-1"]
+same("SegmentedAccumulator", products[0], segment_products[0])
+assert count == segment_count == BALLOTS
+assert privkey.raw_decrypt(products[0]) == sum(votes)
+
+print(f"✅ gmpy2 backend matches the pure-Python one; {BALLOTS} ballots summed on gmpy2 decrypt to "
+      f"{sum(votes)} yes.")
@@ -0,0 +1,80 @@
+# server/homomorphic.py
+
+import secrets
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import ballot_proof, bigint
+
+
+def validate_ciphertext(ciphertext, exponent, nsquare):
+    """
+    Check that a raw Paillier ciphertext can be folded into an integer tally.
+    Returns None if the ballot is acceptable, otherwise a short error string.
+    """
+    if exponent != 0:
+        return "exponent must be 0 for integer ballots"
+    if not 0 < ciphertext < nsquare:
+        return "ciphertext out of range (must satisfy 0 < c < n^2)"
+    return None
+
+
+def multiply_ciphertexts(ciphertexts, nsquare, start=1):
+    """
+    Homomorphically add many ballots at once.
+    Multiplying raw ciphertexts mod n^2 is the same as adding the plaintexts,
+    so we skip building one EncryptedNumber per ballot and reduce once per step
+    (in the big-integer backend's own number type, common/bigint.py).
+    """
+    return bigint.prod_mod(ciphertexts, nsquare, start)
+
+
+def rerandomize(n, ciphertexts):
+    """
+    Multiply each raw ciphertext by a fresh encryption of zero (r^n mod n²),
+    as phe's EncryptedNumber.ciphertext() does before publishing a sum.
+    """
+    nsquare = n * n
+    return [bigint.mulmod(c, bigint.powmod(secrets.randbelow(n - 1) + 1, n, nsquare), nsquare) for c in ciphertexts]
+
+
+def validate_ballot(ciphertexts, exponent, nsquare, parts):
+    """
+    Check a (possibly packed) ballot: exactly `parts` ciphertexts, each valid.
+    Returns None if the ballot is acceptable, otherwise a short error string.
+    """
+    if len(ciphertexts) != parts:
+        return f"expected {parts} ciphertext(s) per ballot, got {len(ciphertexts)}"
+    for ciphertext in ciphertexts:
+        error = validate_ciphertext(ciphertext, exponent, nsquare)
+        if error is not None:
+            return error
+    return None
+
+
+def check_ballot_proofs(n, ballots, layout, required):
+    """
+    ballots: (voter_id, ciphertexts, ballot proof or None) for ballots that passed validate_ballot;
+    layout: the election's BallotLayout (which slots and contests the proofs cover).
+    Verifies every attached ballot-validity proof in one batch (common/ballot_proof.py).
+    Returns one error string or None per ballot.
+    """
+    errors = [None] * len(ballots)
+    statements, owners = [], []
+    for i, (voter_id, ciphertexts, proof) in enumerate(ballots):
+        if proof is None:
+            if required:
+                errors[i] = "a ballot-validity proof is required"
+            continue
+        try:
+            ballot_statements = ballot_proof.ballot_statements(n, layout, ciphertexts, proof, str(voter_id).encode())
+        except ValueError as e:
+            errors[i] = f"malformed ballot-validity proof: {e}"
+            continue
+        statements += ballot_statements
+        owners += [i] * len(ballot_statements)
+    for i, valid in zip(owners, ballot_proof.verify_batch(n, statements)):
+        if not valid:
+            errors[i] = "invalid ballot-validity proof"
+    return errors
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# server/ingest_burst.py
+#
+# Backpressure check for the ingest queue: starts a server with a tiny queue
+# (and a ballot log, so commits wait on fsync), fires a burst of concurrent
+# batches at it, retries every 429 after its Retry-After delay, and checks
+# that each ballot ends up counted exactly once. Prints the queue metrics
+# (batch sizes, ingest latency) the burst produced.
+
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+from phe import paillier
+
+ROOT = Path(__file__).parent.parent
+PORT = 5200
+CLIENTS = 32
+BATCHES_PER_CLIENT = 10
+BATCH_SIZE = 8
+QUEUE_CAPACITY = 16
+
+url = f"http://localhost:{PORT}"
+log_dir = tempfile.mkdtemp(prefix="cvs-ingest-burst-")
+process = subprocess.Popen([sys.executable, str(ROOT / "server" / "server.py"), "--quiet", "--port", str(PORT),
+                            "--no-require-proofs", "--log-dir", log_dir, "--ingest-queue", str(QUEUE_CAPACITY),
+                            "--max-batch", "64"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+# Small key, cheap distinct encryptions (as in accumulator_stress.py)
+pubkey, privkey = paillier.generate_paillier_keypair(n_length=1024)
+zero = pubkey.raw_encrypt(0, r_value=2)
+total = CLIENTS * BATCHES_PER_CLIENT * BATCH_SIZE
+ciphertexts, c = [], pubkey.raw_encrypt(1, r_value=1)
+for _ in range(total):
+    c = c * zero % pubkey.nsquare
+    ciphertexts.append(str(c))
+
+throttled = []
+errors = []
+
+
+def client(index):
+    session = requests.Session()
+    for b in range(BATCHES_PER_CLIENT):
+        offset = (index * BATCHES_PER_CLIENT + b) * BATCH_SIZE
+        ballots = [{"voter_id": f"c{index}-v{offset + i}", "exponent": 0, "ciphertext": ciphertexts[offset + i]}
+                   for i in range(BATCH_SIZE)]
+        while True:
+            resp = session.post(f"{url}/submit_votes", json={"ballots": ballots}, timeout=60)
+            if resp.status_code != 429:
+                break
+            throttled.append(int(resp.headers["Retry-After"]))
+            time.sleep(int(resp.headers["Retry-After"]))
+        if resp.status_code != 200 or resp.json()["accepted"] != BATCH_SIZE:
+            errors.append(resp.text)
+
+
+try:
+    deadline = time.time() + 15
+    while True:
+        try:
+            requests.get(f"{url}/metrics", timeout=1)
+            break
+        except requests.ConnectionError:
+            assert time.time() < deadline, "server did not start"
+            time.sleep(0.1)
+    assert requests.post(f"{url}/set_public_key", json={"n": str(pubkey.n)}, timeout=5).status_code == 200
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(CLIENTS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    assert not errors, errors[:3]
+
+    tally = requests.get(f"{url}/get_encrypted_tally", timeout=10).json()
+    counted = privkey.decrypt(paillier.EncryptedNumber(pubkey, int(tally["ciphertext"]), tally["exponent"]))
+    assert tally["ballot_count"] == total and counted == total, (tally["ballot_count"], counted, total)
+
+    metrics = requests.get(f"{url}/metrics", timeout=5).text.splitlines()
+    batches = next(float(l.split()[-1]) for l in metrics if l.startswith("cvs_ingest_batch_size_count"))
+    latency = next(float(l.split()[-1]) for l in metrics if l.startswith("cvs_ingest_latency_seconds_sum"))
+    requests_committed = next(float(l.split()[-1]) for l in metrics if l.startswith("cvs_ingest_latency_seconds_count"))
+    print(f"✅ {total} ballots from {CLIENTS} clients counted exactly once in {elapsed:.1f}s; "
+          f"{len(throttled)} request(s) throttled with 429 (Retry-After {min(throttled, default=0)}-"
+          f"{max(throttled, default=0)}s).")
+    print(f"📥 {batches:.0f} micro-batch(es), {total / batches:.1f} ballots each on average; "
+          f"mean ingest latency {1000 * latency / requests_committed:.1f} ms.")
+finally:
+    process.terminate()
+    process.wait()
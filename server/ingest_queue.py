@@ -0,0 +1,160 @@
+# server/ingest_queue.py
+#
+# Bounded ingest pipeline between the request threads and the running sums.
+#
+# A request validates its ballots, reserves queue space (reserve() fails when
+# the queue is full, and the server answers 429 with Retry-After), admits
+# them through the election's deduplicator and submits them. Aggregator
+# worker threads drain the queue in micro-batches of up to max_batch ballots:
+# the ballots of a batch are grouped by election and segment and committed
+# together (one modular product per group, one ballot-log append and one
+# durability wait per batch). The request waits for its batch to commit, so
+# a "vote recorded" answer still means the ballot is in the sum (and on disk).
+# If a batch fails to commit, every request in it gets the error (the server
+# answers a retryable 503); commit() has by then withdrawn the deduplicator's
+# admission of the ballots that did not reach the sums, so they can be resent.
+#
+# Capacity is counted in ballots, including ones reserved but not yet
+# submitted. A request larger than the whole queue is let in when the queue
+# is empty, so an oversized batch is slow rather than refused forever.
+
+import math
+import threading
+import time
+from collections import deque
+
+
+class _Pending:
+    __slots__ = ("election", "segment", "ballots", "voter_ids", "enqueued", "done", "error")
+
+    def __init__(self, election, segment, ballots, voter_ids):
+        self.election = election
+        self.segment = segment
+        self.ballots = ballots
+        self.voter_ids = voter_ids
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.error = None
+
+    def wait(self):
+        """Block until the ballots are committed; re-raises the worker's error, if any."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class IngestQueue:
+    """
+    commit(groups) folds a list of (election, segment, ballots, voter ids) into
+    the running sums; when it raises, it must first have withdrawn the
+    deduplicator's admission of whatever it did not fold in. batch_sizes / latency: optional metrics Histograms for
+    the ballots per micro-batch and the enqueue-to-commit time of each request.
+    """
+
+    def __init__(self, commit, capacity=10000, workers=2, max_batch=512, batch_sizes=None, latency=None):
+        self.commit = commit
+        self.capacity = capacity
+        self.max_batch = max_batch
+        self.batch_sizes = batch_sizes
+        self.latency = latency
+        self._items = deque()
+        self._queued = 0    # ballots in _items
+        self._reserved = 0  # ballots reserved by requests that have not submitted yet
+        self._rate = 0.0    # ballots committed per second (moving average), for Retry-After
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._threads = [threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+                         for i in range(workers)]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Commit everything still queued, then stop the workers."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    @property
+    def depth(self):
+        """Ballots queued or reserved."""
+        return self._queued + self._reserved
+
+    def reserve(self, count):
+        """Hold space for `count` ballots; False if the queue is full."""
+        with self._cond:
+            if self._stopped or (self.depth + count > self.capacity and self.depth > 0):
+                return False
+            self._reserved += count
+            return True
+
+    def release(self, count):
+        """Give back reserved space that will not be submitted (e.g. ballots the deduplicator rejected)."""
+        with self._cond:
+            self._reserved -= count
+
+    def submit(self, election, ballots, segment=None, voter_ids=()):
+        """Queue reserved ballots for commit; returns a handle to wait() on."""
+        pending = _Pending(election, segment, ballots, list(voter_ids))
+        with self._cond:
+            self._reserved -= len(ballots)
+            self._queued += len(ballots)
+            self._items.append(pending)
+            self._cond.notify()
+        return pending
+
+    def retry_after(self):
+        """Seconds a throttled client should wait: roughly the time to drain the queue."""
+        with self._cond:
+            return max(1, min(30, math.ceil(self.depth / self._rate))) if self._rate > 0 else 1
+
+    def _take(self):
+        with self._cond:
+            while not self._items and not self._stopped:
+                self._cond.wait()
+            batch, size = [], 0
+            while self._items and (not batch or size + len(self._items[0].ballots) <= self.max_batch):
+                pending = self._items.popleft()
+                batch.append(pending)
+                size += len(pending.ballots)
+            self._queued -= size
+            if self._items:
+                self._cond.notify()  # more work: wake another worker
+            return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._take()
+            if not batch:
+                return  # stopped and drained
+
+            groups = {}
+            for pending in batch:
+                key = (id(pending.election), pending.segment)
+                if key not in groups:
+                    groups[key] = (pending.election, pending.segment, [], [])
+                groups[key][2].extend(pending.ballots)
+                groups[key][3].extend(pending.voter_ids)
+
+            start = time.perf_counter()
+            error = None
+            try:
+                self.commit(list(groups.values()))
+            except Exception as e:
+                error = e
+            finished = time.perf_counter()
+
+            with self._cond:
+                rate = size / max(finished - start, 1e-6)
+                self._rate = rate if self._rate == 0 else 0.8 * self._rate + 0.2 * rate
+            if self.batch_sizes is not None:
+                self.batch_sizes.observe(size)
+            for pending in batch:
+                pending.error = error
+                if self.latency is not None:
+                    self.latency.observe(finished - pending.enqueued)
+                pending.done.set()
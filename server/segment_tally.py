@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# server/segment_tally.py
+#
+# Per-segment (precinct, kiosk, hour, ...) results: fetch every segment's
+# encrypted sum from GET /get_segment_tallies and decrypt them all in one
+# batch with CRT decryption in a process pool (common/batch_decrypt.py).
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from common import keyfile
+from common.batch_decrypt import decrypt_many
+from common.packing import BallotLayout, REFERENDUM, print_results
+
+
+def decrypt_segments(privkey, data, processes=None):
+    """
+    data: the /get_segment_tallies response. Returns {segment: {contest: {option: count}}}.
+    All segments' ciphertexts are decrypted in a single batch.
+    """
+    n = privkey.public_key.n
+    segments = data["segments"]
+    names = sorted(segments)
+    flat = [int(c) for name in names for c in segments[name]["ciphertexts"]]
+    totals = decrypt_many(privkey, flat, processes)
+
+    layout = BallotLayout.from_dict(data["ballot_layout"], n) if data.get("ballot_layout") else None
+    results = {}
+    offset = 0
+    for name in names:
+        count = segments[name]["ballot_count"]
+        parts = len(segments[name]["ciphertexts"])
+        # Without a registered layout a ballot is one 0/1 ciphertext; size its slot from the ballot count
+        segment_layout = layout or BallotLayout(REFERENDUM, max(count, 1), n)
+        results[name] = segment_layout.decode(totals[offset:offset + parts], count)
+        offset += parts
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decrypt per-segment tallies from the server in one batch.")
+    parser.add_argument("--server", default="http://localhost:5000")
+    parser.add_argument("--privkey", default=str(PROJECT_ROOT / "keys" / keyfile.PRIVATE_KEY_FILE),
+                        help="Paillier private key file (a legacy .pkl pickle is also accepted)")
+    parser.add_argument("--processes", type=int, default=None, help="decryption worker processes (default: CPU count)")
+    parser.add_argument("--output", help="also write {segment: results} as JSON to this file")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary line")
+    args = parser.parse_args()
+
+    try:
+        privkey = keyfile.load_private_key(args.privkey)
+    except Exception as e:
+        print(f"❌ Error loading private key from {args.privkey}: {e}")
+        sys.exit(1)
+
+    resp = requests.get(f"{args.server.rstrip('/')}/get_segment_tallies")
+    if resp.status_code != 200:
+        print("❌ Error retrieving segment tallies:", resp.text)
+        sys.exit(1)
+    data = resp.json()
+
+    start = time.perf_counter()
+    results = decrypt_segments(privkey, data, args.processes)
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        for name, segment_results in results.items():
+            print(f"📍 Segment '{name}' ({data['segments'][name]['ballot_count']} ballot(s)):")
+            print_results(segment_results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"✅ Results written to {args.output}")
+    ciphertexts = sum(len(s["ciphertexts"]) for s in data["segments"].values())
+    print(f"⏱️  Decrypted {len(results)} segment(s) ({ciphertexts} ciphertexts) in {elapsed:.3f}s")
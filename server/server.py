@@ -1,8 +1,27 @@
 # server/server.py
 
+import argparse
+import hmac
+import json
+import socket
 import sys
-from flask import Flask, request, jsonify
-from phe import paillier
+import time
+from pathlib import Path
+from flask import Flask, Response, g, request, jsonify
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from common import wire, ballot_proof, bigint
+from common.packing import BallotLayout
+
+from homomorphic import validate_ballot, check_ballot_proofs, rerandomize
+from ballot_log import BallotLog
+from commitment_store import CommitmentStore, RECORDED, DUPLICATE_VOTER, DUPLICATE_COMMITMENT, DUPLICATE_VOTE_ID
+from dedup import ADMITTED, ELECTION_FULL, REPLAYED_BALLOT, voter_tag
+from accumulator import TAG_MODULUS
+from elections import Election, ElectionRegistry, DEFAULT_ELECTION, ELECTION_ID, PARTIAL_RECORDED
+from forwarder import PartialForwarder
+from ingest_queue import IngestQueue
+from metrics import Registry
 
 app = Flask(__name__)
 
@@ -10,20 +29,339 @@ app = Flask(__name__)
 # ────────────────────────────────────────────────────────────────────────────
 # Global variables on the server
 # ────────────────────────────────────────────────────────────────────────────
-server_pubkey = None  # Will hold the PaillierPublicKey once set
-server_encrypted_sum = None  # Will hold the homomorphic running sum
-received_commitments = []  # Simply store all commitments for potential later verification
+elections = ElectionRegistry()  # Each election's key, running sums, commitments and tally cache, by id
+default_commitments = CommitmentStore()  # The default election's commitments (accepted before its key is set, reset when the key changes)
+ballot_log = None  # Append-only crash-safe log (BallotLog), enabled when run as a script
+partial_token = None  # Shared secret aggregator nodes must present to POST /submit_partial (None = not accepted)
+ingest_queue = None  # IngestQueue feeding ballots to aggregator workers in micro-batches (None = add inline)
+forwarder = None  # PartialForwarder reporting our sums to a parent node (aggregator mode, --upstream)
+require_proofs = True  # Reject ballots without validity proofs (--no-require-proofs turns it off); attached ones are always checked
+verbose = True  # Per-request console lines; turned off with --quiet to keep print() off the hot path
+
+
+def log(message):
+    if verbose:
+        print(message)
+
+
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Metrics (scraped from GET /metrics in the Prometheus text format)
+# ────────────────────────────────────────────────────────────────────────────
+metrics = Registry()
+REQUESTS = metrics.counter("cvs_http_requests_total", "HTTP requests handled.", ("endpoint", "method", "status"))
+REQUEST_SECONDS = metrics.histogram("cvs_http_request_duration_seconds", "HTTP request latency.", ("endpoint",))
+PHASE_SECONDS = metrics.histogram(
+    "cvs_phase_duration_seconds",
+    "Time spent in each stage of ballot handling: decode (JSON/binary → ints), validate, "
+    "proof (ballot-validity proofs), dedup (voter id / replay checks), log_append, homomorphic_add (modular products), log_fsync_wait, tally_merge and "
+    "encrypted_number (re-randomizing the tally's ciphertexts).",
+    ("phase",))
+BALLOTS = metrics.counter("cvs_ballots_total", "Ballots received, by outcome (accepted, rejected, invalid_proof, "
+                          "duplicate_voter, replayed_ballot, throttled, failed).", ("result",))
+INGEST_BATCH_SIZE = metrics.histogram("cvs_ingest_batch_size", "Ballots committed per ingest micro-batch.",
+                                      buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048))
+INGEST_LATENCY = metrics.histogram("cvs_ingest_latency_seconds",
+                                   "Time from queuing ballots to their commit into the running sums.")
+COMMITMENTS = metrics.counter("cvs_commitments_total", "Commitments received, by outcome.", ("result",))
+PARTIALS_RECEIVED = metrics.counter("cvs_partials_received_total",
+                                    "Partial sums received from aggregator nodes, by outcome.", ("result",))
+PARTIALS_FORWARDED = metrics.counter("cvs_partials_forwarded_total",
+                                     "Partial sums reported to the parent node, by outcome.", ("result",))
+metrics.gauge("cvs_bigint_backend_info", "Big-integer backend used for Paillier arithmetic (common/bigint.py).",
+              lambda: 1, {"backend": bigint.NAME})
+metrics.gauge("cvs_ingest_queue_depth", "Ballots queued (or reserved) for the ingest workers.",
+              lambda: ingest_queue.depth if ingest_queue is not None else 0)
+metrics.gauge("cvs_ingest_queue_capacity", "Ingest queue capacity in ballots (0 = ballots are added inline).",
+              lambda: ingest_queue.capacity if ingest_queue is not None else 0)
+metrics.gauge("cvs_elections", "Elections hosted (open and archived).", lambda: len(elections))
+metrics.gauge("cvs_accumulator_ballots", "Ballots folded into the running encrypted sums, over all elections.",
+              lambda: sum(len(e.accumulator) for e in elections.all()))
+metrics.gauge("cvs_segments", "Segments (precincts, kiosks, time windows) with their own running sum, over all elections.",
+              lambda: sum(len(e.segments) for e in elections.all()))
+metrics.gauge("cvs_commitments_stored", "Commitments in the stores (Merkle tree sizes), over all elections.",
+              lambda: sum(len(e.commitments) for e in elections.all()
+                          if e.commitments is not default_commitments) + len(default_commitments))
+metrics.gauge("cvs_child_nodes", "Aggregator nodes with a partial sum in some election.",
+              lambda: len({node for e in elections.all() for node in list(e.partials)}))
+metrics.gauge("cvs_dedup_voters", "Distinct voter ids admitted, over all elections.",
+              lambda: sum(len(e.dedup) for e in elections.all()))
+metrics.gauge("cvs_dedup_memory_bytes", "Memory held by the voter id sets and ballot Bloom filters.",
+              lambda: sum(e.dedup.memory_bytes() for e in elections.all()))
+metrics.gauge("cvs_election_memory_bytes", "Approximate memory held by election state (sums, commitments, caches).",
+              lambda: sum(e.memory_bytes() for e in elections.all()))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+
+#
+# ────────────────────────────────────────────────────────────────────────────
+# State updates: write to the ballot log (if enabled), apply in memory, and
+# answer only once the log record is durable (fsynced by group commit).
+# ────────────────────────────────────────────────────────────────────────────
+def start_election(election_id, n, layout=None, parts=1):
+    """Create the election (or restart it under a new key); the default election keeps its commitments
+    unless the key itself changes (a new key is a new election, whose voters commit afresh)."""
+    commitments = default_commitments if election_id == DEFAULT_ELECTION else None
+    previous = elections.get(election_id)
+    rekeyed = commitments is not None and previous is not None and previous.pubkey.n != n
+    if ballot_log is None:
+        if rekeyed:
+            commitments.clear()
+        elections.put(Election(election_id, n, layout, parts, commitments))
+    else:
+        with ballot_log.appending():
+            seq = ballot_log.append_key(n, parts, layout, election_id)
+            if rekeyed:
+                commitments.clear()
+            elections.put(Election(election_id, n, layout, parts, commitments))
+        ballot_log.wait_durable(seq)
+    if previous is not None:
+        previous.tally_cache.bump()  # wake long-pollers still waiting on the old key
+
+
+def archive_election(election):
+    if ballot_log is None:
+        election.archive()
+        return
+    with ballot_log.appending():
+        seq = ballot_log.append_archive(election.id)
+        election.archive()
+    ballot_log.wait_durable(seq)
+
+
+def add_to_sums(election, ballots, segment, tag=0, products=None):
+    """products: the ballots' per-position products mod n², if already computed elsewhere (e.g. in a worker process)."""
+    with PHASE_SECONDS.time(phase="homomorphic_add"):
+        if products is None:
+            election.accumulator.add_many(ballots, tag)
+            if segment is not None:
+                election.segments.add_many(segment, ballots)
+        else:
+            election.accumulator.seed(products, len(ballots), tag)
+            if segment is not None:
+                election.segments.seed(segment, products, len(ballots))
+    election.tally_cache.bump()
+
+
+def record_ballots(election, ballots, segment=None, voter_ids=()):
+    """
+    ballots: list of tuples of raw ciphertexts, one tuple per (possibly packed) ballot.
+    segment: optional precinct/kiosk/time-window tag; the ballots are also added to its sum.
+    voter_ids: the ids admitted by the election's deduplicator for these ballots (logged as digests).
+    """
+    record_ballot_groups([(election, segment, ballots, voter_ids)])
+
+
+def record_ballot_groups(groups, products=None):
+    """
+    record_ballots for several (election, segment, ballots, voter ids) groups, with one durability wait.
+    products: optional list with each group's precomputed per-position products (see add_to_sums).
+    If a group fails, the deduplicator's admission of it and of every group after it (none of which
+    reached the sums) is withdrawn before the error is re-raised, so those voters can resend.
+    """
+    products = products or [None] * len(groups)
+    applied = 0
+    try:
+        if ballot_log is None:
+            for (election, segment, ballots, voter_ids), group_products in zip(groups, products):
+                add_to_sums(election, ballots, segment, voter_tag(voter_ids), group_products)
+                applied += 1
+            return
+        with ballot_log.appending():
+            for (election, segment, ballots, voter_ids), group_products in zip(groups, products):
+                with PHASE_SECONDS.time(phase="log_append"):
+                    if voter_ids:
+                        ballot_log.append_voters(voter_ids, election.id)
+                    seq = ballot_log.append_ballots(ballots, segment, election.id)
+                add_to_sums(election, ballots, segment, voter_tag(voter_ids), group_products)
+                applied += 1
+    except Exception:
+        for election, _, ballots, voter_ids in groups[applied:]:
+            if voter_ids:
+                election.dedup.withdraw(voter_ids, ballots)
+        raise
+    with PHASE_SECONDS.time(phase="log_fsync_wait"):
+        ballot_log.wait_durable(seq)
+
+
+def reserve_ingest(count):
+    """Hold ingest-queue space for `count` ballots (always granted without a queue); False if the queue is full."""
+    return ingest_queue is None or ingest_queue.reserve(count)
+
+
+def release_ingest(count):
+    """Give back reserved space for ballots that will not be ingested."""
+    if ingest_queue is not None and count:
+        ingest_queue.release(count)
+
+
+def ingest(election, groups):
+    """
+    Fold admitted ballots into the sums: groups maps segment → (ballots, voter ids).
+    Through the ingest queue's workers when it runs (using space held by reserve_ingest), inline otherwise.
+    """
+    if ingest_queue is None:
+        for segment, (ballots, voter_ids) in groups.items():
+            record_ballots(election, ballots, segment, voter_ids)
+        return
+    pending = [ingest_queue.submit(election, ballots, segment, voter_ids)
+               for segment, (ballots, voter_ids) in groups.items()]
+    for p in pending:
+        p.wait()
+
+
+def ingest_failed(count, error):
+    """503 for `count` admitted ballots whose commit failed (their admission is withdrawn, so they can be resent)."""
+    BALLOTS.inc(count, result="failed")
+    print(f"❌ Could not record {count} ballot(s): {type(error).__name__}: {error}")
+    response = jsonify({"error": "Could not record the ballot(s); retry after the indicated delay"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+def throttled(count):
+    """429 for `count` ballots the ingest queue has no room for."""
+    BALLOTS.inc(count, result="throttled")
+    response = jsonify({"error": "Server is busy; retry after the indicated delay"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(ingest_queue.retry_after())
+    return response
+
+
+def record_partial(election, node_id, partial):
+    """Keep a child node's partial sum (unless a newer one is held); returns Election.record_partial's outcome."""
+    if ballot_log is None:
+        outcome = election.record_partial(node_id, partial)
+    else:
+        with ballot_log.appending():
+            outcome = election.record_partial(node_id, partial)
+            if outcome == PARTIAL_RECORDED:
+                seq = ballot_log.append_partial(node_id, partial, election.id)
+        if outcome == PARTIAL_RECORDED:
+            ballot_log.wait_durable(seq)
+    if outcome == PARTIAL_RECORDED:
+        election.tally_cache.bump()
+    return outcome
+
+
+def record_commitment(election_id, store, voter_id, digest, salt, vote_id=None):
+    """Returns the CommitmentStore outcome; only RECORDED commitments are logged."""
+    election = elections.get(election_id)
+    if ballot_log is None:
+        outcome = store.add(voter_id, digest, salt, vote_id)
+        if outcome == RECORDED and election is not None:
+            election.tally_cache.bump()  # the tally reports the Merkle root and commitment count
+        return outcome
+    with ballot_log.appending():
+        outcome = store.add(voter_id, digest, salt, vote_id)
+        if outcome != RECORDED:
+            return outcome
+        if election is not None:
+            election.tally_cache.bump()
+        entry = {"voter_id": voter_id, "commitment": digest.hex(), "salt": salt}
+        if vote_id is not None:
+            entry["vote_id"] = vote_id
+        seq = ballot_log.append_commitment(entry, election_id)
+    ballot_log.wait_durable(seq)
+    return outcome
+
+
+def checkpoint_state():
+    """Snapshot for BallotLog checkpoints: {election_id: state}."""
+    states = {election.id: election.snapshot() for election in elections.all()}
+    if DEFAULT_ELECTION not in states and len(default_commitments):
+        states[DEFAULT_ELECTION] = {"n": None, "parts": 1, "layout": None, "products": [1], "ballots": 0,
+                                    "segments": {}, "commitments": default_commitments.records(),
+                                    "archived": False, "dedup": None, "ids_tag": 0, "partials": {}}
+    return states
+
+
+def open_ballot_log(log_dir):
+    """Open the ballot log in `log_dir` and rebuild every election from it; returns the BallotLog."""
+    opened = BallotLog(log_dir)
+    recovered = opened.recover()
+    for election_id, state in recovered["elections"].items():
+        is_default = election_id == DEFAULT_ELECTION
+        if state["n"] is None:
+            # Only the default election takes commitments before its key is set
+            if is_default:
+                default_commitments.load(state["commitments"])
+            continue
+        elections.put(Election.from_state(election_id, state, default_commitments if is_default else None))
+    opened.checkpoint_source = checkpoint_state
+    ballots = sum(state["ballots"] for state in recovered["elections"].values())
+    commitments = sum(len(state["commitments"]) for state in recovered["elections"].values())
+    print(f"🔁 Recovered {ballots} ballot(s) and {commitments} commitment(s) in {len(elections)} election(s) "
+          f"from {log_dir} (replayed {recovered['replayed_records']} log record(s)).")
+    if recovered["truncated_bytes"]:
+        print(f"⚠️ Dropped a torn {recovered['truncated_bytes']}-byte tail from the ballot log "
+              f"(a write cut short by a crash).")
+    return opened
+
+
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Election namespaces. Every endpoint below is served both at its plain path
+# (/submit_vote, ...), which acts on the "default" election, and under
+# /elections/<election_id>/ (/elections/city-2026/submit_vote, ...).
+# ────────────────────────────────────────────────────────────────────────────
+def election_route(rule, **options):
+    def decorator(view):
+        app.add_url_rule(rule, view_func=view, defaults={"election_id": DEFAULT_ELECTION}, **options)
+        app.add_url_rule(f"/elections/<election_id>{rule}", view_func=view, **options)
+        return view
+    return decorator
+
+
+def find_election(election_id, open_only=False, missing="Public key has not been set yet"):
+    """Return (election, None) or (None, error response)."""
+    election = elections.get(election_id)
+    if election is None:
+        if election_id == DEFAULT_ELECTION:
+            return None, (jsonify({"error": missing}), 400)
+        return None, (jsonify({"error": f"Unknown election '{election_id}'"}), 404)
+    if open_only and not election.is_open:
+        return None, (jsonify({"error": f"Election '{election_id}' is archived"}), 409)
+    return election, None
+
+
+def find_commitments(election_id):
+    """The election's CommitmentStore; the default election has one even before its key is set."""
+    election = elections.get(election_id)
+    if election is not None:
+        return election.commitments
+    return default_commitments if election_id == DEFAULT_ELECTION else None
 
 
 #
 # ────────────────────────────────────────────────────────────────────────────
 # Endpoint #1: POST /set_public_key
-#   Client sends JSON { "n": "...", "g": "..." }
-#   We reconstruct a PaillierPublicKey(n, g) and initialize encrypted_sum = encrypt(0).
+#   Client sends JSON { "n": "...", "g": "...", "ballot_layout": { "contests": [...], "max_voters": N } }
+#   ("ballot_layout" is optional; without it each ballot is a single yes/no ciphertext).
+#   We reconstruct a PaillierPublicKey(n, g) and start an empty sharded accumulator
+#   with one running product per packed ciphertext.
+#   POST /elections/<election_id>/set_public_key creates that election. Sending the
+#   same key and layout again is a no-op; a different key restarts the default
+#   election (clearing its commitments; a new layout alone keeps them) and is
+#   refused (409) for any other one.
 # ────────────────────────────────────────────────────────────────────────────
-@app.route("/set_public_key", methods=["POST"])
-def set_public_key():
-    global server_pubkey, server_encrypted_sum
+@election_route("/set_public_key", methods=["POST"])
+def set_public_key(election_id):
+    if not ELECTION_ID.fullmatch(election_id):
+        return jsonify({"error": "Election id must be 1-64 letters, digits, '.', '_' or '-'"}), 400
 
     data = request.get_json()
     # If no JSON or missing "n", return 400:
@@ -35,104 +373,723 @@ def set_public_key():
     except ValueError:
         return jsonify({"error": "'n' must be an integer string"}), 400
 
-    # Reconstruct the public key using only n (phe uses g = n + 1 by default):
-    server_pubkey = paillier.PaillierPublicKey(n)
-    # Initialize running sum as Enc(0) under that public key:
-    server_encrypted_sum = server_pubkey.encrypt(0)
+    layout = data.get("ballot_layout")
+    parts = 1
+    if layout is not None:
+        try:
+            parts = BallotLayout.from_dict(layout, n).num_ciphertexts
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid 'ballot_layout': {e}"}), 400
 
-    print(f"✅ /set_public_key: Received public key n={n}.")
-    print("    Initialized running encrypted sum = Enc(0).")
+    # Advertise the ballot encodings we accept, so the client can negotiate binary
+    # (both carry ballot-validity proofs)
+    wire_formats = ["json", wire.BALLOT_MEDIA_TYPE]
+    proofs = "required" if require_proofs else "optional"
+    existing = elections.get(election_id)
+    if existing is not None and existing.same_key(n, layout):
+        log(f"✅ /set_public_key: Election '{election_id}' already uses this public key; keeping its tally.")
+        return jsonify({"status": "public key already set", "election_id": election_id,
+                        "wire_formats": wire_formats, "ballot_proofs": proofs}), 200
+    if existing is not None and election_id != DEFAULT_ELECTION:
+        return jsonify({"error": f"Election '{election_id}' already has a different public key"}), 409
 
-    return jsonify({"status": "public key stored"}), 200
+    # Reconstruct the public key using only n (phe uses g = n + 1 by default)
+    # and initialize the running sum (empty product = Enc(0)) under it:
+    start_election(election_id, n, layout, parts)
+
+    log(f"✅ /set_public_key: Received public key n={n} for election '{election_id}'.")
+    log("    Initialized running encrypted sum = Enc(0).")
+
+    return jsonify({"status": "public key stored", "election_id": election_id, "wire_formats": wire_formats,
+                    "ballot_proofs": proofs}), 200
 
 
 
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Ballot parsing shared by /submit_vote and /submit_votes.
+#   Content-Type application/vnd.cvs.ballots → compact binary frame (common/wire.py),
+#                                              each ballot followed by its validity proof
+#   anything else                            → JSON with decimal-string ciphertexts:
+#       "ciphertext": "..."            for a single-ciphertext ballot, or
+#       "ciphertexts": ["...", ...]    for a packed ballot with several parts
+#       "proofs": [{"a": [...], "e": [...], "z": [...]}, ...]
+#                                      one 0/1 ballot-validity proof per slot
+#                                      (common/ballot_proof.py), bound to the voter id;
+#                                      optional only when the server runs with --no-require-proofs
+#       "contest_proofs": [...]        with them: one at-most-one-choice proof per contest
+#                                      with several options
+#       "slot_ciphertexts": ["...", ...]
+#                                      with them, for a ballot packing several slots into a
+#                                      ciphertext: one ciphertext per slot, which must pack
+#                                      into the ballot's ciphertexts
+#   A ballot may be tagged with a segment (precinct, kiosk, hour, ...):
+#   "?segment=..." on the request applies to every ballot in it, and a JSON
+#   ballot's (or batch's) own "segment" field takes precedence.
+# ────────────────────────────────────────────────────────────────────────────
+MAX_SEGMENT_LENGTH = 128
+
+
+def is_binary_request():
+    return request.mimetype == wire.BALLOT_MEDIA_TYPE
+
+
+def decode_binary_ballots(nsquare):
+    """Return (list of (voter_id, ciphertexts, exponent, proof or None), error string or None)."""
+    try:
+        return wire.decode_proven_ballots(request.get_data(), wire.ciphertext_width(nsquare)), None
+    except ValueError as e:
+        return None, f"Invalid binary ballot frame: {e}"
+
+
+def parse_json_ballot(ballot):
+    """Return (voter_id, ciphertexts tuple, exponent); raises ValueError with a client-facing message."""
+    if not isinstance(ballot, dict) or "voter_id" not in ballot or "exponent" not in ballot \
+            or ("ciphertext" not in ballot and "ciphertexts" not in ballot):
+        raise ValueError("expected 'voter_id', 'ciphertext' (or 'ciphertexts'), and 'exponent'")
+    if not isinstance(ballot["voter_id"], str) or not ballot["voter_id"]:
+        raise ValueError("'voter_id' must be a non-empty string")
+    try:
+        if "ciphertexts" in ballot:
+            ciphertexts = tuple(int(c) for c in ballot["ciphertexts"])
+        else:
+            ciphertexts = (int(ballot["ciphertext"]),)
+        return ballot["voter_id"], ciphertexts, int(ballot["exponent"])
+    except (ValueError, TypeError):
+        raise ValueError("ciphertext/exponent must be integer strings")
+
+
+def parse_json_proofs(ballot):
+    """Return the ballot's validity proof (None if it has none); raises ValueError with a client-facing message."""
+    return ballot_proof.ballot_from_json(ballot)
+
+
+def parse_segment(segment):
+    """Return the segment name (None if untagged); raises ValueError with a client-facing message."""
+    if segment is None:
+        return None
+    if not isinstance(segment, str) or not 0 < len(segment) <= MAX_SEGMENT_LENGTH:
+        raise ValueError(f"'segment' must be a non-empty string of at most {MAX_SEGMENT_LENGTH} characters")
+    return segment
+
+
 #
 # ────────────────────────────────────────────────────────────────────────────
 # Endpoint #2: POST /submit_vote
 #   Client sends JSON { "voter_id": "...", "ciphertext": "...", "exponent": 123 }
-#   We reconstruct an EncryptedNumber and homomorphically add it to server_encrypted_sum.
+#   (or "ciphertexts" for a packed ballot, or a one-ballot binary frame), plus an optional "segment"
+#   and ballot-validity "proofs" (optional only with --no-require-proofs; an invalid one is a 400).
+#   When run as a script, admitted ballots go through a bounded ingest queue and are added by
+#   worker threads in micro-batches; if the queue is full we answer 429 with Retry-After.
+#   We validate the ciphertexts and homomorphically add them to this thread's accumulator shard
+#   (and to the segment's running sum). Once the election holds its layout's max_voters ballots
+#   (its own plus those in partial sums), more would overflow the packed counters: 409.
 # ────────────────────────────────────────────────────────────────────────────
-@app.route("/submit_vote", methods=["POST"])
-def submit_vote():
-    global server_pubkey, server_encrypted_sum
+@election_route("/submit_vote", methods=["POST"])
+def submit_vote(election_id):
+    election, error = find_election(election_id, open_only=True)
+    if error is not None:
+        return error
 
-    if server_pubkey is None or server_encrypted_sum is None:
-        return jsonify({"error": "Public key has not been set yet"}), 400
+    with PHASE_SECONDS.time(phase="decode"):
+        segment = request.args.get("segment")
+        if is_binary_request():
+            ballots, error = decode_binary_ballots(election.nsquare)
+        else:
+            data = request.get_json()
+            try:
+                ballots, error = [(*parse_json_ballot(data), parse_json_proofs(data))], None
+                segment = parse_segment(data.get("segment", segment))
+            except ValueError as e:
+                ballots, error = None, f"Invalid JSON payload; {e}"
+    if error is None:
+        try:
+            segment = parse_segment(segment)
+        except ValueError as e:
+            error = f"Invalid segment: {e}"
+    if error is not None:
+        BALLOTS.inc(result="rejected")
+        return jsonify({"error": error}), 400
+    if len(ballots) != 1:
+        BALLOTS.inc(len(ballots), result="rejected")
+        return jsonify({"error": "Expected exactly one ballot; use /submit_votes for batches"}), 400
+    voter_id, ciphertexts, exponent, proofs = ballots[0]
 
-    data = request.get_json()
-    if data is None or "voter_id" not in data or "ciphertext" not in data or "exponent" not in data:
-        return jsonify({"error": "Invalid JSON payload; expected 'voter_id', 'ciphertext', and 'exponent'"}), 400
+    with PHASE_SECONDS.time(phase="validate"):
+        error = validate_ballot(ciphertexts, exponent, election.nsquare, election.parts)
+    if error is not None:
+        BALLOTS.inc(result="rejected")
+        return jsonify({"error": f"Invalid ballot: {error}"}), 400
 
+    # Shed load before the expensive checks when the ingest queue is full
+    if not reserve_ingest(1):
+        return throttled(1)
+    rejection = None
     try:
-        voter_id = data["voter_id"]
-        ciphertext = int(data["ciphertext"])
-        exponent = int(data["exponent"])
-    except (ValueError, TypeError):
-        return jsonify({"error": "Invalid ciphertext/exponent; must be integer strings"}), 400
+        with PHASE_SECONDS.time(phase="proof"):
+            [error] = check_ballot_proofs(election.pubkey.n, [(voter_id, ciphertexts, proofs)],
+                                          election.ballot_layout, require_proofs)
+        if error is not None:
+            BALLOTS.inc(result="invalid_proof")
+            rejection = jsonify({"error": f"Invalid ballot: {error}"}), 400
+        else:
+            with PHASE_SECONDS.time(phase="dedup"):
+                outcome = election.admit(voter_id, ciphertexts)
+            if outcome == REPLAYED_BALLOT:
+                rejection = jsonify({"error": "This ballot has already been submitted"}), 409
+            elif outcome == ELECTION_FULL:
+                rejection = jsonify({"error": f"Election '{election.id}' has reached its limit of "
+                                              f"{election.max_ballots} ballot(s)"}), 409
+            elif outcome != ADMITTED:
+                rejection = jsonify({"error": f"Voter '{voter_id}' has already voted"}), 409
+            if outcome != ADMITTED:
+                BALLOTS.inc(result=outcome)
+    except Exception:
+        release_ingest(1)
+        raise
+    if rejection is not None:
+        release_ingest(1)
+        return rejection
 
-    # Reconstruct an EncryptedNumber under the stored public key
+    # Homomorphically add to the running sum: in this thread's shard, or in an ingest worker's micro-batch
     try:
-        incoming_cipher = paillier.EncryptedNumber(server_pubkey, ciphertext, exponent)
+        ingest(election, {segment: ([ciphertexts], [voter_id])})
     except Exception as e:
-        return jsonify({"error": f"Failed to reconstruct EncryptedNumber: {e}"}), 400
+        return ingest_failed(1, e)
+    BALLOTS.inc(result="accepted")
 
-    # Homomorphically add to the running sum
-    server_encrypted_sum = server_encrypted_sum + incoming_cipher
-
-    print(f"✅ /submit_vote: Received vote from '{voter_id}'. Added to running sum.")
+    log(f"✅ /submit_vote: Received vote from '{voter_id}'. Added to running sum.")
     return jsonify({"status": "vote recorded"}), 200
 
 
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Endpoint #2b: POST /submit_votes
+#   Client sends JSON { "ballots": [ { "voter_id": "...", "ciphertext": "...", "exponent": 0 }, ... ] }
+#   (or a binary frame holding many ballots); the batch and each ballot may carry a "segment".
+#   Each ballot is validated on its own and the batch's validity proofs are
+#   verified together in one randomized batch check; all accepted ciphertexts are folded into
+#   the running sum (and each segment's sum) as one modular product over raw integers mod n².
+#   Returns per-ballot accept/reject status in the same order as the request,
+#   or 429 with Retry-After (for the whole batch) when the ingest queue has no room for it.
+# ────────────────────────────────────────────────────────────────────────────
+@election_route("/submit_votes", methods=["POST"])
+def submit_votes(election_id):
+    election, error = find_election(election_id, open_only=True)
+    if error is not None:
+        return error
+
+    nsquare = election.nsquare
+    parts = election.parts
+    accepted_by_segment = {}  # segment → (ballots, voter ids)
+    rejected_by_outcome = {}
+    results = []
+
+    # entries: ((voter_id, ciphertexts, exponent), segment, proofs, parse error or None), in request order
+    with PHASE_SECONDS.time(phase="decode"):
+        if is_binary_request():
+            ballots, error = decode_binary_ballots(election.nsquare)
+            if error is not None:
+                return jsonify({"error": error}), 400
+            segment = request.args.get("segment")
+            entries = [(ballot[:3], segment, ballot[3], None) for ballot in ballots]
+        else:
+            data = request.get_json()
+            if data is None or not isinstance(data.get("ballots"), list):
+                return jsonify({"error": "Invalid JSON payload; expected 'ballots' list"}), 400
+
+            batch_segment = data.get("segment", request.args.get("segment"))
+            entries = []
+            for ballot in data["ballots"]:
+                segment = ballot.get("segment", batch_segment) if isinstance(ballot, dict) else None
+                try:
+                    entries.append((parse_json_ballot(ballot), segment, parse_json_proofs(ballot), None))
+                except ValueError as e:
+                    voter_id = ballot.get("voter_id") if isinstance(ballot, dict) else None
+                    entries.append(((voter_id, None, None), segment, None, str(e)))
+
+    errors = []
+    with PHASE_SECONDS.time(phase="validate"):
+        for index, ((voter_id, ciphertexts, exponent), segment, proofs, error) in enumerate(entries):
+            if error is None:
+                error = validate_ballot(ciphertexts, exponent, nsquare, parts)
+            if error is None:
+                try:
+                    segment = parse_segment(segment)
+                    entries[index] = ((voter_id, ciphertexts, exponent), segment, proofs, None)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                rejected_by_outcome["rejected"] = rejected_by_outcome.get("rejected", 0) + 1
+            errors.append(error)
+
+    # Room in the ingest queue for every well-formed ballot, or the whole batch is throttled
+    valid = [index for index, error in enumerate(errors) if error is None]
+    if not reserve_ingest(len(valid)):
+        return throttled(len(entries))
+
+    try:
+        # All proofs in the batch are verified together (one randomized batch check)
+        with PHASE_SECONDS.time(phase="proof"):
+            proof_errors = check_ballot_proofs(election.pubkey.n,
+                                               [(entries[i][0][0], entries[i][0][1], entries[i][2]) for i in valid],
+                                               election.ballot_layout, require_proofs)
+        for index, error in zip(valid, proof_errors):
+            if error is not None:
+                errors[index] = error
+                rejected_by_outcome["invalid_proof"] = rejected_by_outcome.get("invalid_proof", 0) + 1
+
+        for ((voter_id, ciphertexts, _), segment, _, _), error in zip(entries, errors):
+            if error is not None:
+                results.append({"voter_id": voter_id, "status": "rejected", "error": error})
+                continue
+
+            with PHASE_SECONDS.time(phase="dedup"):
+                outcome = election.admit(voter_id, ciphertexts)
+            if outcome != ADMITTED:
+                rejected_by_outcome[outcome] = rejected_by_outcome.get(outcome, 0) + 1
+                results.append({"voter_id": voter_id, "status": "rejected", "error": outcome})
+                continue
+
+            accepted_ballots, accepted_voters = accepted_by_segment.setdefault(segment, ([], []))
+            accepted_ballots.append(ciphertexts)
+            accepted_voters.append(voter_id)
+            results.append({"voter_id": voter_id, "status": "accepted"})
+    except Exception:
+        release_ingest(len(valid))
+        raise
+
+    # One modular product per segment in the batch, then a single update of each running sum
+    accepted = sum(len(ballots) for ballots, _ in accepted_by_segment.values())
+    release_ingest(len(valid) - accepted)
+    try:
+        ingest(election, accepted_by_segment)
+    except Exception as e:
+        return ingest_failed(accepted, e)
+    rejected = len(results) - accepted
+    BALLOTS.inc(accepted, result="accepted")
+    for outcome, count in rejected_by_outcome.items():
+        BALLOTS.inc(count, result=outcome)
+    log(f"✅ /submit_votes: Batch of {len(results)} ballot(s): "
+        f"{accepted} accepted, {rejected} rejected.")
+    return jsonify({
+        "status": "batch processed",
+        "accepted": accepted,
+        "rejected": rejected,
+        "results": results
+    }), 200
+
+
+def parse_partial(data, election):
+    """Return (node id, partial dict); raises ValueError with a client-facing message."""
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    node_id = data.get("node_id")
+    if not isinstance(node_id, str) or not ELECTION_ID.fullmatch(node_id):
+        raise ValueError("'node_id' must be 1-64 letters, digits, '_', '.' or '-'")
+    try:
+        version = int(data["version"])
+        products = tuple(int(c) for c in data["ciphertexts"])
+        ballots = int(data["ballot_count"])
+        tag = int(data.get("ballot_ids_digest", "0"), 16)
+        segments = {}
+        for name, segment in (data.get("segments") or {}).items():
+            name = parse_segment(name)
+            segments[name] = (tuple(int(c) for c in segment["ciphertexts"]), int(segment["ballot_count"]))
+    except (KeyError, ValueError, TypeError, AttributeError):
+        raise ValueError("expected integer 'version', 'ciphertexts' and 'ballot_count', a hex "
+                         "'ballot_ids_digest' and optional 'segments' of {'ciphertexts', 'ballot_count'}")
+    if ballots < 0 or not 0 <= tag < TAG_MODULUS:
+        raise ValueError("'ballot_count' must be non-negative and 'ballot_ids_digest' at most 128 bits")
+    for sum_products, count in [(products, ballots)] + list(segments.values()):
+        error = validate_ballot(sum_products, 0, election.nsquare, election.parts)
+        if error is None and count < 0:
+            error = "segment ballot counts must be non-negative"
+        if error is not None:
+            raise ValueError(error)
+    return node_id, {"version": version, "products": products, "ballots": ballots, "tag": tag,
+                     "segments": segments, "received": time.time()}
+
+
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Endpoint #2c: POST /submit_partial
+#   Aggregator nodes (started with --upstream, see server/forwarder.py) report
+#   their cumulative sums here, authenticated with "Authorization: Bearer <token>"
+#   (this server's --partial-token; without one the endpoint answers 403):
+#   { "node_id": "site-a", "version": 1718000000000000000, "ciphertexts": ["...", ...],
+#     "ballot_count": 1234, "ballot_ids_digest": "<32 hex>", "segments": { ... } }
+#   The newest version per node is kept and combined into the tally, so
+#   resending or reordering reports is harmless. A partial that would take the
+#   election past its layout's max_voters ballots is refused with 409.
+# ────────────────────────────────────────────────────────────────────────────
+@election_route("/submit_partial", methods=["POST"])
+def submit_partial(election_id):
+    if partial_token is None:
+        PARTIALS_RECEIVED.inc(result="rejected")
+        return jsonify({"error": "This server does not accept partial sums (start it with --partial-token)"}), 403
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme != "Bearer" or not hmac.compare_digest(token.encode(), partial_token.encode()):
+        PARTIALS_RECEIVED.inc(result="rejected")
+        return jsonify({"error": "Missing or invalid aggregator token"}), 401
+
+    election, error = find_election(election_id, open_only=True)
+    if error is not None:
+        PARTIALS_RECEIVED.inc(result="rejected")
+        return error
+
+    try:
+        node_id, partial = parse_partial(request.get_json(silent=True), election)
+    except ValueError as e:
+        PARTIALS_RECEIVED.inc(result="rejected")
+        return jsonify({"error": f"Invalid partial sum: {e}"}), 400
+
+    outcome = record_partial(election, node_id, partial)
+    if outcome == ELECTION_FULL:
+        PARTIALS_RECEIVED.inc(result="rejected")
+        return jsonify({"error": f"Partial sum would take election '{election.id}' past its limit of "
+                                 f"{election.max_ballots} ballot(s)"}), 409
+    if outcome != PARTIAL_RECORDED:
+        PARTIALS_RECEIVED.inc(result="stale")
+        return jsonify({"status": "stale partial ignored"}), 200
+    PARTIALS_RECEIVED.inc(result="recorded")
+
+    log(f"✅ /submit_partial: Node '{node_id}' reports {partial['ballots']} ballot(s) in election '{election.id}'.")
+    return jsonify({"status": "partial recorded"}), 200
+
+
 #
 # ────────────────────────────────────────────────────────────────────────────
 # Endpoint #3: POST /submit_commitment
-#   Client sends JSON { "voter_id": "...", "commitment": "...", "salt": "..." }
-#   We simply store it in memory for potential Phase 2 verification.
+#   Client sends JSON { "voter_id": "...", "commitment": "...", "salt": "...", "vote_id": "..." }
+#   ("vote_id" is optional; it lets the voter fetch a Merkle inclusion proof later).
+#   We store it in the indexed commitment store for Phase 2 verification.
+#   A second commitment from the same voter, a repeated commitment hash or
+#   a repeated vote_id is rejected with 409.
 # ────────────────────────────────────────────────────────────────────────────
-@app.route("/submit_commitment", methods=["POST"])
-def submit_commitment():
-    global received_commitments
+@election_route("/submit_commitment", methods=["POST"])
+def submit_commitment(election_id):
+    store = find_commitments(election_id)
+    if store is None:
+        return jsonify({"error": f"Unknown election '{election_id}'"}), 404
+    election = elections.get(election_id)
+    if election is not None and not election.is_open:
+        return jsonify({"error": f"Election '{election_id}' is archived"}), 409
 
     data = request.get_json()
-    if data is None or "voter_id" not in data or "commitment" not in data or "salt" not in data:
+    if not isinstance(data, dict) or "voter_id" not in data or "commitment" not in data or "salt" not in data:
         return jsonify({"error": "Invalid JSON payload; expected 'voter_id', 'commitment', and 'salt'"}), 400
 
     voter_id = data["voter_id"]
     commitment = data["commitment"]
     salt = data["salt"]
 
-    # Store each commitment tuple in memory
-    received_commitments.append({
-        "voter_id": voter_id,
-        "commitment": commitment,
-        "salt": salt
-    })
+    digest = CommitmentStore.parse_digest(commitment)
+    if digest is None:
+        return jsonify({"error": "'commitment' must be a 64-character SHA-256 hex digest"}), 400
+    if not CommitmentStore.valid_fields(voter_id, salt, data.get("vote_id")):
+        return jsonify({"error": "'voter_id', 'salt' and 'vote_id' must be strings"}), 400
 
-    print(f"✅ /submit_commitment: Stored commitment for voter '{voter_id}'.")
+    # Store the commitment in memory (and in the ballot log)
+    outcome = record_commitment(election_id, store, voter_id, digest, salt, data.get("vote_id"))
+    COMMITMENTS.inc(result=outcome)
+    if outcome == DUPLICATE_VOTER:
+        return jsonify({"error": f"Voter '{voter_id}' has already submitted a commitment"}), 409
+    if outcome == DUPLICATE_COMMITMENT:
+        return jsonify({"error": "This commitment hash has already been submitted"}), 409
+    if outcome == DUPLICATE_VOTE_ID:
+        return jsonify({"error": "This vote_id has already been submitted"}), 409
+
+    log(f"✅ /submit_commitment: Stored commitment for voter '{voter_id}'.")
     return jsonify({"status": "commitment recorded"}), 200
 
 
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Endpoint #3b: GET /commitments/<voter_id>
+#              GET /commitments/by_hash/<commitment>
+#   Constant-time lookups; return JSON { "voter_id", "commitment", "salt" } or 404.
+# ────────────────────────────────────────────────────────────────────────────
+@election_route("/commitments/<voter_id>", methods=["GET"])
+def get_commitment(election_id, voter_id):
+    store = find_commitments(election_id)
+    if store is None:
+        return jsonify({"error": f"Unknown election '{election_id}'"}), 404
+    record = store.get(voter_id)
+    if record is None:
+        return jsonify({"error": f"No commitment for voter '{voter_id}'"}), 404
+    return jsonify(record.to_dict()), 200
+
+
+@election_route("/commitments/by_hash/<commitment>", methods=["GET"])
+def get_commitment_by_hash(election_id, commitment):
+    store = find_commitments(election_id)
+    if store is None:
+        return jsonify({"error": f"Unknown election '{election_id}'"}), 404
+    digest = CommitmentStore.parse_digest(commitment)
+    record = store.get_by_digest(digest) if digest is not None else None
+    if record is None:
+        return jsonify({"error": "Unknown commitment"}), 404
+    return jsonify(record.to_dict()), 200
+
+
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Endpoint #3c: POST /verify_commitment
+#   Client sends JSON { "voter_id": "...", "vote": "yes"|"no", "salt": "..." }
+#   Returns JSON { "voter_id": "...", "result": "PASSED"|"FAILED" } or 404.
+# ────────────────────────────────────────────────────────────────────────────
+@election_route("/verify_commitment", methods=["POST"])
+def verify_commitment(election_id):
+    store = find_commitments(election_id)
+    if store is None:
+        return jsonify({"error": f"Unknown election '{election_id}'"}), 404
+
+    data = request.get_json()
+    if data is None or "voter_id" not in data or "vote" not in data or "salt" not in data:
+        return jsonify({"error": "Invalid JSON payload; expected 'voter_id', 'vote', and 'salt'"}), 400
+
+    vote_int = {"yes": 1, "1": 1, "no": 0, "0": 0}.get(str(data["vote"]).strip().lower())
+    if vote_int is None:
+        return jsonify({"error": "'vote' must be 'yes' or 'no'"}), 400
+
+    passed = store.verify(data["voter_id"], vote_int, data["salt"])
+    if passed is None:
+        return jsonify({"error": f"No commitment for voter '{data['voter_id']}'"}), 404
+    return jsonify({"voter_id": data["voter_id"], "result": "PASSED" if passed else "FAILED"}), 200
+
+
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Endpoint #3d: GET /merkle/root
+#               GET /merkle/proof/<vote_id>
+#               GET /merkle/proof/by_hash/<commitment>
+#   Bulletin board over all accepted commitments. A proof is the O(log n)
+#   audit path for one commitment:
+#   { "commitment", "leaf_index", "tree_size", "path": [hex, ...], "root" }
+#   "?tree_size=N" proves it against the root of the first N leaves (a root
+#   the voter already fetched from /merkle/root or the tally), so the proof
+#   is checked against that published root rather than one the response picks.
+# ────────────────────────────────────────────────────────────────────────────
+@election_route("/merkle/root", methods=["GET"])
+def get_merkle_root(election_id):
+    store = find_commitments(election_id)
+    if store is None:
+        return jsonify({"error": f"Unknown election '{election_id}'"}), 404
+    root, size = store.root()
+    return jsonify({"root": root.hex(), "tree_size": size}), 200
+
+
+def inclusion_proof_response(election_id, lookup):
+    """lookup(store) returns the CommitmentRecord to prove, or None."""
+    store = find_commitments(election_id)
+    if store is None:
+        return jsonify({"error": f"Unknown election '{election_id}'"}), 404
+    tree_size = request.args.get("tree_size")
+    if tree_size is not None:
+        try:
+            tree_size = int(tree_size)
+        except ValueError:
+            return jsonify({"error": "tree_size must be an integer"}), 400
+    record = lookup(store)
+    if record is None:
+        return jsonify({"error": "Unknown commitment"}), 404
+    try:
+        path, size, root = store.inclusion_proof(record, tree_size)
+    except IndexError:
+        return jsonify({"error": f"Commitment is not in the tree of {tree_size} leaves "
+                                 f"(leaf {record.leaf_index}, tree now has {store.root()[1]})"}), 404
+    return jsonify({
+        "commitment": record.digest.hex(),
+        "leaf_index": record.leaf_index,
+        "tree_size": size,
+        "path": [h.hex() for h in path],
+        "root": root.hex()
+    }), 200
+
+
+@election_route("/merkle/proof/<vote_id>", methods=["GET"])
+def get_inclusion_proof(election_id, vote_id):
+    return inclusion_proof_response(election_id, lambda store: store.get_by_vote_id(vote_id))
+
+
+@election_route("/merkle/proof/by_hash/<commitment>", methods=["GET"])
+def get_inclusion_proof_by_hash(election_id, commitment):
+    digest = CommitmentStore.parse_digest(commitment)
+    return inclusion_proof_response(election_id,
+                                    lambda store: store.get_by_digest(digest) if digest is not None else None)
+
+
 #
 # ────────────────────────────────────────────────────────────────────────────
 # Endpoint #4: GET /get_encrypted_tally
-#   Returns JSON { "ciphertext": "...", "exponent": 789 } for server_encrypted_sum
+#   Merges the accumulator shards and returns JSON
+#   { "ciphertext": "...", "ciphertexts": ["...", ...], "exponent": 0, "ballot_count": 3,
+#     "ballot_layout": {...} or null, "merkle_root": "...", "commitment_count": 3 }
+#   ("ciphertext" is the first position, kept for single-ciphertext clients),
+#   or a binary tally frame (root and count in X-Merkle-Root / X-Commitment-Count
+#   headers) if the client sends Accept: application/vnd.cvs.tally
+#
+#   Responses are serialized once per state version and carry an ETag; a poll
+#   with a matching If-None-Match gets 304. Adding ?wait=<seconds> (up to
+#   MAX_LONG_POLL_SECONDS) to such a poll long-polls: the request is held until
+#   the tally changes (200 with the new body) or the wait runs out (304).
 # ────────────────────────────────────────────────────────────────────────────
-@app.route("/get_encrypted_tally", methods=["GET"])
-def get_encrypted_tally():
-    global server_pubkey, server_encrypted_sum
+MAX_LONG_POLL_SECONDS = 60
+
+
+def cached_response(election, kind, build):
+    """
+    Serve the `kind` representation of the election's current tally from its tally cache.
+    build() returns (body bytes, mimetype, extra headers) and runs only on a cache miss.
+    """
+    tally_cache = election.tally_cache
+    version = tally_cache.version
+    if tally_cache.etag(kind, version) in request.if_none_match:
+        try:
+            wait = min(max(float(request.args.get("wait", 0)), 0.0), MAX_LONG_POLL_SECONDS)
+        except ValueError:
+            response = jsonify({"error": "'wait' must be a number of seconds"})
+            response.status_code = 400
+            return response
+        if wait > 0:
+            version = tally_cache.wait_for_change(version, wait)
+        if tally_cache.etag(kind, version) in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(tally_cache.etag(kind, version))
+            return response
 
-    if server_pubkey is None or server_encrypted_sum is None:
-        return jsonify({"error": "No votes recorded or public key not set"}), 400
+    version, (body, mimetype, headers) = tally_cache.get(kind, build)
+    response = Response(body, status=200, mimetype=mimetype, headers=headers)
+    response.set_etag(tally_cache.etag(kind, version))
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept"
+    return response
 
-    # Send back the single Ciphertext and exponent
+
+def build_tally(election, binary, rerandomize=rerandomize):
+    """rerandomize(n, products) → re-randomized ciphertexts (replaceable, e.g. to run it in a worker process)."""
+    with PHASE_SECONDS.time(phase="tally_merge"):
+        products, ballot_count, ids_tag = election.merged()
+    with PHASE_SECONDS.time(phase="encrypted_number"):
+        ciphertexts = rerandomize(election.pubkey.n, products)
+    merkle_root, commitment_count = election.commitments.root()
+
+    if binary:
+        body = wire.encode_tally(ciphertexts, 0, wire.ciphertext_width(election.nsquare))
+        return body, wire.TALLY_MEDIA_TYPE, {
+            "X-Ballot-Count": str(ballot_count),
+            "X-Ballot-Ids-Digest": format(ids_tag, "032x"),
+            "X-Merkle-Root": merkle_root.hex(),
+            "X-Commitment-Count": str(commitment_count)
+        }
+
+    # Send back the encrypted sum(s) and exponent
     response = {
-        "ciphertext": str(server_encrypted_sum.ciphertext()),
-        "exponent": server_encrypted_sum.exponent
+        "ciphertext": str(ciphertexts[0]),
+        "ciphertexts": [str(c) for c in ciphertexts],
+        "exponent": 0,
+        "ballot_count": ballot_count,
+        "ballot_ids_digest": format(ids_tag, "032x"),
+        "ballot_layout": election.layout,
+        "election_status": election.status,
+        "merkle_root": merkle_root.hex(),
+        "commitment_count": commitment_count
     }
+    return json.dumps(response).encode(), "application/json", {}
+
+
+@election_route("/get_encrypted_tally", methods=["GET"])
+def get_encrypted_tally(election_id):
+    election, error = find_election(election_id, missing="No votes recorded or public key not set")
+    if error is not None:
+        return error
+
+    binary = request.accept_mimetypes.best_match(["application/json", wire.TALLY_MEDIA_TYPE]) == wire.TALLY_MEDIA_TYPE
+    response = cached_response(election, "binary" if binary else "json", lambda: build_tally(election, binary))
+    if response.status_code == 200:
+        log(f"✅ /get_encrypted_tally: Returning the current encrypted sum to client{' (binary)' if binary else ''}.")
+    return response
+
+
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Endpoint #4b: GET /get_segment_tallies
+#   One encrypted sum per segment:
+#   { "exponent": 0, "ballot_layout": {...} or null,
+#     "segments": { "<segment>": { "ciphertexts": ["...", ...], "ballot_count": 12 }, ... } }
+#   The raw products are returned as-is (no re-randomisation), so thousands of
+#   segments cost one modular product each; decrypt them in one batch with
+#   server/segment_tally.py. Cached and ETag-ed like /get_encrypted_tally.
+# ────────────────────────────────────────────────────────────────────────────
+@election_route("/get_segment_tallies", methods=["GET"])
+def get_segment_tallies(election_id):
+    election, error = find_election(election_id, missing="No votes recorded or public key not set")
+    if error is not None:
+        return error
+
+    def build():
+        segments = {
+            name: {"ciphertexts": [str(c) for c in products], "ballot_count": count}
+            for name, (products, count) in election.segment_snapshot().items()
+        }
+        body = {"exponent": 0, "ballot_layout": election.layout, "segments": segments}
+        return json.dumps(body).encode(), "application/json", {}
+
+    response = cached_response(election, "segments", build)
+    if response.status_code == 200:
+        log("✅ /get_segment_tallies: Returning the per-segment sums to client.")
+    return response
+
+
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Endpoint #4c: GET  /elections
+#               GET  /elections/<election_id>
+#               POST /elections/<election_id>/archive
+#   Summaries (status, ballot/segment/commitment counts, approximate memory)
+#   of every hosted election or of one. Archiving stops an election from
+#   accepting ballots and commitments (409); its tally, segment tallies,
+#   commitments and proofs stay readable, and its accumulator shards are
+#   folded into one to release memory.
+# ────────────────────────────────────────────────────────────────────────────
+@app.route("/elections", methods=["GET"])
+def list_elections():
+    summaries = [election.summary() for election in elections.all()]
+    return jsonify({
+        "elections": summaries,
+        "memory_bytes": sum(summary["memory_bytes"] for summary in summaries)
+    }), 200
+
+
+@app.route("/elections/<election_id>", methods=["GET"])
+def get_election(election_id):
+    election = elections.get(election_id)
+    if election is None:
+        return jsonify({"error": f"Unknown election '{election_id}'"}), 404
+    return jsonify(election.summary()), 200
+
 
-    print("✅ /get_encrypted_tally: Returning the current encrypted sum to client.")
-    return jsonify(response), 200
+@app.route("/elections/<election_id>/archive", methods=["POST"])
+def archive(election_id):
+    election = elections.get(election_id)
+    if election is None:
+        return jsonify({"error": f"Unknown election '{election_id}'"}), 404
+    if election.is_open:
+        archive_election(election)
+        log(f"✅ /archive: Election '{election_id}' archived with {len(election.accumulator)} ballot(s).")
+    return jsonify(election.summary()), 200
+
+
+#
+# ────────────────────────────────────────────────────────────────────────────
+# Endpoint #5: GET /metrics
+#   Request counts and latency histograms per endpoint, per-phase timings,
+#   ballot/commitment outcomes and accumulator size, in the Prometheus text format.
+# ────────────────────────────────────────────────────────────────────────────
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), status=200, content_type=Registry.CONTENT_TYPE)
 
 
 #
@@ -140,8 +1097,58 @@ def get_encrypted_tally():
 # Main entry‐point: start the Flask server
 # ────────────────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
-    # You can change host="0.0.0.0" or port=5000 if needed
-    print("🚀 Starting server on http://localhost:5000 …")
-    app.run(host="0.0.0.0", port=5000)
+    parser = argparse.ArgumentParser(description="Confidential voting server.")
+    parser.add_argument("--log-dir", default=str(Path(__file__).parent.parent / "ballot_log"),
+                        help="directory for the append-only ballot log and checkpoints")
+    parser.add_argument("--no-log", action="store_true", help="keep state in memory only (lost on restart)")
+    parser.add_argument("--quiet", action="store_true", help="no per-request console lines (see /metrics instead)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--upstream", help="parent server URL: run as an aggregator node forwarding partial sums to it")
+    parser.add_argument("--node-id", help="this node's id at the parent (default: <hostname>-<port>)")
+    parser.add_argument("--forward-interval", type=float, default=2.0,
+                        help="seconds between partial-sum reports to the parent")
+    parser.add_argument("--partial-token",
+                        help="accept partial sums from aggregator nodes presenting this bearer token "
+                             "(an aggregator also sends it upstream)")
+    parser.add_argument("--require-proofs", action=argparse.BooleanOptionalAction, default=True,
+                        help="reject ballots without a ballot-validity proof (on by default; "
+                             "--no-require-proofs accepts unproven ballots, e.g. for load tests)")
+    parser.add_argument("--ingest-queue", type=int, default=10000,
+                        help="ballots the ingest queue holds before answering 429 (0 = add ballots on the request thread)")
+    parser.add_argument("--ingest-workers", type=int, default=2, help="threads draining the ingest queue")
+    parser.add_argument("--max-batch", type=int, default=512, help="most ballots committed in one micro-batch")
+    args = parser.parse_args()
+    verbose = not args.quiet
+    require_proofs = args.require_proofs
+    partial_token = args.partial_token
+
+    if not args.no_log:
+        ballot_log = open_ballot_log(args.log_dir)
+
+    if args.upstream:
+        node_id = args.node_id or f"{socket.gethostname()}-{args.port}"
+        forwarder = PartialForwarder(elections, args.upstream, node_id, args.forward_interval,
+                                     args.partial_token, PARTIALS_FORWARDED).start()
+        print(f"📡 Aggregator node '{node_id}': forwarding partial sums to {args.upstream} "
+              f"every {args.forward_interval:g}s.")
+
+    if args.ingest_queue > 0:
+        ingest_queue = IngestQueue(record_ballot_groups, args.ingest_queue, args.ingest_workers, args.max_batch,
+                                   INGEST_BATCH_SIZE, INGEST_LATENCY).start()
+        print(f"📥 Ingest queue: {args.ingest_queue} ballot(s), {args.ingest_workers} worker(s), "
+              f"micro-batches of up to {args.max_batch}.")
+
+    print(f"🧮 Big-integer backend: {bigint.NAME}")
+    print(f"🚀 Starting server on http://localhost:{args.port} …")
+    try:
+        app.run(host=args.host, port=args.port)
+    finally:
+        if ingest_queue is not None:
+            ingest_queue.stop()
+        if forwarder is not None:
+            forwarder.stop()
+        if ballot_log is not None:
+            ballot_log.close(checkpoint=True)
 
 
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# server/tally.py
+#
+# Offline tally of every encrypted ballot in votes/<vote_id>.json
+# (or votes/<vote_id>.bin in the binary wire format).
+# The directory is streamed in chunks, each chunk is parsed and multiplied
+# in a worker process, and the partial products are combined with a tree
+# reduction. Only the final product is decrypted.
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+from phe import paillier
+
+from homomorphic import validate_ballot, multiply_ciphertexts
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from common import wire, bigint, keyfile
+from common.batch_decrypt import decrypt_many
+from common.packing import BallotLayout, REFERENDUM, print_results
+
+
+def iter_ballot_paths(votes_dir):
+    """Yield every *.json / *.bin path in votes_dir without listing the whole directory up front."""
+    with os.scandir(votes_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith((".json", ".bin")) and entry.is_file():
+                yield entry.path
+
+
+def iter_chunks(paths, chunk_size, nsquare, parts):
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) == chunk_size:
+            yield chunk, nsquare, parts
+            chunk = []
+    if chunk:
+        yield chunk, nsquare, parts
+
+
+def chunk_product(args):
+    """
+    Worker: parse a chunk of ballot files and return
+    (products of ciphertexts mod n², one per position; ballots counted; ballots skipped).
+    """
+    paths, nsquare, parts = args
+    width = wire.ciphertext_width(nsquare)
+    accepted = []
+    skipped = 0
+    for path in paths:
+        try:
+            if path.endswith(".bin"):
+                with open(path, "rb") as f:
+                    ballots = [(c, e) for _, c, e in wire.decode_ballots(f.read(), width)]
+            else:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                if "ciphertexts" in data:
+                    ciphertexts = tuple(int(c) for c in data["ciphertexts"])
+                else:
+                    ciphertexts = (int(data["ciphertext"]),)
+                ballots = [(ciphertexts, int(data["exponent"]))]
+        except (OSError, ValueError, KeyError, TypeError):
+            skipped += 1
+            continue
+        for ciphertexts, exponent in ballots:
+            if validate_ballot(ciphertexts, exponent, nsquare, parts) is not None:
+                skipped += 1
+                continue
+            accepted.append(ciphertexts)
+    products = [multiply_ciphertexts((b[i] for b in accepted), nsquare) for i in range(parts)]
+    return products, len(accepted), skipped
+
+
+def multiply_pair(args):
+    a, b, nsquare = args
+    return [bigint.mulmod(x, y, nsquare) for x, y in zip(a, b)]
+
+
+def tree_reduce(pool, partials, nsquare, parts):
+    """Combine partial product vectors pairwise, level by level, until one remains."""
+    if not partials:
+        return [1] * parts
+    while len(partials) > 1:
+        pairs = [(partials[i], partials[i + 1], nsquare) for i in range(0, len(partials) - 1, 2)]
+        odd = [partials[-1]] if len(partials) % 2 else []
+        partials = pool.map(multiply_pair, pairs) + odd
+    return partials[0]
+
+
+def peak_memory_mb():
+    """Peak RSS of this process and of its (finished) worker processes, in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return own / scale, children / scale
+
+
+def tally_directory(votes_dir, pubkey, parts=1, processes=None, chunk_size=1000):
+    """
+    Return (encrypted sums, one per ciphertext position; ballots_counted; ballots_skipped)
+    for every ballot in votes_dir.
+    """
+    nsquare = pubkey.nsquare
+    partials = []
+    counted = skipped = 0
+    with Pool(processes=processes) as pool:
+        chunks = iter_chunks(iter_ballot_paths(votes_dir), chunk_size, nsquare, parts)
+        for products, n_ok, n_bad in pool.imap_unordered(chunk_product, chunks):
+            partials.append(products)
+            counted += n_ok
+            skipped += n_bad
+        totals = tree_reduce(pool, partials, nsquare, parts)
+    return [paillier.EncryptedNumber(pubkey, t, 0) for t in totals], counted, skipped
+
+
+def decode_tally(totals, counted, n, layout=None):
+    """
+    Decode decrypted totals into {contest: {option: count}} for `counted` ballots
+    (layout None: the yes/no referendum). Raises ValueError if the totals cannot
+    come from that many valid ballots, which is what ballots encrypted under a
+    different key or layout decrypt to.
+    """
+    if layout is None:
+        # A referendum ballot is one ciphertext of 0/1; size its single slot from the ballot count
+        layout = BallotLayout(REFERENDUM, max(counted, 1), n)
+    results = layout.decode(totals, counted)
+    used_bits = layout.slot_bits * layout.slots_per_ciphertext
+    if any(t < 0 or t.bit_length() > used_bits for t in totals) or \
+            any(not 0 <= c <= counted for counts in results.values() for c in counts.values()):
+        raise ValueError(f"Decrypted totals are inconsistent with {counted} ballots; "
+                         f"ballots were probably encrypted under a different key or layout.")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tally all encrypted ballots in votes/.")
+    parser.add_argument("--votes-dir", default=str(PROJECT_ROOT / "votes"), help="directory of <vote_id>.json/.bin ballots")
+    parser.add_argument("--privkey", default=str(PROJECT_ROOT / "keys" / keyfile.PRIVATE_KEY_FILE),
+                        help="Paillier private key file (a legacy .pkl pickle is also accepted)")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="ballot files per worker task")
+    parser.add_argument("--layout", help="packed-ballot layout JSON ({\"contests\": [...], \"max_voters\": N}); "
+                                         "default is the single yes/no referendum")
+    args = parser.parse_args()
+
+    if not Path(args.votes_dir).is_dir():
+        print(f"❌ Error: votes directory not found at {args.votes_dir}")
+        sys.exit(1)
+    try:
+        privkey = keyfile.load_private_key(args.privkey)
+    except Exception as e:
+        print(f"❌ Error loading private key from {args.privkey}: {e}")
+        sys.exit(1)
+
+    n = privkey.public_key.n
+    try:
+        if args.layout:
+            with open(args.layout, "r") as f:
+                layout = BallotLayout.from_dict(json.load(f), n)
+        else:
+            layout = None
+    except Exception as e:
+        print(f"❌ Error loading ballot layout: {e}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    encrypted_sums, counted, skipped = tally_directory(
+        args.votes_dir, privkey.public_key, layout.num_ciphertexts if layout else 1,
+        args.processes, args.chunk_size)
+    aggregate_seconds = time.perf_counter() - start
+
+    totals = decrypt_many(privkey, [s.ciphertext(be_secure=False) for s in encrypted_sums], processes=1)
+    elapsed = time.perf_counter() - start
+    try:
+        results = decode_tally(totals, counted, n, layout)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"📊 {counted} ballots counted, {skipped} skipped")
+    print_results(results)
+    rate = counted / aggregate_seconds if aggregate_seconds > 0 else float("inf")
+    own_mb, children_mb = peak_memory_mb()
+    print(f"⏱️  Aggregated in {aggregate_seconds:.3f}s ({rate:,.0f} ballots/s), decrypted in "
+          f"{elapsed - aggregate_seconds:.3f}s")
+    print(f"💾 Peak memory: {own_mb:.1f} MB (main), {children_mb:.1f} MB (largest worker)")
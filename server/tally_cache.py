@@ -0,0 +1,59 @@
+# server/tally_cache.py
+
+import os
+import sys
+import threading
+
+
+class TallyCache:
+    """
+    Version counter for everything the tally endpoints report, plus the
+    serialized responses for the current version.
+
+    The server calls bump() whenever a ballot, commitment or new key changes
+    the state; until then every poll is served from the cached body (or
+    answered 304 via its ETag), and long-pollers block in wait_for_change()
+    instead of re-requesting.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.instance = os.urandom(4).hex()  # ETags from before a restart never match
+        self._cond = threading.Condition()
+        self._bodies = {}
+
+    def bump(self):
+        with self._cond:
+            self.version += 1
+            self._bodies.clear()
+            self._cond.notify_all()
+
+    def etag(self, kind, version):
+        return f"{self.instance}-{version}-{kind}"
+
+    def get(self, kind, build):
+        """
+        Return (version, cached value) for this representation, calling build()
+        outside the lock on a miss. A value built while the version moved on is
+        returned but not cached; it may be newer than its version, never older.
+        """
+        with self._cond:
+            version = self.version
+            value = self._bodies.get(kind)
+        if value is not None:
+            return version, value
+        value = build()
+        with self._cond:
+            if self.version == version:
+                self._bodies[kind] = value
+        return version, value
+
+    def memory_bytes(self):
+        with self._cond:
+            return sum(sys.getsizeof(body) for body, _, _ in self._bodies.values())
+
+    def wait_for_change(self, version, timeout):
+        """Block until the version differs from `version` or `timeout` seconds pass; returns the current version."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version
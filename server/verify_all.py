@@ -1,6 +1,11 @@
+import argparse
+import csv
 import json
 import hashlib
+import os
 import sys
+import time
+from multiprocessing import Pool
 from pathlib import Path
 
 def discover_commitments():
@@ -67,7 +72,143 @@ def verify_commitment(stored_commitment, vote_int, salt_hex):
     recomputed = hashlib.sha256(f"{vote_int}{salt_hex}".encode()).hexdigest()
     return recomputed == stored_commitment
 
+# ─────────────────────────────────────────────────────────────────────
+# Batch (non-interactive) mode
+#   Claims come from a CSV file or stdin, one "vote_id,vote,salt" per line
+#   (vote is yes/no or 1/0). Each commitment file is read exactly once into
+#   an in-memory index; claims are then verified in parallel chunks and a
+#   JSON Lines report is written, one {"vote_id", "result"} object per claim.
+# ─────────────────────────────────────────────────────────────────────
+def _read_commitment_files(paths):
+    """Worker: parse a chunk of *_commit.json files → (entries, unreadable file names)."""
+    entries = []
+    unreadable = []
+    for path in paths:
+        filename = os.path.basename(path)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            # Keep the raw 32-byte digest instead of the 64-char hex string
+            entries.append((filename[:-len("_commit.json")], bytes.fromhex(data["commitment"])))
+        except Exception:
+            unreadable.append(filename)
+    return entries, unreadable
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_commitment_index(commit_dir, pool, chunk_size):
+    """Return ({vote_id: digest_bytes}, [unreadable file names]), reading each file once."""
+    def paths():
+        with os.scandir(commit_dir) as it:
+            for entry in it:
+                if entry.name.endswith("_commit.json"):
+                    yield entry.path
+
+    index = {}
+    unreadable = []
+    for entries, bad in pool.imap_unordered(_read_commitment_files, _chunked(paths(), chunk_size)):
+        index.update(entries)
+        unreadable.extend(bad)
+    return index, unreadable
+
+
+def parse_claims(stream):
+    """Yield (vote_id, vote_int or None, salt) from CSV lines; a header row is skipped."""
+    for row in csv.reader(stream):
+        if not row or row[0].strip() in ("", "vote_id"):
+            continue
+        vote_id = row[0].strip()
+        vote = row[1].strip().lower() if len(row) > 1 else ""
+        salt = row[2].strip() if len(row) > 2 else ""
+        vote_int = {"yes": 1, "1": 1, "no": 0, "0": 0}.get(vote)
+        yield vote_id, vote_int, salt
+
+
+def _verify_chunk(claims):
+    """Worker: claims are (vote_id, vote_int, salt, stored_digest or None)."""
+    results = []
+    for vote_id, vote_int, salt, stored in claims:
+        if stored is None:
+            result = "UNKNOWN_VOTE_ID"
+        elif vote_int is None or not salt:
+            result = "INVALID_CLAIM"
+        elif hashlib.sha256(f"{vote_int}{salt}".encode()).digest() == stored:
+            result = "PASSED"
+        else:
+            result = "FAILED"
+        results.append((vote_id, result))
+    return results
+
+
+def run_batch(claims_stream, report_stream, commit_dir, workers, chunk_size):
+    counts = {"PASSED": 0, "FAILED": 0, "UNKNOWN_VOTE_ID": 0, "INVALID_CLAIM": 0}
+    with Pool(processes=workers) as pool:
+        start = time.perf_counter()
+        index, unreadable = load_commitment_index(commit_dir, pool, chunk_size)
+        load_seconds = time.perf_counter() - start
+        for filename in unreadable:
+            print(f"❌ Error reading {filename}; skipped.", file=sys.stderr)
+
+        def tasks():
+            for chunk in _chunked(parse_claims(claims_stream), chunk_size):
+                yield [(vote_id, vote_int, salt, index.get(vote_id)) for vote_id, vote_int, salt in chunk]
+
+        start = time.perf_counter()
+        for results in pool.imap(_verify_chunk, tasks()):
+            for vote_id, result in results:
+                counts[result] += 1
+                report_stream.write(json.dumps({"vote_id": vote_id, "result": result}) + "\n")
+        verify_seconds = time.perf_counter() - start
+
+    total = sum(counts.values())
+    summary = {
+        "commitments_indexed": len(index),
+        "claims": total,
+        **{k.lower(): v for k, v in counts.items()},
+        "index_seconds": round(load_seconds, 3),
+        "verify_seconds": round(verify_seconds, 3),
+        "claims_per_second": round(total / verify_seconds) if verify_seconds > 0 else None,
+    }
+    print(json.dumps(summary), file=sys.stderr)
+    return counts["FAILED"] == 0 and counts["UNKNOWN_VOTE_ID"] == 0 and counts["INVALID_CLAIM"] == 0
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify vote commitments (interactive, or in batch with --batch).")
+    parser.add_argument("--batch", metavar="CLAIMS", help="CSV file of vote_id,vote,salt claims ('-' for stdin)")
+    parser.add_argument("--report", metavar="PATH", default="-", help="JSON Lines report output ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="items per worker task")
+    parser.add_argument("--commit-dir", default=str(Path(__file__).parent.parent / "commitments"),
+                        help="directory of <vote_id>_commit.json files (batch mode)")
+    args = parser.parse_args()
+
+    if args.batch:
+        commit_dir = Path(args.commit_dir)
+        if not commit_dir.exists():
+            print(f"❌ Error: commitments directory not found at {commit_dir}")
+            sys.exit(1)
+        claims_stream = sys.stdin if args.batch == "-" else open(args.batch, "r", newline="")
+        report_stream = sys.stdout if args.report == "-" else open(args.report, "w")
+        try:
+            all_passed = run_batch(claims_stream, report_stream, commit_dir, args.workers, args.chunk_size)
+        finally:
+            if claims_stream is not sys.stdin:
+                claims_stream.close()
+            if report_stream is not sys.stdout:
+                report_stream.close()
+        sys.exit(0 if all_passed else 2)
+
     # Step 4.2.1: Discover all commitment files
     all_commitments = discover_commitments()
     print(f"✅ Found {len(all_commitments)} commitment file(s) to verify.")